@@ -0,0 +1,183 @@
+"""
+ベンチマークとテストで共有するモックの OpenAI 応答。
+
+ネットワークを使わずに会話ループを実行するため、チャットコンプリートとストリーミングの
+チャンクを組み立てる関数と、スクリプト式のモッククライアントを提供します。
+"""
+
+import json
+from types import SimpleNamespace
+
+from openai.types.chat import (
+    ChatCompletionMessage,
+    ChatCompletionMessageToolCall,
+)
+from openai.types.chat.chat_completion import ChatCompletion, Choice
+from openai.types.chat.chat_completion_chunk import (
+    ChatCompletionChunk,
+    Choice as ChunkChoice,
+    ChoiceDelta,
+    ChoiceDeltaToolCall,
+    ChoiceDeltaToolCallFunction,
+)
+from openai.types.chat.chat_completion_message_tool_call import Function
+from openai.types.completion_usage import CompletionUsage, PromptTokensDetails
+
+
+# モックの usage を作成する関数
+# usage は {"prompt": ..., "completion": ..., "cached": ...} の形式です。
+def create_mock_usage(usage):
+    if usage is None:
+        return None
+    prompt = usage.get("prompt", 0)
+    completion = usage.get("completion", 0)
+    return CompletionUsage(
+        prompt_tokens=prompt,
+        completion_tokens=completion,
+        total_tokens=prompt + completion,
+        prompt_tokens_details=PromptTokensDetails(cached_tokens=usage.get("cached", 0)),
+    )
+
+# モックレスポンスを作成する関数
+def create_mock_response(message, function_calls=[], model="gpt-4o", usage=None):
+    role = message.get("role", "assistant")
+    content = message.get("content", "")
+    tool_calls = (
+        [
+            ChatCompletionMessageToolCall(
+                id="mock_tc_id",
+                type="function",
+                function=Function(
+                    name=call.get("name", ""),
+                    arguments=json.dumps(call.get("args", {})),
+                ),
+            )
+            for call in function_calls
+        ]
+        if function_calls
+        else None
+    )
+
+    return ChatCompletion(
+        id="mock_cc_id",
+        created=1234567890,
+        model=model,
+        object="chat.completion",
+        choices=[
+            Choice(
+                message=ChatCompletionMessage(
+                    role=role, content=content, tool_calls=tool_calls
+                ),
+                finish_reason="stop",
+                index=0,
+            )
+        ],
+        usage=create_mock_usage(usage),
+    )
+
+# モックのストリーミングレスポンス（チャンクのリスト）を作成する関数
+# content と各ツール呼び出しの引数を chunk_size 文字ずつに分割して返します。
+# usage を指定した場合は、最後に usage だけのチャンクを加えます。
+def create_mock_stream(
+    message, function_calls=[], model="gpt-4o", chunk_size=4, usage=None
+):
+    def chunk(delta):
+        return ChatCompletionChunk(
+            id="mock_cc_id",
+            created=1234567890,
+            model=model,
+            object="chat.completion.chunk",
+            choices=[ChunkChoice(delta=delta, finish_reason=None, index=0)],
+        )
+
+    role = message.get("role", "assistant")
+    content = message.get("content", "")
+    chunks = [chunk(ChoiceDelta(role=role, content=""))]
+    for i in range(0, len(content), chunk_size):
+        chunks.append(chunk(ChoiceDelta(content=content[i : i + chunk_size])))
+
+    for index, call in enumerate(function_calls):
+        arguments = json.dumps(call.get("args", {}))
+        chunks.append(
+            chunk(
+                ChoiceDelta(
+                    tool_calls=[
+                        ChoiceDeltaToolCall(
+                            index=index,
+                            id=f"mock_tc_id_{index}",
+                            type="function",
+                            function=ChoiceDeltaToolCallFunction(
+                                name=call.get("name", ""), arguments=""
+                            ),
+                        )
+                    ]
+                )
+            )
+        )
+        for i in range(0, len(arguments), chunk_size):
+            chunks.append(
+                chunk(
+                    ChoiceDelta(
+                        tool_calls=[
+                            ChoiceDeltaToolCall(
+                                index=index,
+                                function=ChoiceDeltaToolCallFunction(
+                                    arguments=arguments[i : i + chunk_size]
+                                ),
+                            )
+                        ]
+                    )
+                )
+            )
+    if usage is not None:
+        chunks.append(
+            ChatCompletionChunk(
+                id="mock_cc_id",
+                created=1234567890,
+                model=model,
+                object="chat.completion.chunk",
+                choices=[],
+                usage=create_mock_usage(usage),
+            )
+        )
+    return chunks
+
+
+# 会話の状態から次の応答を決めるスクリプト式のモッククライアント
+# 最後のユーザーメッセージ以降のアシスタントメッセージの数で script のステップを選ぶため、
+# 多数の会話で共有できます。呼び出しの引数は記録しないので、ベンチマークにも使えます。
+# script の各ステップは {"content": ..., "function_calls": [...]} です。
+class ScriptedOpenAIClient:
+    def __init__(self, script: list, model="gpt-4o", chunk_size=4):
+        self.script = script
+        self.calls = 0
+        self._responses = [
+            create_mock_response(
+                {"role": "assistant", "content": step.get("content", "")},
+                step.get("function_calls", []),
+                model=model,
+            )
+            for step in script
+        ]
+        self._streams = [
+            create_mock_stream(
+                {"role": "assistant", "content": step.get("content", "")},
+                step.get("function_calls", []),
+                model=model,
+                chunk_size=chunk_size,
+            )
+            for step in script
+        ]
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, messages, stream=False, **kwargs):
+        self.calls += 1
+        step = 0
+        for message in reversed(messages):
+            role = message.get("role")
+            if role == "user":
+                break
+            if role == "assistant":
+                step += 1
+        step = min(step, len(self.script) - 1)
+        return iter(self._streams[step]) if stream else self._responses[step]
@@ -0,0 +1,185 @@
+"""
+Swarm の会話ループ自体のオーバーヘッドを測るオフラインのベンチマーク。
+
+ScriptedOpenAIClient で応答を固定し（ネットワークなし）、次の項目を測定します。
+    - 複数ターン、複数の引き継ぎ、ストリーミングの各シナリオのターン数/秒
+    - ストリーミングのチャンク数/秒
+    - 1会話あたりのメモリ使用量（tracemalloc）
+    - 履歴の長さとツールの数に対するスケーリング
+
+結果は JSON で出力されるため、swarm/core.py や swarm/util.py の変更による
+性能の低下を数値で比較できます。
+
+    python -m benchmarks.bench_e2e --output bench_results.json
+    python -m benchmarks.bench_e2e --quick
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from benchmarks._mock import ScriptedOpenAIClient
+from swarm import Agent, Swarm
+
+FINAL_CONTENT = "ご質問の件について調べた結果をお伝えします。" * 4
+
+# ツールを1回呼び出してから応答するスクリプト
+TOOL_SCRIPT = [
+    {"function_calls": [{"name": "lookup", "args": {"key": "order_123"}}]},
+    {"content": FINAL_CONTENT},
+]
+
+
+def lookup(key: str):
+    """注文を調べます。"""
+    return f"{key}: 発送済み"
+
+
+# 何もしないダミーのツールを作成する関数
+def make_tool(index: int):
+    def tool(query: str, page: int = 1):
+        return ""
+
+    tool.__name__ = f"tool_{index}"
+    tool.__doc__ = f"ダミーのツール {index}"
+    return tool
+
+
+# 引き継ぎを depth 回繰り返すエージェントの連鎖とスクリプトを作成する関数
+def make_handoff_chain(depth: int):
+    agents = [Agent(name=f"エージェント{i}") for i in range(depth + 1)]
+    for current, following in zip(agents, agents[1:]):
+
+        def transfer(following=following):
+            return following
+
+        current.functions = [transfer]
+    script = [{"function_calls": [{"name": "transfer"}]}] * depth
+    return agents[0], script + [{"content": FINAL_CONTENT}]
+
+
+# 長さ length の既存の履歴を作成する関数
+def make_history(length: int) -> list:
+    history = []
+    for i in range(length // 2):
+        history.append({"role": "user", "content": f"質問 {i}"})
+        history.append(
+            {"role": "assistant", "content": f"回答 {i}", "sender": "エージェント"}
+        )
+    history.append({"role": "user", "content": "注文の状況を教えてください。"})
+    return history
+
+
+# 会話を conversations 回実行し、スループットを返す関数
+def measure(
+    client: Swarm, agent: Agent, messages: list, conversations: int, stream=False
+):
+    scripted = client.client
+    scripted.calls = 0
+    chunks = 0
+    start = time.perf_counter()
+    for _ in range(conversations):
+        if stream:
+            for event in client.run(agent=agent, messages=messages, stream=True):
+                if "delim" not in event and "response" not in event:
+                    chunks += 1
+        else:
+            client.run(agent=agent, messages=messages)
+    elapsed = time.perf_counter() - start
+    result = {
+        "conversations": conversations,
+        "turns": scripted.calls,
+        "seconds": round(elapsed, 4),
+        "conversations_per_sec": round(conversations / elapsed, 1),
+        "turns_per_sec": round(scripted.calls / elapsed, 1),
+    }
+    if stream:
+        result["chunks"] = chunks
+        result["chunks_per_sec"] = round(chunks / elapsed, 1)
+    return result
+
+
+# 会話の結果を保持したまま conversations 回実行し、1会話あたりのメモリ使用量を返す関数
+def measure_memory(client: Swarm, agent: Agent, messages: list, conversations: int):
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    responses = [
+        client.run(agent=agent, messages=messages) for _ in range(conversations)
+    ]
+    _, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    retained = sum(stat.size_diff for stat in snapshot.compare_to(baseline, "filename"))
+    tracemalloc.stop()
+    del responses
+    return {
+        "conversations": conversations,
+        "retained_bytes_per_conversation": round(retained / conversations),
+        "peak_bytes_per_conversation": round(peak / conversations),
+    }
+
+
+def run_benchmarks(quick: bool = False) -> dict:
+    n = 50 if quick else 1000
+    # スケーリングの測定は1点あたりの回数を減らす
+    m = max(n // 4, 10)
+    results = {}
+
+    tool_agent = Agent(name="エージェント", functions=[lookup])
+    messages = make_history(0)
+
+    client = Swarm(client=ScriptedOpenAIClient(TOOL_SCRIPT))
+    results["multi_turn"] = measure(client, tool_agent, messages, n)
+    results["streaming"] = measure(client, tool_agent, messages, n, stream=True)
+
+    handoff_agent, handoff_script = make_handoff_chain(depth=3)
+    client = Swarm(client=ScriptedOpenAIClient(handoff_script))
+    results["multi_handoff"] = measure(client, handoff_agent, messages, n)
+
+    client = Swarm(client=ScriptedOpenAIClient(TOOL_SCRIPT))
+    results["memory"] = measure_memory(client, tool_agent, messages, m)
+
+    results["history_scaling"] = {
+        str(length): measure(client, tool_agent, make_history(length), m)
+        for length in ((10, 100) if quick else (10, 100, 1000))
+    }
+
+    results["tool_count_scaling"] = {}
+    for count in (1, 10) if quick else (1, 10, 50, 100):
+        agent = Agent(
+            name="エージェント",
+            functions=[lookup] + [make_tool(i) for i in range(count - 1)],
+        )
+        results["tool_count_scaling"][str(count)] = measure(
+            client, agent, messages, m
+        )
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "quick": quick,
+        "results": results,
+    }
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", help="結果の JSON を書き出すファイル")
+    parser.add_argument("--quick", action="store_true", help="少ない回数で実行する")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(quick=args.quick)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
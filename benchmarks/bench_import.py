@@ -0,0 +1,112 @@
+"""
+swarm のインポートにかかる時間を測り、上限（予算）を超えていないかを確認するベンチマーク。
+
+各インポート文を新しいインタープリターで repeat 回実行し、文そのものにかかった時間の
+中央値を測定します（インタープリターの起動時間は含みません）。あわせて、その文で
+読み込まれてはいけない重いモジュール（openai など）が読み込まれていないかを確認します。
+予算を超えた場合や、読み込まれてはいけないモジュールが読み込まれた場合は終了コード 1 で
+終了するため、CI で起動時間の悪化を検出できます。
+
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --repeat 10 --budget-scale 2 --output import.json
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+# インポート文ごとの予算（ミリ秒）と、読み込まれてはいけないモジュール
+IMPORT_BUDGETS = {
+    "import swarm": {"budget_ms": 50, "forbidden": ["openai", "pydantic"]},
+    "from swarm import Agent": {"budget_ms": 400, "forbidden": ["openai"]},
+    "from swarm import Swarm": {"budget_ms": 500, "forbidden": ["openai"]},
+    "from swarm.repl import run_demo_loop": {
+        "budget_ms": 500,
+        "forbidden": ["openai"],
+    },
+}
+
+# 子プロセスで実行するスクリプト（所要時間と、読み込まれたモジュールを出力する）
+PROBE = """
+import json, sys, time
+forbidden = {forbidden!r}
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+loaded = sorted(name for name in forbidden if name in sys.modules)
+print(json.dumps({{"ms": elapsed * 1000, "loaded": loaded}}))
+"""
+
+
+# インポート文を新しいインタープリターで1回実行し、結果を返す関数
+def probe(statement: str, forbidden: list) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(statement=statement, forbidden=forbidden)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+# インポート文を repeat 回測定し、予算と比較した結果を返す関数
+def measure(statement: str, budget_ms: float, forbidden: list, repeat: int) -> dict:
+    samples = [probe(statement, forbidden) for _ in range(repeat)]
+    median_ms = statistics.median(sample["ms"] for sample in samples)
+    loaded = sorted({name for sample in samples for name in sample["loaded"]})
+    return {
+        "median_ms": round(median_ms, 1),
+        "min_ms": round(min(sample["ms"] for sample in samples), 1),
+        "budget_ms": budget_ms,
+        "forbidden_loaded": loaded,
+        "ok": median_ms <= budget_ms and not loaded,
+    }
+
+
+def run_benchmarks(repeat: int = 5, budget_scale: float = 1.0) -> dict:
+    results = {
+        statement: measure(
+            statement, spec["budget_ms"] * budget_scale, spec["forbidden"], repeat
+        )
+        for statement, spec in IMPORT_BUDGETS.items()
+    }
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "budget_scale": budget_scale,
+        "ok": all(result["ok"] for result in results.values()),
+        "results": results,
+    }
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", help="結果の JSON を書き出すファイル")
+    parser.add_argument("--repeat", type=int, default=5, help="1つの文を測る回数")
+    parser.add_argument(
+        "--budget-scale",
+        type=float,
+        default=1.0,
+        help="予算に掛ける係数（遅いマシンで実行する場合に大きくする）",
+    )
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(repeat=args.repeat, budget_scale=args.budget_scale)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    if not report["ok"]:
+        sys.exit(1)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+ストリーミング差分の組み立て処理のベンチマーク。
+
+以前の実装（delta.json() の JSON 往復 + merge_chunk による文字列の連結）と
+StreamAccumulator を、同じ合成チャンク列で比較し、1秒あたりのチャンク数を出力します。
+
+    python -m benchmarks.bench_stream
+"""
+
+import json
+import time
+import warnings
+from collections import defaultdict
+
+from benchmarks._mock import create_mock_stream
+from swarm.core import stream_event
+from swarm.types import Agent
+from swarm.util import StreamAccumulator, merge_chunk
+
+
+# 以前の run_and_stream と同じ方法でチャンクを処理する関数
+def legacy_accumulate(chunks, agent: Agent) -> dict:
+    message = {
+        "content": "",
+        "sender": agent.name,
+        "role": "assistant",
+        "function_call": None,
+        "tool_calls": defaultdict(
+            lambda: {
+                "function": {"arguments": "", "name": ""},
+                "id": "",
+                "type": "",
+            }
+        ),
+    }
+    for chunk in chunks:
+        with warnings.catch_warnings():
+            # 以前の実装は pydantic v1 互換の .json() を使っていた
+            warnings.simplefilter("ignore", DeprecationWarning)
+            delta = json.loads(chunk.choices[0].delta.json())
+        if delta["role"] == "assistant":
+            delta["sender"] = agent.name
+        delta.pop("role", None)
+        delta.pop("sender", None)
+        merge_chunk(message, delta)
+    message["tool_calls"] = list(message.get("tool_calls", {}).values()) or None
+    return message
+
+
+# 現在の run_and_stream と同じ方法でチャンクを処理する関数
+def accumulator_accumulate(chunks, agent: Agent) -> dict:
+    accumulator = StreamAccumulator(agent.name)
+    for chunk in chunks:
+        delta = chunk.choices[0].delta
+        stream_event(delta, agent)
+        accumulator.add(delta)
+    return accumulator.message()
+
+
+# 合成チャンク列を作成する関数
+def make_chunks(content_chars: int, tool_calls: int, chunk_size: int = 4) -> list:
+    content = "あ" * content_chars
+    calls = [
+        {"name": f"tool_{i}", "args": {"query": "x" * 200, "page": i}}
+        for i in range(tool_calls)
+    ]
+    return create_mock_stream(
+        {"role": "assistant", "content": content}, calls, chunk_size=chunk_size
+    )
+
+
+# 処理を繰り返し実行し、1秒あたりのチャンク数を返す関数
+def chunks_per_second(fn, chunks, agent: Agent, min_time: float = 1.0) -> float:
+    processed = 0
+    start = time.perf_counter()
+    while True:
+        fn(chunks, agent)
+        processed += len(chunks)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return processed / elapsed
+
+
+def main() -> dict:
+    agent = Agent(name="ベンチマーク")
+    scenarios = {
+        "content_only": make_chunks(content_chars=2000, tool_calls=0),
+        "parallel_tool_calls": make_chunks(content_chars=0, tool_calls=3),
+    }
+    results = {}
+    for name, chunks in scenarios.items():
+        # 両方の実装が同じメッセージを組み立てることを確認する
+        assert legacy_accumulate(chunks, agent) == accumulator_accumulate(chunks, agent)
+        before = chunks_per_second(legacy_accumulate, chunks, agent)
+        after = chunks_per_second(accumulator_accumulate, chunks, agent)
+        results[name] = {
+            "chunks": len(chunks),
+            "before_chunks_per_sec": round(before),
+            "after_chunks_per_sec": round(after),
+            "speedup": round(after / before, 2),
+        }
+        print(
+            f"{name}: {len(chunks)} チャンク, "
+            f"変更前 {before:,.0f}/s, 変更後 {after:,.0f}/s ({after / before:.2f}x)"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    main()
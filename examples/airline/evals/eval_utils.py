@@ -3,14 +3,16 @@ import json
 import uuid
 
 from swarm import Swarm
+from swarm.usage import merge_usage, usage_row
 
 
-def run_function_evals(agent, test_cases, n=1, eval_path=None):
+def run_function_evals(agent, test_cases, n=1, eval_path=None, prices=None):
     correct_function = 0
     results = []
     eval_id = str(uuid.uuid4())
     eval_timestamp = datetime.datetime.now().isoformat()
     client = Swarm()
+    usages = []
 
     for test_case in test_cases:
         case_correct = 0
@@ -27,6 +29,7 @@ def run_function_evals(agent, test_cases, n=1, eval_path=None):
             response = client.run(
                 agent=agent, messages=test_case["conversation"], max_turns=1
             )
+            usages.append(response.usage)
             output = extract_response_info(response)
             actual_function = output.get("tool_calls", "None")
             actual_message = output.get("message", "None")
@@ -66,6 +69,15 @@ def run_function_evals(agent, test_cases, n=1, eval_path=None):
     )
     print(f"\033[93mOVERALL: Accuracy: {overall_accuracy:.2f}%\033[0m")
 
+    usage = usage_row("total", merge_usage(usages), prices)
+    print(
+        f"\033[90mTokens: {usage['prompt_tokens']} prompt "
+        f"({usage['cached_tokens']} cached), {usage['completion_tokens']} completion, "
+        f"{usage['tokens_per_second']:.1f} tokens/s\033[0m"
+    )
+    if usage.get("cost") is not None:
+        print(f"\033[90mCost: ${usage['cost']:.4f}\033[0m")
+
     final_result = {
         "id": eval_id,
         "timestamp": eval_timestamp,
@@ -73,6 +85,7 @@ def run_function_evals(agent, test_cases, n=1, eval_path=None):
         "correct_evals": correct_function,
         "total_evals": len(test_cases) * n,
         "overall_accuracy_percent": f"{overall_accuracy:.2f}%",
+        "usage": usage,
     }
 
     if eval_path:
@@ -1,4 +1,72 @@
-from .core import Swarm
-from .types import Agent, Response
+import importlib
+from typing import TYPE_CHECKING
 
-__all__ = ["Swarm", "Agent", "Response"]
+# 公開する名前と、それを定義しているモジュール
+# import swarm では何もインポートせず、名前を最初に参照したときにモジュールを読み込みます
+# （Agent だけを使うワーカーなどで openai や会話ループを読み込まないようにするため）。
+_LAZY_IMPORTS = {
+    "Swarm": ".core",
+    "AsyncSwarm": ".core",
+    "Agent": ".types",
+    "Response": ".types",
+    "History": ".history",
+    "ContextVariables": ".history",
+    "CanonicalPromptLayout": ".prompt",
+    "CompletionCache": ".cache",
+    "ModelCascade": ".cascade",
+    "AgentGraph": ".graph",
+    "compile_agents": ".graph",
+    "TokenBudgetPolicy": ".history",
+    "LatencyPolicy": ".latency",
+    "RetryBudget": ".latency",
+    "memoize": ".memo",
+    "PriceTable": ".usage",
+    "run_in_process": ".process",
+    "Session": ".session",
+    "JSONLinesSessionStore": ".session",
+    "MemorySessionStore": ".session",
+    "SQLiteSessionStore": ".session",
+    "TokenUsage": ".usage",
+    "usage_report": ".usage",
+    "Tracer": ".tracing",
+    "JSONLinesExporter": ".tracing",
+    "ConnectionPool": ".transport",
+    "default_pool": ".transport",
+    "set_default_pool": ".transport",
+}
+
+__all__ = list(_LAZY_IMPORTS)
+
+if TYPE_CHECKING:
+    from .cache import CompletionCache
+    from .cascade import ModelCascade
+    from .core import AsyncSwarm, Swarm
+    from .graph import AgentGraph, compile_agents
+    from .history import ContextVariables, History, TokenBudgetPolicy
+    from .latency import LatencyPolicy, RetryBudget
+    from .memo import memoize
+    from .process import run_in_process
+    from .prompt import CanonicalPromptLayout
+    from .session import (
+        JSONLinesSessionStore,
+        MemorySessionStore,
+        Session,
+        SQLiteSessionStore,
+    )
+    from .tracing import JSONLinesExporter, Tracer
+    from .transport import ConnectionPool, default_pool, set_default_pool
+    from .types import Agent, Response
+    from .usage import PriceTable, TokenUsage, usage_report
+
+
+def __getattr__(name: str):
+    module = _LAZY_IMPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,306 @@
+# 標準ライブラリのインポート
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, List, Optional
+
+# ローカルのインポート
+from .util import StreamAccumulator
+
+# openai の型は使うときにインポートする（import swarm を軽くするため）
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+# キャッシュキーに含める生成パラメータ
+CACHE_KEY_PARAMS = ("model", "messages", "tools", "tool_choice", "parallel_tool_calls")
+
+
+# 生成パラメータの正規化したハッシュをキャッシュキーとして返す関数
+def completion_cache_key(create_params: dict) -> str:
+    payload = {name: create_params.get(name) for name in CACHE_KEY_PARAMS}
+    canonical = json.dumps(
+        payload,
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# メモリ上の LRU キャッシュ層
+class MemoryCacheTier:
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, created = entry
+            if self.ttl is not None and time.time() - created > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, created: Optional[float] = None) -> None:
+        with self._lock:
+            self._entries[key] = (value, created or time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# SQLite のディスクキャッシュ層
+# max_entries を超えた場合は、最後に参照された時刻が古いものから削除します。
+# 同じファイルを複数の用途で使う場合は、table で用途ごとのテーブルを指定します。
+class SQLiteCacheTier:
+    def __init__(
+        self,
+        path: str,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        table: str = "completions",
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed)"
+            )
+
+    def get_entry(self, key: str):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, created FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            with self._conn:
+                if self.ttl is not None and time.time() - created > self.ttl:
+                    self._conn.execute(
+                        f"DELETE FROM {self.table} WHERE key = ?", (key,)
+                    )
+                    return None
+                self._conn.execute(
+                    f"UPDATE {self.table} SET accessed = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+            return value, created
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.get_entry(key)
+        return entry[0] if entry else None
+
+    def set(self, key: str, value: str, created: Optional[float] = None) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created, accessed) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, created or now, now),
+            )
+            if self.max_entries is not None:
+                self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN ("
+                    f"SELECT key FROM {self.table} ORDER BY accessed DESC "
+                    "LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            row = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+            return row[0]
+
+
+# チャットコンプリートのキャッシュ
+# メモリ層を先に参照し、見つからなければ SQLite 層（path を指定した場合）を参照します。
+# SQLite 層で見つかったものはメモリ層にも載せます。値は JSON 文字列で保持するため、
+# 取り出したコンプリートを呼び出し側で変更してもキャッシュには影響しません。
+class CompletionCache:
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[float] = None,
+        path: Optional[str] = None,
+        max_disk_entries: Optional[int] = None,
+    ):
+        self.memory = MemoryCacheTier(maxsize=maxsize, ttl=ttl)
+        self.disk = (
+            SQLiteCacheTier(path, max_entries=max_disk_entries, ttl=ttl)
+            if path
+            else None
+        )
+        self.hits = 0
+        self.misses = 0
+
+    # キャッシュされたコンプリートを取得するメソッド（見つからなければ None）
+    def get(self, key: str) -> Optional["ChatCompletion"]:
+        from openai.types.chat import ChatCompletion
+
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            entry = self.disk.get_entry(key)
+            if entry is not None:
+                value = entry[0]
+                self.memory.set(key, value, created=entry[1])
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return ChatCompletion.model_validate_json(value)
+
+    # コンプリートをキャッシュに保存するメソッド
+    def set(self, key: str, completion: "ChatCompletion") -> None:
+        value = completion.model_dump_json()
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    # ストリームをそのまま流しつつ記録し、最後まで読み終えたらキャッシュに保存するメソッド
+    def record_stream(self, key: str, stream):
+        chunks = []
+        for chunk in stream:
+            chunks.append(chunk)
+            yield chunk
+        self.set(key, completion_from_chunks(chunks))
+
+    # 非同期ストリーム版の record_stream
+    async def arecord_stream(self, key: str, stream):
+        chunks = []
+        async for chunk in stream:
+            chunks.append(chunk)
+            yield chunk
+        self.set(key, completion_from_chunks(chunks))
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+
+# ストリーミングのチャンク列からコンプリートを組み立てる関数
+def completion_from_chunks(chunks: List["ChatCompletionChunk"]) -> "ChatCompletion":
+    from openai.types.chat import ChatCompletion
+
+    accumulator = StreamAccumulator("")
+    finish_reason = None
+    usage = None
+    for chunk in chunks:
+        if chunk.usage is not None:
+            usage = chunk.usage.model_dump()
+        if not chunk.choices:
+            continue
+        accumulator.add(chunk.choices[0].delta)
+        finish_reason = chunk.choices[0].finish_reason or finish_reason
+    message = accumulator.message()
+    first = chunks[0]
+    return ChatCompletion.model_validate(
+        {
+            "id": first.id,
+            "created": first.created,
+            "model": first.model,
+            "object": "chat.completion",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": finish_reason
+                    or ("tool_calls" if message["tool_calls"] else "stop"),
+                    "message": {
+                        "role": "assistant",
+                        "content": message["content"] or None,
+                        "tool_calls": message["tool_calls"],
+                    },
+                }
+            ],
+            "usage": usage,
+        }
+    )
+
+
+# コンプリートから、ストリーミングと同じ形の合成チャンク列を作成する関数
+# include_usage が True の場合は、最後のチャンクにコンプリートの usage を含めます
+# （キャッシュの再生ではトークンを使わないため含めません）。
+def completion_to_chunks(
+    completion: "ChatCompletion", include_usage: bool = False
+) -> List["ChatCompletionChunk"]:
+    from openai.types.chat import ChatCompletionChunk
+
+    choice = completion.choices[0]
+    message = choice.message
+    deltas = [{"role": "assistant", "content": message.content or ""}]
+    for index, tool_call in enumerate(message.tool_calls or []):
+        deltas.append(
+            {
+                "tool_calls": [
+                    {
+                        "index": index,
+                        "id": tool_call.id,
+                        "type": tool_call.type,
+                        "function": {
+                            "name": tool_call.function.name,
+                            "arguments": tool_call.function.arguments,
+                        },
+                    }
+                ]
+            }
+        )
+    finish_reasons = [None] * len(deltas) + [choice.finish_reason]
+    deltas.append({})
+    chunks = [
+        ChatCompletionChunk.model_validate(
+            {
+                "id": completion.id,
+                "created": completion.created,
+                "model": completion.model,
+                "object": "chat.completion.chunk",
+                "choices": [
+                    {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                ],
+            }
+        )
+        for delta, finish_reason in zip(deltas, finish_reasons)
+    ]
+    if include_usage:
+        chunks[-1].usage = getattr(completion, "usage", None)
+    return chunks
+
+
+# 合成チャンク列を非同期イテレータとして返す関数
+async def aiter_chunks(chunks: List["ChatCompletionChunk"]):
+    for chunk in chunks:
+        yield chunk
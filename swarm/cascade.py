@@ -0,0 +1,151 @@
+# 標準ライブラリのインポート
+import json
+import threading
+from typing import Callable, Dict, Optional
+
+
+# エージェントごとのカスケードの集計
+class CascadeStats:
+    __slots__ = ("attempts", "accepted", "draft_seconds", "escalated_seconds")
+
+    def __init__(self):
+        self.attempts = 0
+        self.accepted = 0
+        # 小さいモデルの所要時間の合計（採用されたものと、エスカレートしたものの内訳）
+        self.draft_seconds = {True: 0.0, False: 0.0}
+        # エスカレートした場合の設定モデルの所要時間の合計
+        self.escalated_seconds = 0.0
+
+    @property
+    def escalated(self) -> int:
+        return self.attempts - self.accepted
+
+    @property
+    def accept_rate(self) -> float:
+        return self.accepted / self.attempts if self.attempts else 0.0
+
+    # 集計を辞書として返すメソッド
+    # saved_ms は、採用された回数 × (設定モデルの平均 - 採用された小さいモデルの平均) から、
+    # エスカレートした場合に無駄になった小さいモデルの時間を引いた推定値です
+    # （エスカレートが一度もなければ設定モデルの平均が分からないため None）。
+    def to_dict(self) -> dict:
+        accepted_ms = self.draft_seconds[True] * 1000
+        wasted_ms = self.draft_seconds[False] * 1000
+        saved_ms = None
+        if self.escalated:
+            escalated_mean = self.escalated_seconds * 1000 / self.escalated
+            accepted_mean = accepted_ms / self.accepted if self.accepted else 0.0
+            saved_ms = self.accepted * (escalated_mean - accepted_mean) - wasted_ms
+        return {
+            "attempts": self.attempts,
+            "accepted": self.accepted,
+            "escalated": self.escalated,
+            "accept_rate": round(self.accept_rate, 4),
+            "accepted_draft_ms": round(accepted_ms, 1),
+            "wasted_draft_ms": round(wasted_ms, 1),
+            "escalated_ms": round(self.escalated_seconds * 1000, 1),
+            "saved_ms": None if saved_ms is None else round(saved_ms, 1),
+        }
+
+
+# 小さく速いモデルを先に試し、条件を満たさなければエージェントのモデルで生成し直すカスケード
+# 小さいモデルの結果は次のいずれかを満たす場合に採用されます。
+#   - 既知の関数への有効なツール呼び出し（引数が JSON オブジェクトで、必須の引数がそろっている）
+#   - min_logprob を指定した場合、内容のトークンの平均対数確率が min_logprob 以上
+# accept(message, tools) を指定すると、これらの代わりにその判定を使います。
+# 集計はエージェント名ごとに stats() で取得できます。
+# 採用の判定には応答の全体が必要なため、ストリーミングでも小さいモデルはストリーミングなしで
+# 呼び出します。そのため最初のチャンクが届くまでの時間（TTFT）は、採用された場合は小さい
+# モデルの応答全体の時間、エスカレートした場合はそれに設定モデルの TTFT を加えた時間に
+# なります。ターン全体の時間よりも TTFT が重要なエージェント（長い文章を返すものなど）には
+# 指定しないでください。
+class ModelCascade:
+    def __init__(
+        self,
+        model: str = "gpt-4o-mini",
+        accept: Optional[Callable] = None,
+        accept_tool_calls: bool = True,
+        min_logprob: Optional[float] = None,
+    ):
+        self.model = model
+        self.accept = accept
+        self.accept_tool_calls = accept_tool_calls
+        self.min_logprob = min_logprob
+        self._stats: Dict[str, CascadeStats] = {}
+        self._lock = threading.Lock()
+
+    # 小さいモデルへのリクエストの生成パラメータを返すメソッド（ストリーミングなし）
+    def draft_params(self, create_params: dict) -> dict:
+        params = {**create_params, "model": self.model, "stream": False}
+        # stream_options はストリーミングの場合にしか指定できない
+        params.pop("stream_options", None)
+        if self.min_logprob is not None:
+            params["logprobs"] = True
+        return params
+
+    # 小さいモデルの結果を採用するかどうかを判定するメソッド
+    def accepts(self, completion, tools: list) -> bool:
+        choice = completion.choices[0]
+        message = choice.message
+        if self.accept is not None:
+            return bool(self.accept(message, tools))
+        if message.tool_calls:
+            if not self.accept_tool_calls:
+                return False
+            return valid_tool_calls(message.tool_calls, tools)
+        if self.min_logprob is None:
+            return False
+        return mean_logprob(choice) >= self.min_logprob
+
+    # 1回の結果を集計に記録するメソッド
+    def record(
+        self,
+        agent_name: str,
+        accepted: bool,
+        draft_seconds: float,
+        escalated_seconds: float = 0.0,
+    ) -> None:
+        with self._lock:
+            stats = self._stats.get(agent_name)
+            if stats is None:
+                stats = self._stats[agent_name] = CascadeStats()
+            stats.attempts += 1
+            stats.accepted += accepted
+            stats.draft_seconds[accepted] += draft_seconds
+            stats.escalated_seconds += escalated_seconds
+
+    # エージェント名ごとの集計を返すメソッド
+    def stats(self, agent_name: Optional[str] = None) -> dict:
+        with self._lock:
+            if agent_name is not None:
+                stats = self._stats.get(agent_name) or CascadeStats()
+                return stats.to_dict()
+            return {name: stats.to_dict() for name, stats in self._stats.items()}
+
+
+# ツール呼び出しがすべて既知の関数を有効な引数で呼んでいるかどうかを返す関数
+def valid_tool_calls(tool_calls, tools: list) -> bool:
+    required = {
+        tool["function"]["name"]: tool["function"]["parameters"].get("required", [])
+        for tool in tools
+    }
+    for tool_call in tool_calls:
+        name = tool_call.function.name
+        if name not in required:
+            return False
+        try:
+            args = json.loads(tool_call.function.arguments or "{}")
+        except json.JSONDecodeError:
+            return False
+        if not isinstance(args, dict) or any(key not in args for key in required[name]):
+            return False
+    return True
+
+
+# 内容のトークンの平均対数確率を返す関数（対数確率がなければ -inf）
+def mean_logprob(choice) -> float:
+    logprobs = getattr(choice, "logprobs", None)
+    content = getattr(logprobs, "content", None) if logprobs else None
+    if not content:
+        return float("-inf")
+    return sum(token.logprob for token in content) / len(content)
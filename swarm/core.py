@@ -1,33 +1,378 @@
 # 標準ライブラリのインポート
-import copy
+import asyncio
+import functools
+import inspect
 import json
-from collections import defaultdict
-from typing import List, Callable, Union
-
-# パッケージ/ライブラリのインポート
-from openai import OpenAI
+import multiprocessing
+import threading
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import TYPE_CHECKING, Callable, Iterable, List, Optional, Union
 
 # ローカルのインポート
-from .util import function_to_json, debug_print, merge_chunk
-from .types import (
-    Agent,
-    AgentFunction,
-    ChatCompletionMessage,
-    ChatCompletionMessageToolCall,
-    Function,
-    Response,
-    Result,
+from .util import (
+    __CTX_VARS_NAME__,
+    CompiledTools,
+    ToolCache,
+    StreamAccumulator,
+    debug_print,
+)
+from .cache import (
+    CompletionCache,
+    aiter_chunks,
+    completion_cache_key,
+    completion_to_chunks,
 )
+from .events import DeltaCoalescer, atyped_events, typed_events
+from .graph import AgentGraph, compile_agents
+from .history import ContextVariables, DefaultContextView, History
+from .latency import LatencyPolicy
+from .memo import FunctionMemo, memo_of
+from .message import Message, wire_messages
+from .process import call_in_process, process_args, runs_in_process, unpack_result
+from .prompt import CanonicalPromptLayout
+from .session import Session, SessionHistory
+from .tracing import NULL_SPAN, SPAN_KIND_CLIENT, Tracer
+from .transport import ConnectionPool, default_pool, running_loop
+from .types import Agent, AgentFunction, Response, Result
+from .usage import TokenUsage, cached_prompt_tokens
+
+# openai の型は使うときにインポートする（import swarm を軽くするため）
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletionMessage, ChatCompletionMessageToolCall
+
+
+# ツール実行結果のメッセージを作成する関数
+def tool_message(tool_call, name: str, content: str) -> Message:
+    return Message(
+        role="tool", tool_call_id=tool_call.id, tool_name=name, content=content
+    )
+
+
+# ストリーミングの差分から呼び出し元に渡すイベントを作成する関数
+def stream_event(delta, agent: Agent) -> dict:
+    event = delta.model_dump()
+    if event["role"] == "assistant":
+        event["sender"] = agent.name
+    return event
+
+
+# 辞書形式のツール呼び出しをオブジェクトに変換する関数
+def tool_call_objects(message: dict) -> List["ChatCompletionMessageToolCall"]:
+    from openai.types.chat import ChatCompletionMessageToolCall
+    from openai.types.chat.chat_completion_message_tool_call import Function
+
+    tool_calls = []
+    for tool_call in message["tool_calls"]:
+        function = Function(
+            arguments=tool_call["function"]["arguments"],
+            name=tool_call["function"]["name"],
+        )
+        tool_call_object = ChatCompletionMessageToolCall(
+            id=tool_call["id"], function=function, type=tool_call["type"]
+        )
+        tool_calls.append(tool_call_object)
+    return tool_calls
+
+
+# 非ストリーミングのコンプリートの結果をスパンに記録して終了する関数
+def end_completion_span(span, completion) -> None:
+    message = completion.choices[0].message
+    size = len((message.content or "").encode("utf-8"))
+    for tool_call in message.tool_calls or []:
+        size += len(tool_call.function.arguments.encode("utf-8"))
+    span.set_attribute("swarm.response_bytes", size)
+    usage = getattr(completion, "usage", None)
+    if usage is not None:
+        span.set_attribute("gen_ai.usage.input_tokens", usage.prompt_tokens)
+        span.set_attribute("gen_ai.usage.output_tokens", usage.completion_tokens)
+        span.set_attribute("swarm.usage.cached_tokens", cached_prompt_tokens(usage))
+    span.end()
+
+
+# ストリーミングのチャンクの大きさ（内容とツール呼び出しの引数のバイト数）を返す関数
+def chunk_bytes(chunk) -> int:
+    if not chunk.choices:
+        return 0
+    delta = chunk.choices[0].delta
+    size = len((delta.content or "").encode("utf-8"))
+    for tool_call in delta.tool_calls or []:
+        if tool_call.function is not None and tool_call.function.arguments:
+            size += len(tool_call.function.arguments.encode("utf-8"))
+    return size
+
+
+# ストリームをそのまま流しつつ、最初のチャンクまでの時間（TTFT）と量をスパンに記録する関数
+def trace_stream(stream, span):
+    chunks = 0
+    size = 0
+    try:
+        for chunk in stream:
+            if chunks == 0:
+                span.set_attribute("swarm.ttft_ms", span.elapsed_ms())
+                span.add_event("first_chunk")
+            chunks += 1
+            size += chunk_bytes(chunk)
+            yield chunk
+    except Exception as e:
+        span.record_error(e)
+        raise
+    finally:
+        span.set_attribute("swarm.chunks", chunks)
+        span.set_attribute("swarm.response_bytes", size)
+        span.end()
+
+
+# 非同期ストリーム版の trace_stream
+async def atrace_stream(stream, span):
+    chunks = 0
+    size = 0
+    try:
+        async for chunk in stream:
+            if chunks == 0:
+                span.set_attribute("swarm.ttft_ms", span.elapsed_ms())
+                span.add_event("first_chunk")
+            chunks += 1
+            size += chunk_bytes(chunk)
+            yield chunk
+    except Exception as e:
+        span.record_error(e)
+        raise
+    finally:
+        span.set_attribute("swarm.chunks", chunks)
+        span.set_attribute("swarm.response_bytes", size)
+        span.end()
+
+
+# バッチ実行のジョブを run のキーワード引数に変換する関数
+# ジョブは run のキーワード引数の辞書、または (agent, messages, context_variables) のタプルです。
+def job_kwargs(job, defaults: dict) -> dict:
+    if isinstance(job, dict):
+        kwargs = {**defaults, **job}
+    else:
+        kwargs = {
+            **defaults,
+            **dict(zip(("agent", "messages", "context_variables"), job)),
+        }
+    if kwargs.pop("stream", False):
+        raise ValueError("run_many ではストリーミングは使用できません。")
+    return kwargs
 
-__CTX_VARS_NAME__ = "context_variables"  # コンテキスト変数の名称
 
 # Swarmクラス
 class Swarm:
-    def __init__(self, client=None):
-        # クライアントの初期化
+    def __init__(
+        self,
+        client=None,
+        concurrent_tool_calls: bool = False,
+        max_tool_workers: int = None,
+        completion_cache: CompletionCache = None,
+        history_policy: Callable = None,
+        tracer: Tracer = None,
+        pool: ConnectionPool = None,
+        latency_policy: LatencyPolicy = None,
+        max_process_workers: int = None,
+        graph: AgentGraph = None,
+        prompt_layout: CanonicalPromptLayout = None,
+        eager_tool_calls: bool = False,
+        stream_usage: bool = True,
+        agents: Iterable[Agent] = (),
+    ):
+        # クライアントの初期化（指定がなければ、初回の利用時に共有の接続プールから作成する）
         if not client:
-            client = OpenAI()
-        self.client = client
+            pool = pool or default_pool()
+        self._client = client or None
+        # モデルごとのベース URL を持つ接続プール（None の場合は常に client を使う）
+        self.pool = pool
+        # チャットコンプリートのキャッシュ（None の場合は使用しない）
+        self.completion_cache = completion_cache
+        # 各コンプリートの前に履歴を絞り込むポリシー（例: TokenBudgetPolicy）
+        self.history_policy = history_policy
+        # 1つのメッセージに含まれる複数のツール呼び出しを並行して実行するかどうか
+        self.concurrent_tool_calls = concurrent_tool_calls
+        self.max_tool_workers = max_tool_workers
+        self._tool_executor = None
+        # ストリーミングで、引数が閉じたツール呼び出しを生成の途中で実行するかどうか
+        self.eager_tool_calls = eager_tool_calls
+        # run_in_process を指定した関数を実行するプロセスプール（初回呼び出し時に作成）
+        self.max_process_workers = max_process_workers
+        self._process_executor = None
+        # run_many のスレッドから同時に呼ばれてもプールを1つだけ作成するためのロック
+        self._executor_lock = threading.Lock()
+        # run_in_process の関数が返したエージェントを名前で探すためのエージェント
+        self.agents = list(agents)
+        # 関数一覧ごとにコンパイルしたツールのJSON表現のキャッシュ
+        self.tool_cache = ToolCache()
+        # コンプリート、ツール呼び出し、引き継ぎのスパンを記録するトレーサー
+        self.tracer = tracer
+        # 遅いコンプリートのヘッジと再試行のポリシー（None の場合は行わない）
+        self.latency_policy = latency_policy
+        # コンパイル済みのエージェントのグラフ（含まれるエージェントはテンプレートを使う）
+        self.graph = graph
+        # プロンプトキャッシュが効きやすいリクエストの並べ方（None の場合は従来どおり）
+        self.prompt_layout = prompt_layout
+        # ストリーミングで最後のチャンクに usage を含めるよう要求するかどうか
+        # （stream_options に対応していないプロバイダーでは False にする）
+        self.stream_usage = stream_usage
+
+    # OpenAI クライアント（指定がなければ初回の参照時に接続プールから作成）
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self.new_client()
+        return self._client
+
+    @client.setter
+    def client(self, client) -> None:
+        self._client = client
+
+    # 接続プールから OpenAI クライアントを作成するメソッド
+    def new_client(self):
+        return self.pool.client(max_retries=self.pool_max_retries())
+
+    # 接続プールのクライアントの SDK の再試行回数を返すメソッド（None の場合はプールの設定）
+    # レイテンシポリシーがある場合は、再試行をすべて RetryBudget で管理するため 0 にします。
+    def pool_max_retries(self) -> Optional[int]:
+        return None if self.latency_policy is None else 0
+
+    # スパンを開始するメソッド（トレーサーがなければ何もしないスパンを返す）
+    def start_span(self, name: str, parent=None, kind: int = None, **attributes):
+        if self.tracer is None:
+            return NULL_SPAN
+        if kind is None:
+            return self.tracer.start_span(name, parent, **attributes)
+        return self.tracer.start_span(name, parent, kind=kind, **attributes)
+
+    # ツール実行用のスレッドプールを取得するメソッド（初回呼び出し時に作成）
+    def tool_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._tool_executor is None:
+                self._tool_executor = ThreadPoolExecutor(
+                    max_workers=self.max_tool_workers, thread_name_prefix="swarm-tool"
+                )
+            return self._tool_executor
+
+    # 関数実行用のプロセスプールを取得するメソッド（初回呼び出し時に作成）
+    # スレッドを使っているプロセスからの fork を避けるため、spawn で起動します。
+    def process_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._process_executor is None:
+                self._process_executor = ProcessPoolExecutor(
+                    max_workers=self.max_process_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._process_executor
+
+    # ワーカープロセスから名前で返されたエージェントを探す対象のエージェントを返すメソッド
+    def known_agents(self) -> List[Agent]:
+        if self.graph is None:
+            return self.agents
+        return self.agents + self.graph.agents
+
+    # ツール用のスレッドプールとプロセスプールを終了するメソッド
+    # 実行中の関数の終了を待ちます。終了した後に関数を実行すると、プールを作り直します。
+    def close(self) -> None:
+        with self._executor_lock:
+            tool_executor, self._tool_executor = self._tool_executor, None
+            process_executor, self._process_executor = self._process_executor, None
+        if tool_executor is not None:
+            tool_executor.shutdown()
+        if process_executor is not None:
+            process_executor.shutdown()
+
+    def __enter__(self) -> "Swarm":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # エージェントの集合をコンパイルし、以降のリクエストでテンプレートを使うメソッド
+    # 引数は compile_agents と同じで、ツールのキャッシュは Swarm のものを共有します。
+    def compile(
+        self, agents: Iterable[Agent], entry: Agent = None, strict: bool = False
+    ) -> AgentGraph:
+        self.graph = compile_agents(
+            agents, entry=entry, tool_cache=self.tool_cache, strict=strict
+        )
+        return self.graph
+
+    # チャットコンプリートの生成パラメータを組み立てるメソッド
+    def build_create_params(
+        self,
+        agent: Agent,
+        history: List,
+        context_variables: dict,
+        model_override: str,
+        stream: bool,
+        debug: bool,
+    ) -> dict:
+        layout = self.prompt_layout
+        template = self.graph.template(agent) if self.graph is not None else None
+        if template is not None and template.system_message is not None:
+            system_message = template.system_message
+        else:
+            # コンテキスト変数のデフォルト値を設定（存在しないキーは空文字列）
+            # 並べ方で static_instructions を指定した場合は、空のコンテキスト変数を使う
+            if layout is not None and layout.static_instructions:
+                instruction_context = DefaultContextView({})
+            else:
+                instruction_context = DefaultContextView(context_variables)
+            # エージェントの指示を取得
+            instructions = (
+                agent.instructions(instruction_context)
+                if callable(agent.instructions)
+                else agent.instructions
+            )
+            system_message = {"role": "system", "content": instructions}
+        # 履歴ポリシーがあれば、トークン数の上限に収まるように履歴を絞り込む
+        history_policy = agent.history_policy or self.history_policy
+        if history_policy is not None:
+            history = history_policy(history, system_message)
+        # 履歴のメッセージは、ここで初めて API に渡す辞書にする
+        messages = [system_message, *wire_messages(history)]
+        # 並べ方を指定した場合は、コンテキスト変数を履歴の後ろのメッセージにする
+        if layout is not None:
+            context_message = layout.context_message(context_variables)
+            if context_message is not None:
+                messages.append(context_message)
+        debug_print(debug, "チャットコンプリートの取得中...:", messages)
+
+        if template is not None:
+            # コンパイル済みのエージェントは、テンプレートに履歴を加えるだけにする
+            compiled = template.compiled
+            create_params = {**template.params, "messages": messages, "stream": stream}
+            if model_override:
+                create_params["model"] = model_override
+        else:
+            # ツールのJSON表現を取得（context_variablesはモデルから隠される）
+            compiled = self.tool_cache.compile(agent.functions)
+            tools = compiled.tools
+
+            # チャットコンプリートの生成パラメータを設定
+            create_params = {
+                "model": model_override or agent.model,
+                "messages": messages,
+                "tools": tools or None,
+                "tool_choice": agent.tool_choice,
+                "stream": stream,
+            }
+
+            # ツールがある場合、並列ツール呼び出しを設定
+            if tools:
+                create_params["parallel_tool_calls"] = agent.parallel_tool_calls
+
+        # 並べ方を指定した場合は、ツールを名前順に並べ、キーを並べ替える
+        if layout is not None and compiled.tools:
+            create_params["tools"] = layout.tools(compiled.payload())
+        # ストリーミングでもトークン数を集計できるよう、最後のチャンクで usage を受け取る
+        if stream and self.stream_usage:
+            create_params["stream_options"] = {"include_usage": True}
+        return create_params
 
     # チャットコンプリート（エージェントとのやり取り）を取得するメソッド
     def get_chat_completion(
@@ -38,41 +383,131 @@ class Swarm:
         model_override: str,
         stream: bool,
         debug: bool,
-    ) -> ChatCompletionMessage:
-        # コンテキスト変数のデフォルト値を設定
-        context_variables = defaultdict(str, context_variables)
-        # エージェントの指示を取得
-        instructions = (
-            agent.instructions(context_variables)
-            if callable(agent.instructions)
-            else agent.instructions
+        span=None,
+        usage: Optional[TokenUsage] = None,
+    ) -> "ChatCompletionMessage":
+        create_params = self.build_create_params(
+            agent, history, context_variables, model_override, stream, debug
         )
-        messages = [{"role": "system", "content": instructions}] + history
-        debug_print(debug, "チャットコンプリートの取得中...:", messages)
+        completion_span = self.start_completion_span(agent, create_params, span)
+        try:
+            if agent.cascade is not None and not model_override:
+                completion = self.cascade_completion(
+                    agent, create_params, debug, completion_span, usage
+                )
+            else:
+                completion = self.create_completion(create_params, debug)
+        except Exception as e:
+            completion_span.record_error(e)
+            completion_span.end()
+            raise
+        if completion_span is NULL_SPAN:
+            return completion
+        if stream:
+            return trace_stream(completion, completion_span)
+        end_completion_span(completion_span, completion)
+        return completion
 
-        # ツールのJSON表現を取得
-        tools = [function_to_json(f) for f in agent.functions]
-        # context_variablesをモデルから隠す
-        for tool in tools:
-            params = tool["function"]["parameters"]
-            params["properties"].pop(__CTX_VARS_NAME__, None)
-            if __CTX_VARS_NAME__ in params["required"]:
-                params["required"].remove(__CTX_VARS_NAME__)
-
-        # チャットコンプリートの生成パラメータを設定
-        create_params = {
-            "model": model_override or agent.model,
-            "messages": messages,
-            "tools": tools or None,
-            "tool_choice": agent.tool_choice,
-            "stream": stream,
-        }
+    # モデルに対応するクライアントを返すメソッド
+    # 接続プールにモデルのベース URL があれば、そのベース URL のクライアントを使います。
+    def completion_client(self, model: str):
+        if self.pool is not None and self.pool.base_url(model):
+            return self.pool.client(model, self.pool_max_retries())
+        return self.client
+
+    # クライアントにリクエストを送るメソッド（レイテンシポリシーがあればヘッジと再試行を行う）
+    def request_completion(self, client, create_params: dict):
+        policy = self.latency_policy
+        if policy is None:
+            return client.chat.completions.create(**create_params)
+        if policy.timeout is not None:
+            create_params = {**create_params, "timeout": policy.timeout}
+        return policy.call(
+            (create_params["model"], create_params["stream"]),
+            lambda: client.chat.completions.create(**create_params),
+        )
+
+    # チャットコンプリートを生成するメソッド（キャッシュがあれば利用する）
+    def create_completion(self, create_params: dict, debug: bool):
+        client = self.completion_client(create_params["model"])
+        cache = self.completion_cache
+        if cache is None:
+            return self.request_completion(client, create_params)
 
-        # ツールがある場合、並列ツール呼び出しを設定
-        if tools:
-            create_params["parallel_tool_calls"] = agent.parallel_tool_calls
+        # キャッシュにあれば再利用し、ストリーミングの場合は合成チャンクとして再生する
+        # （リクエストを送らないため、どちらの場合も usage は含めない）
+        key = completion_cache_key(create_params)
+        cached = cache.get(key)
+        if cached is not None:
+            debug_print(debug, "キャッシュされたコンプリートを使用します。")
+            if create_params["stream"]:
+                return iter(completion_to_chunks(cached))
+            return cached.model_copy(update={"usage": None})
+        completion = self.request_completion(client, create_params)
+        if create_params["stream"]:
+            return cache.record_stream(key, completion)
+        cache.set(key, completion)
+        return completion
 
-        return self.client.chat.completions.create(**create_params)
+    # エージェントのカスケードに従ってコンプリートを生成するメソッド
+    # 小さいモデルの結果を採用した場合、ストリーミングでは合成チャンク（最後のチャンクに
+    # usage を含む）として返します。エスカレートした場合は、小さいモデルの usage を
+    # usage に1ターンとして加えます。
+    def cascade_completion(
+        self,
+        agent: Agent,
+        create_params: dict,
+        debug: bool,
+        span,
+        usage: Optional[TokenUsage] = None,
+    ):
+        cascade = agent.cascade
+        start = time.perf_counter()
+        draft = self.create_completion(cascade.draft_params(create_params), debug)
+        draft_seconds = time.perf_counter() - start
+        accepted = cascade.accepts(draft, create_params["tools"] or [])
+        span.set_attribute("swarm.cascade.model", cascade.model)
+        span.set_attribute("swarm.cascade.accepted", accepted)
+        if accepted:
+            debug_print(debug, f"{cascade.model} の結果を採用しました。")
+            cascade.record(agent.name, True, draft_seconds)
+            if create_params["stream"]:
+                return iter(completion_to_chunks(draft, include_usage=True))
+            return draft
+
+        debug_print(debug, f"{create_params['model']} にエスカレートします。")
+        if usage is not None:
+            usage.add(
+                getattr(draft, "usage", None), agent.name, cascade.model, draft_seconds
+            )
+        start = time.perf_counter()
+        completion = self.create_completion(create_params, debug)
+        cascade.record(
+            agent.name, False, draft_seconds, time.perf_counter() - start
+        )
+        return completion
+
+    # チャットコンプリートのスパンを開始するメソッド
+    def start_completion_span(self, agent: Agent, create_params: dict, parent):
+        completion_span = self.start_span(
+            "swarm.chat_completion",
+            parent,
+            kind=SPAN_KIND_CLIENT,
+            **{
+                "swarm.agent": agent.name,
+                "gen_ai.request.model": create_params["model"],
+                "swarm.message_count": len(create_params["messages"]),
+                "swarm.tool_count": len(create_params["tools"] or ()),
+                "swarm.stream": create_params["stream"],
+            },
+        )
+        if completion_span is not NULL_SPAN:
+            completion_span.set_attribute(
+                "swarm.request_bytes",
+                len(json.dumps(create_params["messages"], default=str).encode("utf-8"))
+                + len(self.tool_cache.compile(agent.functions).payload()),
+            )
+        return completion_span
 
     # 関数の結果を処理するメソッド
     def handle_function_result(self, result, debug) -> Result:
@@ -92,57 +527,337 @@ class Swarm:
                     debug_print(debug, error_message)
                     raise TypeError(error_message)
 
+    # ツール呼び出しを解決し、関数と引数を取り出すメソッド
+    # ツールが見つからない場合はエラーメッセージを返します。
+    def prepare_tool_call(
+        self,
+        tool_call: "ChatCompletionMessageToolCall",
+        compiled: CompiledTools,
+        context_variables: dict,
+        debug: bool,
+    ):
+        name = tool_call.function.name
+        # ツールが見つからない場合の処理
+        if name not in compiled.function_map:
+            debug_print(debug, f"ツール {name} が関数マップに見つかりません。")
+            return None, None, tool_message(
+                tool_call, name, f"エラー: ツール {name} が見つかりません。"
+            )
+        args = json.loads(tool_call.function.arguments)
+        debug_print(debug, f"ツール呼び出しを処理中: {name} 引数 {args}")
+
+        func = compiled.function_map[name]
+        # コンテキスト変数を通常の辞書（浅いコピー）としてエージェント関数に渡す
+        # 関数が最上位のキーに書き込んだ値は、apply_function_result で会話に反映します。
+        if name in compiled.context_functions:
+            args[__CTX_VARS_NAME__] = dict(context_variables)
+        return func, args, None
+
+    # 関数の結果を部分レスポンスに反映するメソッド
+    # args を指定した場合は、関数がコンテキスト変数の辞書に直接書き込んだ値も反映します
+    # （Result の context_variables が優先）。
+    def apply_function_result(
+        self,
+        partial_response: Response,
+        tool_call: "ChatCompletionMessageToolCall",
+        raw_result,
+        debug: bool,
+        context_variables: dict = None,
+        args: dict = None,
+    ) -> None:
+        passed = args.get(__CTX_VARS_NAME__) if args else None
+        if passed is not None:
+            # 値が同じオブジェクトのままのキーは変更されていないものとする
+            for key, value in passed.items():
+                if key not in context_variables or context_variables[key] is not value:
+                    partial_response.context_variables[key] = value
+        result: Result = self.handle_function_result(raw_result, debug)
+        partial_response.messages.append(
+            tool_message(tool_call, tool_call.function.name, result.value)
+        )
+        partial_response.context_variables.update(result.context_variables)
+        if result.agent:
+            partial_response.agent = result.agent
+
+    # ツール呼び出しのスパンを開始するメソッド
+    def start_tool_span(self, tool_call: "ChatCompletionMessageToolCall", parent):
+        return self.start_span(
+            "swarm.tool",
+            parent,
+            **{
+                "swarm.tool.name": tool_call.function.name,
+                "swarm.tool.call_id": tool_call.id,
+                "swarm.tool.arguments_bytes": len(tool_call.function.arguments),
+            },
+        )
+
+    # メモ化された関数の保存済みの結果を探すメソッド
+    # スパンには swarm.tool.cache として hit、miss、bypass（メモ化できない呼び出し）を記録します。
+    def lookup_memo(self, memo: FunctionMemo, func, args: dict, span):
+        key, cached = memo.lookup(func, args)
+        if key is None:
+            span.set_attribute("swarm.tool.cache", "bypass")
+        else:
+            status = "miss" if cached is None else "hit"
+            span.set_attribute("swarm.tool.cache", status)
+        return key, cached
+
+    # エージェント関数を呼び出し、スパンを記録するメソッド
+    # memoize を指定した関数は、保存済みの結果があれば呼び出さずにそれを返します。
+    def call_tool(self, tool_call, func, args: dict, span=None):
+        with self.start_tool_span(tool_call, span) as tool_span:
+            memo = memo_of(func)
+            if memo is None:
+                return self.invoke_function(func, args)
+            key, cached = self.lookup_memo(memo, func, args, tool_span)
+            if cached is not None:
+                return cached
+            raw_result = self.invoke_function(func, args)
+            memo.store(key, raw_result)
+            return raw_result
+
+    # エージェント関数を呼び出すメソッド（run_in_process を指定した関数はプロセスプールで実行）
+    # async def の関数（awaitable を返す関数）は、完了まで実行した結果を返します。
+    def invoke_function(self, func, args: dict):
+        if runs_in_process(func):
+            packed = self.process_executor().submit(
+                call_in_process, func, process_args(args)
+            )
+            return unpack_result(func, packed.result(), self.known_agents())
+        raw_result = func(**args)
+        if inspect.isawaitable(raw_result):
+            raw_result = self.wait_awaitable(raw_result)
+        return raw_result
+
+    # awaitable を新しいイベントループで完了まで実行するメソッド
+    # 呼び出し元のスレッドでイベントループが動いている場合は、ツール用のスレッドで実行します。
+    def wait_awaitable(self, awaitable):
+        async def wait():
+            return await awaitable
+
+        if running_loop() is None:
+            return asyncio.run(wait())
+        return self.tool_executor().submit(asyncio.run, wait()).result()
+
+    # async def のエージェント関数を新しいイベントループで呼び出すメソッド
+    def run_tool_coroutine(self, tool_call, func, args: dict, span=None):
+        return asyncio.run(self.acall_tool(tool_call, func, args, span))
+
+    # エージェント関数を非同期で呼び出し、スパンを記録するメソッド
+    async def acall_tool(self, tool_call, func, args: dict, span=None):
+        with self.start_tool_span(tool_call, span) as tool_span:
+            memo = memo_of(func)
+            if memo is None:
+                return await self.call_function(func, args)
+            key, cached = self.lookup_memo(memo, func, args, tool_span)
+            if cached is not None:
+                return cached
+            raw_result = await self.call_function(func, args)
+            memo.store(key, raw_result)
+            return raw_result
+
+    # エージェント関数を非同期で呼び出すメソッド
+    # async def の関数はそのまま await し、同期関数はツール用のスレッドプールで実行します。
+    # run_in_process を指定した関数はプロセスプールで実行します。
+    async def call_function(self, func, args: dict):
+        loop = asyncio.get_running_loop()
+        if runs_in_process(func):
+            packed = await loop.run_in_executor(
+                self.process_executor(), call_in_process, func, process_args(args)
+            )
+            return unpack_result(func, packed, self.known_agents())
+        if inspect.iscoroutinefunction(func):
+            return await func(**args)
+        raw_result = await loop.run_in_executor(
+            self.tool_executor(), functools.partial(func, **args)
+        )
+        if inspect.isawaitable(raw_result):
+            raw_result = await raw_result
+        return raw_result
+
     # ツール呼び出しを処理するメソッド
     def handle_tool_calls(
         self,
-        tool_calls: List[ChatCompletionMessageToolCall],
+        tool_calls: List["ChatCompletionMessageToolCall"],
         functions: List[AgentFunction],
         context_variables: dict,
         debug: bool,
+        span=None,
+        started: dict = None,
     ) -> Response:
-        # 関数名と対応する関数のマッピングを作成
-        function_map = {f.__name__: f for f in functions}
+        # 関数名と対応する関数のマッピングを取得
+        compiled = self.tool_cache.compile(functions)
         partial_response = Response(messages=[], agent=None, context_variables={})
 
+        if started:
+            return self.join_eager_tool_calls(
+                tool_calls, compiled, context_variables, debug, span, started
+            )
+
+        if self.concurrent_tool_calls and len(tool_calls) > 1:
+            return self.handle_tool_calls_concurrently(
+                tool_calls, compiled, context_variables, debug, span
+            )
+
         for tool_call in tool_calls:
-            name = tool_call.function.name
-            # ツールが見つからない場合の処理
-            if name not in function_map:
-                debug_print(debug, f"ツール {name} が関数マップに見つかりません。")
-                partial_response.messages.append(
-                    {
-                        "role": "tool",
-                        "tool_call_id": tool_call.id,
-                        "tool_name": name,
-                        "content": f"エラー: ツール {name} が見つかりません。",
-                    }
+            func, args, error = self.prepare_tool_call(
+                tool_call, compiled, context_variables, debug
+            )
+            if error:
+                partial_response.messages.append(error)
+                continue
+            raw_result = self.call_tool(tool_call, func, args, span)
+            self.apply_function_result(
+                partial_response, tool_call, raw_result, debug, context_variables, args
+            )
+
+        return partial_response
+
+    # 複数のツール呼び出しを並行して処理するメソッド
+    # 同期関数はスレッドプールで、async def の関数は1つのイベントループ上でまとめて実行します。
+    # 結果はツール呼び出しの順に反映するため、メッセージの順序、コンテキスト変数の
+    # マージ、エージェントの引き継ぎ（最後のものが優先）は逐次実行と同じになります。
+    def handle_tool_calls_concurrently(
+        self,
+        tool_calls: List["ChatCompletionMessageToolCall"],
+        compiled: CompiledTools,
+        context_variables: dict,
+        debug: bool,
+        span=None,
+    ) -> Response:
+        partial_response = Response(messages=[], agent=None, context_variables={})
+        prepared = [
+            self.prepare_tool_call(tool_call, compiled, context_variables, debug)
+            for tool_call in tool_calls
+        ]
+        executor = self.tool_executor()
+
+        futures = {}
+        coroutine_calls = []
+        for index, (tool_call, (func, args, error)) in enumerate(
+            zip(tool_calls, prepared)
+        ):
+            if error:
+                continue
+            if inspect.iscoroutinefunction(func) and not runs_in_process(func):
+                coroutine_calls.append((index, tool_call, func, args))
+            else:
+                futures[index] = executor.submit(
+                    self.call_tool, tool_call, func, args, span
                 )
+
+        raw_results = {}
+        if coroutine_calls:
+
+            async def gather():
+                return await asyncio.gather(
+                    *[
+                        self.acall_tool(tool_call, func, args, span)
+                        for _, tool_call, func, args in coroutine_calls
+                    ],
+                    return_exceptions=True,
+                )
+
+            # 呼び出し元でイベントループが動いていても実行できるよう、別スレッドで実行する
+            coroutine_results = executor.submit(asyncio.run, gather()).result()
+            for call, raw_result in zip(coroutine_calls, coroutine_results):
+                raw_results[call[0]] = raw_result
+
+        for index, (tool_call, (_, args, error)) in enumerate(
+            zip(tool_calls, prepared)
+        ):
+            if error:
+                partial_response.messages.append(error)
                 continue
-            args = json.loads(tool_call.function.arguments)
-            debug_print(debug, f"ツール呼び出しを処理中: {name} 引数 {args}")
-
-            func = function_map[name]
-            # コンテキスト変数をエージェント関数に渡す
-            if __CTX_VARS_NAME__ in func.__code__.co_varnames:
-                args[__CTX_VARS_NAME__] = context_variables
-            raw_result = function_map[name](**args)
-
-            result: Result = self.handle_function_result(raw_result, debug)
-            partial_response.messages.append(
-                {
-                    "role": "tool",
-                    "tool_call_id": tool_call.id,
-                    "tool_name": name,
-                    "content": result.value,
-                }
+            if index in futures:
+                raw_result = futures[index].result()
+            else:
+                raw_result = raw_results[index]
+                if isinstance(raw_result, BaseException):
+                    raise raw_result
+            self.apply_function_result(
+                partial_response, tool_call, raw_result, debug, context_variables, args
+            )
+
+        return partial_response
+
+    # 引数が確定したツール呼び出しを、ストリームの途中でツール用のスレッドプールに投入するメソッド
+    # 引数が閉じ、次のツール呼び出しが始まった（final=True の場合はストリームが終わった）
+    # 呼び出しだけを投入するため、投入した後に引数が変わることはありません。
+    # started にはツール呼び出しの id ごとに (Future, 引数) を記録します。
+    # 見つからないツールの呼び出しは投入せず、ストリームの後で通常どおり処理します。
+    def start_eager_tool_calls(
+        self,
+        accumulator: StreamAccumulator,
+        functions: List[AgentFunction],
+        context_variables: dict,
+        debug: bool,
+        span,
+        started: dict,
+        final: bool = False,
+    ) -> None:
+        closed = accumulator.closed_tool_calls(final)
+        if not closed:
+            return
+        compiled = self.tool_cache.compile(functions)
+        executor = self.tool_executor()
+        for tool_call in tool_call_objects({"tool_calls": closed}):
+            func, args, error = self.prepare_tool_call(
+                tool_call, compiled, context_variables, debug
             )
-            partial_response.context_variables.update(result.context_variables)
-            if result.agent:
-                partial_response.agent = result.agent
+            if error:
+                continue
+            debug_print(debug, f"ツール {tool_call.function.name} を先に実行します。")
+            if inspect.iscoroutinefunction(func) and not runs_in_process(func):
+                # コルーチンはスレッドの中で作成する（取り消した場合に未実行のまま残さない）
+                future = executor.submit(
+                    self.run_tool_coroutine, tool_call, func, args, span
+                )
+            else:
+                future = executor.submit(self.call_tool, tool_call, func, args, span)
+            started[tool_call.id] = (future, args)
 
+    # 先に実行したツール呼び出しの結果を、ツール呼び出しの順に反映するメソッド
+    # 実行していない呼び出しはここで実行します（先に実行した呼び出しは実行し直しません）。
+    def join_eager_tool_calls(
+        self,
+        tool_calls: List["ChatCompletionMessageToolCall"],
+        compiled: CompiledTools,
+        context_variables: dict,
+        debug: bool,
+        span,
+        started: dict,
+    ) -> Response:
+        partial_response = Response(messages=[], agent=None, context_variables={})
+        for tool_call in tool_calls:
+            future, args = started.get(tool_call.id, (None, None))
+            if future is not None:
+                raw_result = future.result()
+            else:
+                func, args, error = self.prepare_tool_call(
+                    tool_call, compiled, context_variables, debug
+                )
+                if error:
+                    partial_response.messages.append(error)
+                    continue
+                raw_result = self.call_tool(tool_call, func, args, span)
+            self.apply_function_result(
+                partial_response, tool_call, raw_result, debug, context_variables, args
+            )
         return partial_response
 
+    # 先に投入したツール呼び出しのうち、まだ始まっていないものを取り消すメソッド
+    # ストリームやツールが例外を送出した場合に、結果を反映しない呼び出しを残さないためです。
+    @staticmethod
+    def cancel_eager_tool_calls(started: dict) -> None:
+        for future, _ in started.values():
+            future.cancel()
+
     # デモループを実行し、ストリーミング対応で返すメソッド
+    # eager_tool_calls を指定した場合は、引数が閉じたツール呼び出しをストリームの途中で
+    # 実行し始め、ツールの実行とモデルの生成を重ねます。
+    # argument_events=True の場合は、ツール呼び出しの差分の後に、引数を解析したイベント
+    # {"arguments": {"index": ..., "events": [JSONEvent, ...]}} も返します。
     def run_and_stream(
         self,
         agent: Agent,
@@ -152,87 +867,130 @@ class Swarm:
         debug: bool = False,
         max_turns: int = float("inf"),
         execute_tools: bool = True,
+        session: Session = None,
+        argument_events: bool = False,
     ):
-        active_agent = agent
-        context_variables = copy.deepcopy(context_variables)
-        history = copy.deepcopy(messages)
-        init_len = len(messages)
-
-        while len(history) - init_len < max_turns:
-
-            message = {
-                "content": "",
-                "sender": agent.name,
-                "role": "assistant",
-                "function_call": None,
-                "tool_calls": defaultdict(
-                    lambda: {
-                        "function": {"arguments": "", "name": ""},
-                        "id": "",
-                        "type": "",
-                    }
-                ),
-            }
-
-            # 現在の履歴とエージェントでコンプリートを取得
-            completion = self.get_chat_completion(
-                agent=active_agent,
-                history=history,
-                context_variables=context_variables,
-                model_override=model_override,
-                stream=True,
-                debug=debug,
+        run_span = self.start_span(
+            "swarm.run", **{"swarm.agent": agent.name, "swarm.stream": True}
+        )
+        with run_span:
+            active_agent = agent
+            history, context_variables = self.start_history(
+                agent, messages, context_variables, session
             )
+            init_len = len(history)
+            usage = TokenUsage()
+            eager = self.eager_tool_calls and execute_tools
 
-            yield {"delim": "start"}
-            for chunk in completion:
-                delta = json.loads(chunk.choices[0].delta.json())
-                if delta["role"] == "assistant":
-                    delta["sender"] = active_agent.name
-                yield delta
-                delta.pop("role", None)
-                delta.pop("sender", None)
-                merge_chunk(message, delta)
-            yield {"delim": "end"}
-
-            message["tool_calls"] = list(message.get("tool_calls", {}).values())
-            if not message["tool_calls"]:
-                message["tool_calls"] = None
-            debug_print(debug, "コンプリートを受信:", message)
-            history.append(message)
-
-            if not message["tool_calls"] or not execute_tools:
-                debug_print(debug, "ターンを終了します。")
-                break
-
-            # ツール呼び出しをオブジェクトに変換
-            tool_calls = []
-            for tool_call in message["tool_calls"]:
-                function = Function(
-                    arguments=tool_call["function"]["arguments"],
-                    name=tool_call["function"]["name"],
-                )
-                tool_call_object = ChatCompletionMessageToolCall(
-                    id=tool_call["id"], function=function, type=tool_call["type"]
-                )
-                tool_calls.append(tool_call_object)
+            started = {}
+            try:
+                while len(history) - init_len < max_turns:
 
-            # 関数呼び出しを処理し、コンテキスト変数を更新し、エージェントを切り替える
-            partial_response = self.handle_tool_calls(
-                tool_calls, active_agent.functions, context_variables, debug
-            )
-            history.extend(partial_response.messages)
-            context_variables.update(partial_response.context_variables)
-            if partial_response.agent:
-                active_agent = partial_response.agent
-
-        yield {
-            "response": Response(
-                messages=history[init_len:],
+                    accumulator = StreamAccumulator(
+                        active_agent.name, parse_arguments=eager or argument_events
+                    )
+                    started = {}
+                    turn_start = time.perf_counter()
+                    turn_usage, turn_model = None, model_override or active_agent.model
+
+                    # 現在の履歴とエージェントでコンプリートを取得
+                    completion = self.get_chat_completion(
+                        agent=active_agent,
+                        history=history,
+                        context_variables=context_variables,
+                        model_override=model_override,
+                        stream=True,
+                        debug=debug,
+                        span=run_span,
+                        usage=usage,
+                    )
+
+                    yield {"delim": "start", "sender": active_agent.name}
+                    for chunk in completion:
+                        # usage は最後のチャンクにだけ含まれる（stream_options で要求する）
+                        if chunk.usage is not None:
+                            turn_usage, turn_model = chunk.usage, chunk.model
+                        # usage のみのチャンクなど、差分を含まないものは読み飛ばす
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta
+                        yield stream_event(delta, active_agent)
+                        accumulator.add(delta)
+                        if argument_events and delta.tool_calls:
+                            for index, events in accumulator.argument_events():
+                                yield {"arguments": {"index": index, "events": events}}
+                        finish_reason = chunk.choices[0].finish_reason
+                        if eager and (delta.tool_calls or finish_reason):
+                            self.start_eager_tool_calls(
+                                accumulator,
+                                active_agent.functions,
+                                context_variables,
+                                debug,
+                                run_span,
+                                started,
+                                final=finish_reason is not None,
+                            )
+                    usage.add(
+                        turn_usage,
+                        active_agent.name,
+                        turn_model,
+                        time.perf_counter() - turn_start,
+                    )
+                    yield {"delim": "end"}
+
+                    message = accumulator.message()
+                    debug_print(debug, "コンプリートを受信:", message)
+                    history.append(message)
+
+                    if not message["tool_calls"] or not execute_tools:
+                        debug_print(debug, "ターンを終了します。")
+                        break
+
+                    # ツール呼び出しをオブジェクトに変換
+                    tool_calls = tool_call_objects(message)
+
+                    # 関数呼び出しを処理し、コンテキスト変数を更新し、エージェントを切り替える
+                    partial_response = self.handle_tool_calls(
+                        tool_calls,
+                        active_agent.functions,
+                        context_variables,
+                        debug,
+                        run_span,
+                        started,
+                    )
+                    active_agent = self.apply_partial_response(
+                        partial_response,
+                        active_agent,
+                        history,
+                        context_variables,
+                        run_span,
+                    )
+            finally:
+                # 反映されなかった先行実行のツール呼び出しを取り消す
+                self.cancel_eager_tool_calls(started)
+
+            response = Response(
+                messages=wire_messages(history[init_len:]),
                 agent=active_agent,
-                context_variables=context_variables,
+                context_variables=context_variables.to_dict(),
+                usage=usage,
             )
-        }
+            self.record_response(run_span, response)
+        yield {"response": response}
+
+    # 会話ループを実行し、型付きのイベント（swarm.events）を返すメソッド
+    # 引数は run_and_stream と同じで、coalescer を指定すると連続する差分をまとめます。
+    def stream_events(
+        self,
+        agent: Agent,
+        messages: List,
+        coalescer: DeltaCoalescer = None,
+        **kwargs,
+    ):
+        events = typed_events(
+            self.run_and_stream(agent=agent, messages=messages, **kwargs)
+        )
+        return events if coalescer is None else coalescer.apply(events)
 
     # デモループを実行するメソッド（ストリーミングなし）
     def run(
@@ -245,6 +1003,7 @@ class Swarm:
         debug: bool = False,
         max_turns: int = float("inf"),
         execute_tools: bool = True,
+        session: Session = None,
     ) -> Response:
         if stream:
             return self.run_and_stream(
@@ -255,43 +1014,746 @@ class Swarm:
                 debug=debug,
                 max_turns=max_turns,
                 execute_tools=execute_tools,
+                session=session,
+            )
+        run_span = self.start_span(
+            "swarm.run", **{"swarm.agent": agent.name, "swarm.stream": False}
+        )
+        with run_span:
+            active_agent = agent
+            history, context_variables = self.start_history(
+                agent, messages, context_variables, session
+            )
+            init_len = len(history)
+            usage = TokenUsage()
+
+            while len(history) - init_len < max_turns and active_agent:
+
+                # 現在の履歴とエージェントでコンプリートを取得
+                turn_start = time.perf_counter()
+                completion = self.get_chat_completion(
+                    agent=active_agent,
+                    history=history,
+                    context_variables=context_variables,
+                    model_override=model_override,
+                    stream=stream,
+                    debug=debug,
+                    span=run_span,
+                    usage=usage,
+                )
+                usage.add(
+                    getattr(completion, "usage", None),
+                    active_agent.name,
+                    completion.model,
+                    time.perf_counter() - turn_start,
+                )
+                message = completion.choices[0].message
+                debug_print(debug, "コンプリートを受信:", message)
+                history.append(Message.from_completion(message, active_agent.name))
+
+                if not message.tool_calls or not execute_tools:
+                    debug_print(debug, "ターンを終了します。")
+                    break
+
+                # 関数呼び出しを処理し、コンテキスト変数を更新し、エージェントを切り替える
+                partial_response = self.handle_tool_calls(
+                    message.tool_calls,
+                    active_agent.functions,
+                    context_variables,
+                    debug,
+                    run_span,
+                )
+                active_agent = self.apply_partial_response(
+                    partial_response, active_agent, history, context_variables, run_span
+                )
+
+            response = Response(
+                messages=wire_messages(history[init_len:]),
+                agent=active_agent,
+                context_variables=context_variables.to_dict(),
+                usage=usage,
+            )
+            self.record_response(run_span, response)
+        return response
+
+    # 会話ループの開始時に履歴とコンテキスト変数を用意するメソッド
+    # session を指定した場合は保存済みの履歴の後に messages を追記し、
+    # 以降の追記とコンテキスト変数の変更をセッションのログに記録します。
+    def start_history(
+        self,
+        agent: Agent,
+        messages: List,
+        context_variables: dict,
+        session: Session = None,
+    ):
+        # 履歴とコンテキスト変数はコピーせず、追記・書き込みだけを分離する
+        if session is None:
+            return History(messages), ContextVariables.from_mapping(context_variables)
+        session.update_context(context_variables)
+        session.set_agent(agent.name)
+        history = session.history()
+        history.extend(messages)
+        return history, ContextVariables.from_mapping(session.context_variables)
+
+    # ツール呼び出しの結果を履歴とコンテキスト変数に反映し、次のエージェントを返すメソッド
+    def apply_partial_response(
+        self,
+        partial_response: Response,
+        active_agent: Agent,
+        history: History,
+        context_variables: ContextVariables,
+        span=None,
+    ) -> Agent:
+        history.extend(partial_response.messages)
+        context_variables.update(partial_response.context_variables)
+        if isinstance(history, SessionHistory):
+            history.session.update_context(partial_response.context_variables)
+        if not partial_response.agent:
+            return active_agent
+        if isinstance(history, SessionHistory):
+            history.session.set_agent(partial_response.agent.name)
+        self.start_span(
+            "swarm.handoff",
+            span,
+            **{
+                "swarm.agent": active_agent.name,
+                "swarm.handoff.to": partial_response.agent.name,
+            },
+        ).end()
+        return partial_response.agent
+
+    # 会話ループのスパンに結果を記録するメソッド
+    def record_response(self, run_span, response: Response) -> None:
+        run_span.set_attribute("swarm.new_messages", len(response.messages))
+        usage = response.usage
+        run_span.set_attribute("gen_ai.usage.input_tokens", usage.prompt_tokens)
+        run_span.set_attribute("gen_ai.usage.output_tokens", usage.completion_tokens)
+        run_span.set_attribute("swarm.usage.cached_tokens", usage.cached_tokens)
+        run_span.set_attribute(
+            "swarm.turns",
+            sum(1 for m in response.messages if m.get("role") == "assistant"),
+        )
+        if response.agent:
+            run_span.set_attribute("swarm.final_agent", response.agent.name)
+
+    # バッチ実行の1件のジョブを実行するメソッド
+    def run_job(self, job, defaults: dict) -> Response:
+        return self.run(**job_kwargs(job, defaults))
+
+    # 複数の会話を並行して実行し、終わったものから (index, 結果) を返すメソッド
+    # 結果は Response、またはそのジョブで発生した例外です（バッチ全体は中断しません）。
+    # on_progress(完了数, 総数) は完了のたびに呼び出されます（総数が不明な場合は None）。
+    def run_many_as_completed(
+        self,
+        jobs: Iterable,
+        max_concurrency: int = 8,
+        on_progress: Callable[[int, int], None] = None,
+        **kwargs,
+    ):
+        total = len(jobs) if hasattr(jobs, "__len__") else None
+        job_iter = enumerate(jobs)
+        pending = {}
+        completed = 0
+
+        with ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="swarm-run"
+        ) as executor:
+
+            # 実行中のジョブが max_concurrency 件になるまで投入する
+            def fill():
+                while len(pending) < max_concurrency:
+                    item = next(job_iter, None)
+                    if item is None:
+                        return
+                    index, job = item
+                    pending[executor.submit(self.run_job, job, kwargs)] = index
+
+            fill()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    error = future.exception()
+                    completed += 1
+                    fill()
+                    if on_progress:
+                        on_progress(completed, total)
+                    yield index, error if error else future.result()
+
+    # 複数の会話を並行して実行し、入力と同じ順序で結果のリストを返すメソッド
+    def run_many(
+        self,
+        jobs: Iterable,
+        max_concurrency: int = 8,
+        on_progress: Callable[[int, int], None] = None,
+        **kwargs,
+    ) -> List[Union[Response, Exception]]:
+        results = dict(
+            self.run_many_as_completed(jobs, max_concurrency, on_progress, **kwargs)
+        )
+        return [results[index] for index in range(len(results))]
+
+
+# AsyncSwarmクラス
+# AsyncOpenAIクライアントを使い、1つのイベントループ上で多数の会話を並行して処理します。
+class AsyncSwarm(Swarm):
+    # 非同期 OpenAI クライアント
+    # 指定がなければ、接続プールから実行中のイベントループのクライアントを返します
+    # （接続はイベントループに属するため、インスタンスには保持しない）。
+    @property
+    def client(self):
+        if self._client is None:
+            return self.new_client()
+        return self._client
+
+    @client.setter
+    def client(self, client) -> None:
+        self._client = client
+
+    # 接続プールから非同期 OpenAI クライアントを作成するメソッド
+    def new_client(self):
+        return self.pool.async_client(max_retries=self.pool_max_retries())
+
+    # モデルに対応する非同期クライアントを返すメソッド
+    def completion_client(self, model: str):
+        if self.pool is not None and self.pool.base_url(model):
+            return self.pool.async_client(model, self.pool_max_retries())
+        return self.client
+
+    # スレッドプールとプロセスプールを、イベントループを止めずに終了するメソッド
+    async def aclose(self) -> None:
+        await asyncio.to_thread(self.close)
+
+    async def __aenter__(self) -> "AsyncSwarm":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    # チャットコンプリートの生成パラメータを非同期で組み立てるメソッド
+    # 履歴ポリシーは要約のためにブロックするリクエストを送ることがあるため、ポリシーがある
+    # 場合は別スレッドで組み立て、イベントループを止めないようにします。
+    async def abuild_create_params(
+        self,
+        agent: Agent,
+        history: List,
+        context_variables: dict,
+        model_override: str,
+        stream: bool,
+        debug: bool,
+    ) -> dict:
+        args = (agent, history, context_variables, model_override, stream, debug)
+        if agent.history_policy is None and self.history_policy is None:
+            return self.build_create_params(*args)
+        return await asyncio.to_thread(self.build_create_params, *args)
+
+    # チャットコンプリートを非同期で取得するメソッド
+    async def get_chat_completion(
+        self,
+        agent: Agent,
+        history: List,
+        context_variables: dict,
+        model_override: str,
+        stream: bool,
+        debug: bool,
+        span=None,
+        usage: Optional[TokenUsage] = None,
+    ) -> "ChatCompletionMessage":
+        create_params = await self.abuild_create_params(
+            agent, history, context_variables, model_override, stream, debug
+        )
+        completion_span = self.start_completion_span(agent, create_params, span)
+        try:
+            if agent.cascade is not None and not model_override:
+                completion = await self.cascade_completion(
+                    agent, create_params, debug, completion_span, usage
+                )
+            else:
+                completion = await self.create_completion(create_params, debug)
+        except Exception as e:
+            completion_span.record_error(e)
+            completion_span.end()
+            raise
+        if completion_span is NULL_SPAN:
+            return completion
+        if stream:
+            return atrace_stream(completion, completion_span)
+        end_completion_span(completion_span, completion)
+        return completion
+
+    # クライアントに非同期でリクエストを送るメソッド
+    async def request_completion(self, client, create_params: dict):
+        policy = self.latency_policy
+        if policy is None:
+            return await client.chat.completions.create(**create_params)
+        if policy.timeout is not None:
+            create_params = {**create_params, "timeout": policy.timeout}
+        return await policy.acall(
+            (create_params["model"], create_params["stream"]),
+            lambda: client.chat.completions.create(**create_params),
+        )
+
+    # エージェントのカスケードに従ってコンプリートを非同期で生成するメソッド
+    async def cascade_completion(
+        self,
+        agent: Agent,
+        create_params: dict,
+        debug: bool,
+        span,
+        usage: Optional[TokenUsage] = None,
+    ):
+        cascade = agent.cascade
+        start = time.perf_counter()
+        draft = await self.create_completion(cascade.draft_params(create_params), debug)
+        draft_seconds = time.perf_counter() - start
+        accepted = cascade.accepts(draft, create_params["tools"] or [])
+        span.set_attribute("swarm.cascade.model", cascade.model)
+        span.set_attribute("swarm.cascade.accepted", accepted)
+        if accepted:
+            debug_print(debug, f"{cascade.model} の結果を採用しました。")
+            cascade.record(agent.name, True, draft_seconds)
+            if create_params["stream"]:
+                return aiter_chunks(completion_to_chunks(draft, include_usage=True))
+            return draft
+
+        debug_print(debug, f"{create_params['model']} にエスカレートします。")
+        if usage is not None:
+            usage.add(
+                getattr(draft, "usage", None), agent.name, cascade.model, draft_seconds
+            )
+        start = time.perf_counter()
+        completion = await self.create_completion(create_params, debug)
+        cascade.record(
+            agent.name, False, draft_seconds, time.perf_counter() - start
+        )
+        return completion
+
+    # チャットコンプリートを非同期で生成するメソッド（キャッシュがあれば利用する）
+    async def create_completion(self, create_params: dict, debug: bool):
+        client = self.completion_client(create_params["model"])
+        cache = self.completion_cache
+        if cache is None:
+            return await self.request_completion(client, create_params)
+
+        # キャッシュにあれば再利用し、ストリーミングの場合は合成チャンクとして再生する
+        # （リクエストを送らないため、どちらの場合も usage は含めない）
+        key = completion_cache_key(create_params)
+        cached = cache.get(key)
+        if cached is not None:
+            debug_print(debug, "キャッシュされたコンプリートを使用します。")
+            if create_params["stream"]:
+                return aiter_chunks(completion_to_chunks(cached))
+            return cached.model_copy(update={"usage": None})
+        completion = await self.request_completion(client, create_params)
+        if create_params["stream"]:
+            return cache.arecord_stream(key, completion)
+        cache.set(key, completion)
+        return completion
+
+    # ツール呼び出しを非同期で処理するメソッド
+    async def handle_tool_calls(
+        self,
+        tool_calls: List["ChatCompletionMessageToolCall"],
+        functions: List[AgentFunction],
+        context_variables: dict,
+        debug: bool,
+        span=None,
+        started: dict = None,
+    ) -> Response:
+        # 関数名と対応する関数のマッピングを取得
+        compiled = self.tool_cache.compile(functions)
+        partial_response = Response(messages=[], agent=None, context_variables={})
+
+        if started:
+            return await self.join_eager_tool_calls(
+                tool_calls, compiled, context_variables, debug, span, started
+            )
+
+        if self.concurrent_tool_calls and len(tool_calls) > 1:
+            # すべての呼び出しを並行して実行し、結果はツール呼び出しの順に反映する
+            prepared = [
+                self.prepare_tool_call(tool_call, compiled, context_variables, debug)
+                for tool_call in tool_calls
+            ]
+            raw_results = await asyncio.gather(
+                *[
+                    self.acall_tool(tool_call, func, args, span)
+                    for tool_call, (func, args, error) in zip(tool_calls, prepared)
+                    if not error
+                ]
+            )
+            raw_results = iter(raw_results)
+            for tool_call, (_, args, error) in zip(tool_calls, prepared):
+                if error:
+                    partial_response.messages.append(error)
+                    continue
+                self.apply_function_result(
+                    partial_response,
+                    tool_call,
+                    next(raw_results),
+                    debug,
+                    context_variables,
+                    args,
+                )
+            return partial_response
+
+        for tool_call in tool_calls:
+            func, args, error = self.prepare_tool_call(
+                tool_call, compiled, context_variables, debug
+            )
+            if error:
+                partial_response.messages.append(error)
+                continue
+            raw_result = await self.acall_tool(tool_call, func, args, span)
+            self.apply_function_result(
+                partial_response, tool_call, raw_result, debug, context_variables, args
             )
-        active_agent = agent
-        context_variables = copy.deepcopy(context_variables)
-        history = copy.deepcopy(messages)
-        init_len = len(messages)
 
-        while len(history) - init_len < max_turns and active_agent:
+        return partial_response
+
+    # 引数が確定したツール呼び出しを、ストリームの途中でタスクとして開始するメソッド
+    # started にはツール呼び出しの id ごとに (タスク, 引数) を記録します。
+    def start_eager_tool_calls(
+        self,
+        accumulator: StreamAccumulator,
+        functions: List[AgentFunction],
+        context_variables: dict,
+        debug: bool,
+        span,
+        started: dict,
+        final: bool = False,
+    ) -> None:
+        closed = accumulator.closed_tool_calls(final)
+        if not closed:
+            return
+        compiled = self.tool_cache.compile(functions)
+        for tool_call in tool_call_objects({"tool_calls": closed}):
+            func, args, error = self.prepare_tool_call(
+                tool_call, compiled, context_variables, debug
+            )
+            if error:
+                continue
+            debug_print(debug, f"ツール {tool_call.function.name} を先に実行します。")
+            task = asyncio.ensure_future(self.acall_tool(tool_call, func, args, span))
+            started[tool_call.id] = (task, args)
+
+    # 先に開始したツール呼び出しの結果を、ツール呼び出しの順に反映するメソッド
+    async def join_eager_tool_calls(
+        self,
+        tool_calls: List["ChatCompletionMessageToolCall"],
+        compiled: CompiledTools,
+        context_variables: dict,
+        debug: bool,
+        span,
+        started: dict,
+    ) -> Response:
+        partial_response = Response(messages=[], agent=None, context_variables={})
+        for tool_call in tool_calls:
+            task, args = started.get(tool_call.id, (None, None))
+            if task is not None:
+                raw_result = await task
+            else:
+                func, args, error = self.prepare_tool_call(
+                    tool_call, compiled, context_variables, debug
+                )
+                if error:
+                    partial_response.messages.append(error)
+                    continue
+                raw_result = await self.acall_tool(tool_call, func, args, span)
+            self.apply_function_result(
+                partial_response, tool_call, raw_result, debug, context_variables, args
+            )
+        return partial_response
+
+    # 先に開始したツール呼び出しのうち、終わっていないタスクを取り消して待つメソッド
+    async def cancel_eager_tool_calls(self, started: dict) -> None:
+        tasks = [task for task, _ in started.values()]
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        # 取り消したタスクと、結果を反映しなかったタスクの例外を回収する
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # 会話ループを非同期で実行し、型付きのイベント（swarm.events）を返すメソッド
+    def astream_events(
+        self,
+        agent: Agent,
+        messages: List,
+        coalescer: DeltaCoalescer = None,
+        **kwargs,
+    ):
+        events = atyped_events(
+            self.arun_and_stream(agent=agent, messages=messages, **kwargs)
+        )
+        return events if coalescer is None else coalescer.aapply(events)
+
+    # 会話ループを非同期で実行し、ストリーミング対応で返すメソッド
+    # eager_tool_calls と argument_events は run_and_stream と同じです。
+    async def arun_and_stream(
+        self,
+        agent: Agent,
+        messages: List,
+        context_variables: dict = {},
+        model_override: str = None,
+        debug: bool = False,
+        max_turns: int = float("inf"),
+        execute_tools: bool = True,
+        session: Session = None,
+        argument_events: bool = False,
+    ):
+        run_span = self.start_span(
+            "swarm.run", **{"swarm.agent": agent.name, "swarm.stream": True}
+        )
+        with run_span:
+            active_agent = agent
+            history, context_variables = self.start_history(
+                agent, messages, context_variables, session
+            )
+            init_len = len(history)
+            usage = TokenUsage()
+            eager = self.eager_tool_calls and execute_tools
+
+            started = {}
+            try:
+                while len(history) - init_len < max_turns:
+
+                    accumulator = StreamAccumulator(
+                        active_agent.name, parse_arguments=eager or argument_events
+                    )
+                    started = {}
+                    turn_start = time.perf_counter()
+                    turn_usage, turn_model = None, model_override or active_agent.model
+
+                    # 現在の履歴とエージェントでコンプリートを取得
+                    completion = await self.get_chat_completion(
+                        agent=active_agent,
+                        history=history,
+                        context_variables=context_variables,
+                        model_override=model_override,
+                        stream=True,
+                        debug=debug,
+                        span=run_span,
+                        usage=usage,
+                    )
+
+                    yield {"delim": "start", "sender": active_agent.name}
+                    async for chunk in completion:
+                        # usage は最後のチャンクにだけ含まれる（stream_options で要求する）
+                        if chunk.usage is not None:
+                            turn_usage, turn_model = chunk.usage, chunk.model
+                        # usage のみのチャンクなど、差分を含まないものは読み飛ばす
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta
+                        yield stream_event(delta, active_agent)
+                        accumulator.add(delta)
+                        if argument_events and delta.tool_calls:
+                            for index, events in accumulator.argument_events():
+                                yield {"arguments": {"index": index, "events": events}}
+                        finish_reason = chunk.choices[0].finish_reason
+                        if eager and (delta.tool_calls or finish_reason):
+                            self.start_eager_tool_calls(
+                                accumulator,
+                                active_agent.functions,
+                                context_variables,
+                                debug,
+                                run_span,
+                                started,
+                                final=finish_reason is not None,
+                            )
+                    usage.add(
+                        turn_usage,
+                        active_agent.name,
+                        turn_model,
+                        time.perf_counter() - turn_start,
+                    )
+                    yield {"delim": "end"}
+
+                    message = accumulator.message()
+                    debug_print(debug, "コンプリートを受信:", message)
+                    history.append(message)
 
-            # 現在の履歴とエージェントでコンプリートを取得
-            completion = self.get_chat_completion(
+                    if not message["tool_calls"] or not execute_tools:
+                        debug_print(debug, "ターンを終了します。")
+                        break
+
+                    # 関数呼び出しを処理し、コンテキスト変数を更新し、エージェントを切り替える
+                    partial_response = await self.handle_tool_calls(
+                        tool_call_objects(message),
+                        active_agent.functions,
+                        context_variables,
+                        debug,
+                        run_span,
+                        started,
+                    )
+                    active_agent = self.apply_partial_response(
+                        partial_response,
+                        active_agent,
+                        history,
+                        context_variables,
+                        run_span,
+                    )
+            finally:
+                # 反映されなかった先行実行のツール呼び出しを取り消す
+                await self.cancel_eager_tool_calls(started)
+
+            response = Response(
+                messages=wire_messages(history[init_len:]),
                 agent=active_agent,
-                history=history,
-                context_variables=context_variables,
-                model_override=model_override,
-                stream=stream,
-                debug=debug,
+                context_variables=context_variables.to_dict(),
+                usage=usage,
             )
-            message = completion.choices[0].message
-            debug_print(debug, "コンプリートを受信:", message)
-            message.sender = active_agent.name
-            history.append(json.loads(message.model_dump_json()))
-
-            if not message.tool_calls or not execute_tools:
-                debug_print(debug, "ターンを終了します。")
-                break
-
-            # 関数呼び出しを処理し、コンテキスト変数を更新し、エージェントを切り替える
-            partial_response = self.handle_tool_calls(
-                message.tool_calls, active_agent.functions, context_variables, debug
+            self.record_response(run_span, response)
+        yield {"response": response}
+
+    # 会話ループを非同期で実行するメソッド（ストリーミングなし）
+    async def arun(
+        self,
+        agent: Agent,
+        messages: List,
+        context_variables: dict = {},
+        model_override: str = None,
+        debug: bool = False,
+        max_turns: int = float("inf"),
+        execute_tools: bool = True,
+        session: Session = None,
+    ) -> Response:
+        run_span = self.start_span(
+            "swarm.run", **{"swarm.agent": agent.name, "swarm.stream": False}
+        )
+        with run_span:
+            active_agent = agent
+            history, context_variables = self.start_history(
+                agent, messages, context_variables, session
+            )
+            init_len = len(history)
+            usage = TokenUsage()
+
+            while len(history) - init_len < max_turns and active_agent:
+
+                # 現在の履歴とエージェントでコンプリートを取得
+                turn_start = time.perf_counter()
+                completion = await self.get_chat_completion(
+                    agent=active_agent,
+                    history=history,
+                    context_variables=context_variables,
+                    model_override=model_override,
+                    stream=False,
+                    debug=debug,
+                    span=run_span,
+                    usage=usage,
+                )
+                usage.add(
+                    getattr(completion, "usage", None),
+                    active_agent.name,
+                    completion.model,
+                    time.perf_counter() - turn_start,
+                )
+                message = completion.choices[0].message
+                debug_print(debug, "コンプリートを受信:", message)
+                history.append(Message.from_completion(message, active_agent.name))
+
+                if not message.tool_calls or not execute_tools:
+                    debug_print(debug, "ターンを終了します。")
+                    break
+
+                # 関数呼び出しを処理し、コンテキスト変数を更新し、エージェントを切り替える
+                partial_response = await self.handle_tool_calls(
+                    message.tool_calls,
+                    active_agent.functions,
+                    context_variables,
+                    debug,
+                    run_span,
+                )
+                active_agent = self.apply_partial_response(
+                    partial_response, active_agent, history, context_variables, run_span
+                )
+
+            response = Response(
+                messages=wire_messages(history[init_len:]),
+                agent=active_agent,
+                context_variables=context_variables.to_dict(),
+                usage=usage,
             )
-            history.extend(partial_response.messages)
-            context_variables.update(partial_response.context_variables)
-            if partial_response.agent:
-                active_agent = partial_response.agent
-
-        return Response(
-            messages=history[init_len:],
-            agent=active_agent,
-            context_variables=context_variables,
+            self.record_response(run_span, response)
+        return response
+
+    # 複数の会話を並行して実行し、終わったものから (index, 結果) を返すメソッド
+    # 結果は Response、またはそのジョブで発生した例外です（バッチ全体は中断しません）。
+    async def arun_many_as_completed(
+        self,
+        jobs: Iterable,
+        max_concurrency: int = 8,
+        on_progress: Callable[[int, int], None] = None,
+        **kwargs,
+    ):
+        total = len(jobs) if hasattr(jobs, "__len__") else None
+        job_iter = enumerate(jobs)
+        pending = {}
+        completed = 0
+
+        async def run_job(job):
+            return await self.arun(**job_kwargs(job, kwargs))
+
+        # 実行中のジョブが max_concurrency 件になるまで投入する
+        def fill():
+            while len(pending) < max_concurrency:
+                item = next(job_iter, None)
+                if item is None:
+                    return
+                index, job = item
+                pending[asyncio.ensure_future(run_job(job))] = index
+
+        fill()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    index = pending.pop(task)
+                    error = task.exception()
+                    completed += 1
+                    fill()
+                    if on_progress:
+                        on_progress(completed, total)
+                    yield index, error if error else task.result()
+        finally:
+            # 途中で反復をやめた場合は残りのジョブをキャンセルする
+            for task in pending:
+                task.cancel()
+
+    # 複数の会話を並行して実行し、入力と同じ順序で結果のリストを返すメソッド
+    async def arun_many(
+        self,
+        jobs: Iterable,
+        max_concurrency: int = 8,
+        on_progress: Callable[[int, int], None] = None,
+        **kwargs,
+    ) -> List[Union[Response, Exception]]:
+        results = {}
+        async for index, result in self.arun_many_as_completed(
+            jobs, max_concurrency, on_progress, **kwargs
+        ):
+            results[index] = result
+        return [results[index] for index in range(len(results))]
+
+    # 同期APIは利用できないことを明示する
+    def run(self, *args, **kwargs):
+        raise TypeError("AsyncSwarm では run の代わりに await arun(...) を使用してください。")
+
+    def run_many(self, *args, **kwargs):
+        raise TypeError(
+            "AsyncSwarm では run_many の代わりに await arun_many(...) を使用してください。"
+        )
+
+    def run_many_as_completed(self, *args, **kwargs):
+        raise TypeError(
+            "AsyncSwarm では run_many_as_completed の代わりに "
+            "arun_many_as_completed(...) を使用してください。"
+        )
+
+    def run_and_stream(self, *args, **kwargs):
+        raise TypeError(
+            "AsyncSwarm では run_and_stream の代わりに arun_and_stream(...) を使用してください。"
         )
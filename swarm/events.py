@@ -0,0 +1,205 @@
+# 標準ライブラリのインポート
+import time
+from collections import namedtuple
+from typing import AsyncIterator, Iterable, Iterator, Optional
+
+# run_and_stream の型付きのイベント
+# agent はいずれもエージェント名です。
+
+# アシスタントのメッセージの content の差分
+ContentDelta = namedtuple("ContentDelta", ["agent", "content"])
+# ツール呼び出しの差分（id と name は最初の差分にだけ含まれる）
+ToolCallDelta = namedtuple(
+    "ToolCallDelta", ["agent", "index", "id", "name", "arguments"]
+)
+# ツール呼び出しの引数を解析したイベント（argument_events=True の場合、JSONEvent のリスト）
+ToolArguments = namedtuple("ToolArguments", ["agent", "index", "events"])
+# エージェントの引き継ぎ
+Handoff = namedtuple("Handoff", ["source", "target"])
+# ターン（1回のコンプリート）の開始と終了（turn は 1 から数える）
+TurnStart = namedtuple("TurnStart", ["agent", "turn"])
+TurnEnd = namedtuple("TurnEnd", ["agent", "turn"])
+# 会話の最終的な Response
+FinalResponse = namedtuple("FinalResponse", ["response"])
+
+
+# run_and_stream の辞書のイベントを型付きのイベントに変換するクラス
+# 引き継ぎは、ターンのエージェント（および最後の Response のエージェント）が前のターンと
+# 変わったときに Handoff として返します。
+class EventConverter:
+    __slots__ = ("agent", "turn")
+
+    def __init__(self):
+        self.agent = None
+        self.turn = 0
+
+    # 1件の辞書のイベントを型付きのイベントのリストに変換するメソッド
+    def convert(self, event: dict) -> list:
+        delim = event.get("delim")
+        if delim == "start":
+            return self.start_turn(event.get("sender") or self.agent)
+        if delim == "end":
+            return [TurnEnd(self.agent, self.turn)]
+        if "response" in event:
+            response = event["response"]
+            events = []
+            if response.agent is not None and self.agent is not None:
+                events.extend(self.handoff(response.agent.name))
+            events.append(FinalResponse(response))
+            return events
+        if "arguments" in event:
+            arguments = event["arguments"]
+            return [ToolArguments(self.agent, arguments["index"], arguments["events"])]
+
+        events = []
+        if event.get("content"):
+            events.append(ContentDelta(self.agent, event["content"]))
+        for tool_call in event.get("tool_calls") or ():
+            function = tool_call.get("function") or {}
+            events.append(
+                ToolCallDelta(
+                    self.agent,
+                    tool_call["index"],
+                    tool_call.get("id"),
+                    function.get("name"),
+                    function.get("arguments") or "",
+                )
+            )
+        return events
+
+    # ターンを開始するメソッド
+    def start_turn(self, agent: Optional[str]) -> list:
+        events = self.handoff(agent) if self.agent is not None else []
+        self.agent = agent
+        self.turn += 1
+        events.append(TurnStart(agent, self.turn))
+        return events
+
+    # エージェントが変わっていれば Handoff を返すメソッド
+    def handoff(self, agent: str) -> list:
+        if agent == self.agent:
+            return []
+        source, self.agent = self.agent, agent
+        return [Handoff(source, agent)]
+
+
+# 辞書のイベントのイテレータを型付きのイベントのイテレータに変換する関数
+def typed_events(stream: Iterable[dict]) -> Iterator:
+    converter = EventConverter()
+    for event in stream:
+        yield from converter.convert(event)
+
+
+# 辞書のイベントの非同期イテレータを型付きのイベントの非同期イテレータに変換する関数
+async def atyped_events(stream) -> AsyncIterator:
+    converter = EventConverter()
+    async for event in stream:
+        for typed in converter.convert(event):
+            yield typed
+
+
+# 連続する差分をまとめるクラス
+# 同じエージェントの ContentDelta、同じツール呼び出しの ToolCallDelta が続く間は1つに
+# まとめ、max_chars 文字以上たまるか、前回返してから interval 秒以上たったときに返します
+# （最初の差分はすぐに返します）。それ以外のイベントの前には、たまった差分を必ず返します。
+# 時間の判定は次のイベントが届いたときに行うため、差分は最大で次のイベントまで待ちます。
+class DeltaCoalescer:
+    __slots__ = ("max_chars", "interval", "_first", "_parts", "_size", "_flushed")
+
+    def __init__(
+        self, max_chars: Optional[int] = 1024, interval: Optional[float] = 0.05
+    ):
+        self.max_chars = max_chars
+        self.interval = interval
+        # まとめている最初の差分と、その後の差分の文字列
+        self._first = None
+        self._parts = []
+        self._size = 0
+        self._flushed = float("-inf")
+
+    # イベントを加え、返すイベントのリストを返すメソッド
+    def add(self, event) -> list:
+        if isinstance(event, ContentDelta):
+            text = event.content
+        elif isinstance(event, ToolCallDelta):
+            text = event.arguments
+        else:
+            events = self.flush()
+            events.append(event)
+            return events
+
+        events = []
+        first = self._first
+        if first is not None and not self.same_target(first, event):
+            events = self.flush()
+        if self._first is None:
+            self._first = event
+        else:
+            self._parts.append(event)
+        self._size += len(text)
+
+        now = time.perf_counter()
+        if (self.max_chars is not None and self._size >= self.max_chars) or (
+            self.interval is not None and now - self._flushed >= self.interval
+        ):
+            events.extend(self.flush(now))
+        return events
+
+    # まとめている差分を返すメソッド
+    def flush(self, now: Optional[float] = None) -> list:
+        first = self._first
+        if first is None:
+            return []
+        parts, self._first, self._parts, self._size = self._parts, None, [], 0
+        self._flushed = time.perf_counter() if now is None else now
+        if not parts:
+            return [first]
+        if isinstance(first, ContentDelta):
+            content = first.content + "".join(p.content for p in parts)
+            return [first._replace(content=content)]
+        return [
+            first._replace(
+                id=first.id or next((p.id for p in parts if p.id), None),
+                name=first.name or next((p.name for p in parts if p.name), None),
+                arguments=first.arguments + "".join(p.arguments for p in parts),
+            )
+        ]
+
+    # 2つの差分が同じ対象（エージェントの content、または同じツール呼び出し）かを返すメソッド
+    @staticmethod
+    def same_target(first, event) -> bool:
+        if type(first) is not type(event) or first.agent != event.agent:
+            return False
+        return isinstance(event, ContentDelta) or first.index == event.index
+
+    # イベントのイテレータの差分をまとめるメソッド
+    def apply(self, events: Iterable) -> Iterator:
+        for event in events:
+            yield from self.add(event)
+        yield from self.flush()
+
+    # イベントの非同期イテレータの差分をまとめるメソッド
+    async def aapply(self, events) -> AsyncIterator:
+        async for event in events:
+            for output in self.add(event):
+                yield output
+        for output in self.flush():
+            yield output
+
+
+# 型付きのイベントの差分をまとめる関数（引数は DeltaCoalescer と同じ）
+def coalesce(
+    events: Iterable,
+    max_chars: Optional[int] = 1024,
+    interval: Optional[float] = 0.05,
+) -> Iterator:
+    return DeltaCoalescer(max_chars, interval).apply(events)
+
+
+# 型付きのイベントの非同期イテレータの差分をまとめる関数
+def acoalesce(
+    events,
+    max_chars: Optional[int] = 1024,
+    interval: Optional[float] = 0.05,
+) -> AsyncIterator:
+    return DeltaCoalescer(max_chars, interval).aapply(events)
@@ -0,0 +1,253 @@
+# 標準ライブラリのインポート
+import inspect
+import re
+from collections import namedtuple
+from types import CodeType
+from typing import Dict, Iterable, List, Optional
+
+# ローカルのインポート
+from .types import Agent
+from .util import CompiledTools, ToolCache
+
+# OpenAI のツール名として使える文字列
+_TOOL_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# tool_choice のうち、関数名ではない値
+_TOOL_CHOICE_MODES = frozenset({"auto", "none", "required"})
+
+# グラフの問題（kind は unreachable、unknown_tool、duplicate_tool、invalid_tool_name、
+# duplicate_agent のいずれか）
+GraphIssue = namedtuple("GraphIssue", ["kind", "agent", "detail"])
+
+
+# グラフに問題がある場合に check() が送出する例外
+class GraphError(ValueError):
+    def __init__(self, issues: List[GraphIssue]):
+        super().__init__(
+            "エージェントのグラフに問題があります:\n"
+            + "\n".join(f"  [{i.kind}] {i.agent}: {i.detail}" for i in issues)
+        )
+        self.issues = issues
+
+
+# 1つのエージェントの、ターンごとに変わらないリクエストの部分
+# system_message は指示が文字列の場合だけ作成し（関数の場合は None）、
+# params は model、tools、tool_choice、parallel_tool_calls を含む生成パラメータです。
+# どちらも共有されるため、呼び出し側で変更してはいけません。
+class AgentTemplate:
+    __slots__ = (
+        "agent",
+        "system_message",
+        "compiled",
+        "params",
+        "handoffs",
+        "_snapshot",
+    )
+
+    def __init__(self, agent: Agent, compiled: CompiledTools, handoffs: List[Agent]):
+        self.agent = agent
+        self.compiled = compiled
+        self.handoffs = handoffs
+        if isinstance(agent.instructions, str):
+            self.system_message = {"role": "system", "content": agent.instructions}
+        else:
+            self.system_message = None
+        self.params = {
+            "model": agent.model,
+            "tools": compiled.tools or None,
+            "tool_choice": agent.tool_choice,
+        }
+        if compiled.tools:
+            self.params["parallel_tool_calls"] = agent.parallel_tool_calls
+        # ツールの JSON を先にシリアライズしておく
+        compiled.payload()
+        self._snapshot = template_snapshot(agent)
+
+    # コンパイルした後にエージェントが変更されていないかどうかを返すメソッド
+    def matches(self, agent: Agent) -> bool:
+        return template_snapshot(agent) == self._snapshot
+
+
+# テンプレートに反映されるエージェントの設定を返す関数
+def template_snapshot(agent: Agent) -> tuple:
+    return (
+        agent.instructions,
+        list(agent.functions),
+        agent.model,
+        agent.tool_choice,
+        agent.parallel_tool_calls,
+    )
+
+
+# 関数が返しうるエージェント（引き継ぎ先）を、呼び出さずに探す関数
+# 関数が参照するグローバル変数、クロージャー、デフォルト引数に含まれる Agent を返します。
+def handoff_targets(func) -> List[Agent]:
+    func = inspect.unwrap(func)
+    code = getattr(func, "__code__", None)
+    if code is None:
+        return []
+    module_globals = getattr(func, "__globals__", {})
+    candidates = [module_globals.get(name) for name in code_names(code)]
+    for cell in func.__closure__ or ():
+        try:
+            candidates.append(cell.cell_contents)
+        except ValueError:
+            continue
+    candidates.extend(func.__defaults__ or ())
+    candidates.extend((func.__kwdefaults__ or {}).values())
+
+    targets, seen = [], set()
+    for value in candidates:
+        if isinstance(value, Agent) and id(value) not in seen:
+            seen.add(id(value))
+            targets.append(value)
+    return targets
+
+
+# コードオブジェクト（内側の関数を含む）が参照する名前を返す関数
+def code_names(code: CodeType) -> List[str]:
+    names = list(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            names.extend(code_names(const))
+    return names
+
+
+# コンパイルしたエージェントのグラフ
+# エージェントごとのテンプレート、引き継ぎの辺、見つかった問題を保持します。
+class AgentGraph:
+    def __init__(
+        self,
+        templates: Dict[int, AgentTemplate],
+        entry: Agent,
+        issues: List[GraphIssue],
+        tool_cache: ToolCache,
+    ):
+        self._templates = templates
+        self.entry = entry
+        self.issues = issues
+        self.tool_cache = tool_cache
+
+    # グラフに含まれるエージェントのリスト
+    @property
+    def agents(self) -> List[Agent]:
+        return [template.agent for template in self._templates.values()]
+
+    # エージェント名から引き継ぎ先のエージェント名への対応を返すメソッド
+    def edges(self) -> Dict[str, List[str]]:
+        return {
+            template.agent.name: [agent.name for agent in template.handoffs]
+            for template in self._templates.values()
+        }
+
+    # エージェントのテンプレートを返すメソッド（グラフにないエージェントは None）
+    # コンパイルした後にエージェントが変更されていれば、テンプレートを作り直します。
+    def template(self, agent: Agent) -> Optional[AgentTemplate]:
+        template = self._templates.get(id(agent))
+        if template is None or template.matches(agent):
+            return template
+        template = build_template(agent, self.tool_cache)
+        self._templates[id(agent)] = template
+        return template
+
+    # 問題があれば GraphError を送出するメソッド（kinds で種類を絞り込める）
+    def check(self, kinds: Optional[Iterable[str]] = None) -> "AgentGraph":
+        kinds = None if kinds is None else set(kinds)
+        issues = [i for i in self.issues if kinds is None or i.kind in kinds]
+        if issues:
+            raise GraphError(issues)
+        return self
+
+
+# エージェントのテンプレートを作成する関数
+def build_template(agent: Agent, tool_cache: ToolCache) -> AgentTemplate:
+    compiled = tool_cache.compile(agent.functions)
+    handoffs, seen = [], set()
+    for func in agent.functions:
+        for target in handoff_targets(func):
+            if id(target) not in seen:
+                seen.add(id(target))
+                handoffs.append(target)
+    return AgentTemplate(agent, compiled, handoffs)
+
+
+# エージェントのツールの問題を返す関数
+def tool_issues(agent: Agent) -> List[GraphIssue]:
+    issues = []
+    names = set()
+    for func in agent.functions:
+        name = func.__name__
+        if not _TOOL_NAME.match(name):
+            issues.append(
+                GraphIssue("invalid_tool_name", agent.name, f"{name} はツール名に使えません")
+            )
+        if name in names:
+            issues.append(
+                GraphIssue("duplicate_tool", agent.name, f"{name} が重複しています")
+            )
+        names.add(name)
+    choice = agent.tool_choice
+    if choice and choice not in _TOOL_CHOICE_MODES and choice not in names:
+        issues.append(
+            GraphIssue("unknown_tool", agent.name, f"tool_choice の {choice} がありません")
+        )
+    return issues
+
+
+# start から引き継ぎの辺をたどり、まだないエージェントのテンプレートを作成する関数
+def walk(start: Agent, templates: Dict[int, AgentTemplate], tool_cache: ToolCache):
+    pending = [start]
+    while pending:
+        agent = pending.pop()
+        if id(agent) not in templates:
+            template = templates[id(agent)] = build_template(agent, tool_cache)
+            pending.extend(reversed(template.handoffs))
+
+
+# エージェントの集合をコンパイルする関数
+# entry（指定がなければ agents の最初のエージェント）から引き継ぎの辺をたどり、
+# 見つかったエージェントもグラフに加えます。agents のうち entry からたどれないものは
+# unreachable として、ツールの問題（名前の重複、使えない名前、tool_choice が
+# 存在しない関数を指している）や同じ名前のエージェントとあわせて issues に記録します。
+# strict=True の場合は、問題があれば GraphError を送出します。
+def compile_agents(
+    agents: Iterable[Agent],
+    entry: Optional[Agent] = None,
+    tool_cache: Optional[ToolCache] = None,
+    strict: bool = False,
+) -> AgentGraph:
+    agents = list(agents)
+    if entry is None:
+        if not agents:
+            raise ValueError("エージェントを1つ以上指定してください。")
+        entry = agents[0]
+    tool_cache = tool_cache or ToolCache()
+
+    # entry から引き継ぎの辺をたどり、その後で entry からたどれないエージェントをたどる
+    templates = {}
+    walk(entry, templates, tool_cache)
+    reachable = set(templates)
+    for agent in agents:
+        walk(agent, templates, tool_cache)
+
+    issues = []
+    names = {}
+    for template in templates.values():
+        agent = template.agent
+        if id(agent) not in reachable:
+            issues.append(
+                GraphIssue(
+                    "unreachable", agent.name, f"{entry.name} から引き継がれません"
+                )
+            )
+        if agent.name in names and names[agent.name] is not agent:
+            issues.append(
+                GraphIssue("duplicate_agent", agent.name, "同じ名前のエージェントがあります")
+            )
+        names.setdefault(agent.name, agent)
+        issues.extend(tool_issues(agent))
+
+    graph = AgentGraph(templates, entry, issues, tool_cache)
+    if strict:
+        graph.check()
+    return graph
@@ -0,0 +1,321 @@
+# 標準ライブラリのインポート
+import json
+import threading
+from collections import ChainMap
+from collections.abc import Sequence
+from typing import Callable, Iterable, Optional
+
+# 末尾への追記の判定と追記をまとめて行うためのロック
+_append_lock = threading.Lock()
+
+# ContextVariables のチェーンがこの深さを超えたら平坦化する
+_MAX_CONTEXT_DEPTH = 16
+
+
+# 追記専用の会話履歴クラス
+# 履歴はセグメントの連鎖として保持され、fork() は O(1) で分岐を作成します。
+# 末尾を共有している履歴のうち最初に追記したものだけがセグメントをその場で伸ばし、
+# それ以外は新しいセグメントを作るため、既存のメッセージがコピーされることはありません。
+# 呼び出し元から渡されたリストは読み取り専用として共有され、変更されません。
+class History(Sequence):
+    __slots__ = ("_parent", "_offset", "_items", "_len", "_owned")
+
+    def __init__(self, messages: Optional[Iterable] = None):
+        if isinstance(messages, History):
+            self._parent = messages._parent
+            self._offset = messages._offset
+            self._items = messages._items
+            self._len = messages._len
+            self._owned = messages._owned
+            return
+        if messages is None:
+            messages, owned = [], True
+        elif isinstance(messages, list):
+            owned = False
+        else:
+            messages, owned = list(messages), True
+        self._parent = None
+        self._offset = 0
+        self._items = messages
+        self._len = len(messages)
+        self._owned = owned
+
+    # 現在の履歴から分岐を作成するメソッド（メッセージはコピーしない）
+    def fork(self) -> "History":
+        return History(self)
+
+    # メッセージを末尾に追加するメソッド
+    def append(self, message) -> None:
+        with _append_lock:
+            if self._owned and len(self._items) == self._len:
+                self._items.append(message)
+                self._len += 1
+                return
+        # 末尾を他の履歴に取られているか、呼び出し元のリストなので新しいセグメントを作る
+        parent = History(self)
+        self._parent = parent
+        self._offset = len(parent)
+        self._items = [message]
+        self._len = 1
+        self._owned = True
+
+    # 複数のメッセージを末尾に追加するメソッド
+    def extend(self, messages: Iterable) -> None:
+        for message in messages:
+            self.append(message)
+
+    # 先頭から順にセグメント（リストと有効な長さ）を返すメソッド
+    def _segments(self) -> list:
+        segments = []
+        node = self
+        while node is not None:
+            segments.append((node._items, node._len))
+            node = node._parent
+        segments.reverse()
+        return segments
+
+    # 履歴をリストとして取り出すメソッド（メッセージ自体はコピーしない）
+    def to_list(self) -> list:
+        result = []
+        for items, length in self._segments():
+            if length == len(items):
+                result.extend(items)
+            else:
+                result.extend(items[:length])
+        return result
+
+    def __len__(self) -> int:
+        return self._offset + self._len
+
+    def __iter__(self):
+        for items, length in self._segments():
+            for i in range(length):
+                yield items[i]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return self.to_list()[index]
+            # start より前のセグメントは読み飛ばす
+            result = []
+            node = self
+            while node is not None and stop > start:
+                lo = max(start, node._offset)
+                hi = min(stop, node._offset + node._len)
+                if lo < hi:
+                    result[:0] = node._items[lo - node._offset : hi - node._offset]
+                    stop = lo
+                node = node._parent
+            return result
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("History index out of range")
+        node = self
+        while index < node._offset:
+            node = node._parent
+        return node._items[index - node._offset]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (History, list)):
+            return len(self) == len(other) and all(
+                a == b for a, b in zip(self, other)
+            )
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"History({self.to_list()!r})"
+
+
+# コピーオンライトのコンテキスト変数クラス
+# 元の辞書は読み取り専用として共有され、書き込みは先頭の辞書にだけ反映されます。
+# ネストした値（リストや辞書）は共有されるため、その場で変更すると元の値も変わります。
+class ContextVariables(ChainMap):
+    # 辞書またはコンテキスト変数から、書き込み用の層を持つ新しいインスタンスを作るメソッド
+    @classmethod
+    def from_mapping(cls, mapping=None) -> "ContextVariables":
+        if mapping is None:
+            return cls({})
+        if isinstance(mapping, ChainMap):
+            if len(mapping.maps) >= _MAX_CONTEXT_DEPTH:
+                return cls({}, dict(mapping))
+            return cls({}, *mapping.maps)
+        return cls({}, mapping)
+
+    # 現在の値から分岐を作成するメソッド（値はコピーしない）
+    def fork(self) -> "ContextVariables":
+        return ContextVariables.from_mapping(self)
+
+    # 通常の辞書に変換するメソッド
+    def to_dict(self) -> dict:
+        return dict(self)
+
+
+# 指示関数に渡すためのコンテキスト変数のビュー
+# 存在しないキーを参照すると空文字列を返します（defaultdict(str, ...) と同じ動作）。
+class DefaultContextView(ChainMap):
+    def __missing__(self, key):
+        return ""
+
+
+# メッセージのトークン数を概算する関数
+# UTF-8 のバイト数を 3 で割った値を使います（英語ではやや多め、日本語ではおおよそ1文字1トークン）。
+def estimate_tokens(message: dict) -> int:
+    content = message.get("content") or ""
+    if not isinstance(content, str):
+        content = json.dumps(content, ensure_ascii=False)
+    size = len(content.encode("utf-8"))
+    for tool_call in message.get("tool_calls") or []:
+        function = tool_call["function"]
+        size += len(function["name"]) + len(function["arguments"].encode("utf-8"))
+    return 4 + size // 3
+
+
+# 履歴をツール呼び出しとその結果がまとまった単位に分ける関数
+# (開始位置, 終了位置) を新しいものから順に返します。
+def history_units(messages):
+    end = len(messages)
+    while end > 0:
+        start = end - 1
+        # ツールの結果はそれを呼び出したアシスタントメッセージと同じ単位にする
+        while start > 0 and messages[start].get("role") == "tool":
+            start -= 1
+        yield start, end
+        end = start
+
+
+# トークン数の上限に収まるように履歴を絞り込むポリシー
+# システムプロンプトと新しい単位から順に残し、収まらない古い単位は次のいずれかで扱います。
+#   - summarizer を指定した場合: 要約して1つのシステムメッセージにまとめる
+#   - strategy="truncate": 内容を truncate_chars 文字に切り詰め、それでも収まらなければ捨てる
+#   - strategy="drop"（デフォルト）: 捨てる
+# 最新の単位は上限を超えていても常に残します。要約のメッセージも上限に数えます。
+# summarizer(前回までの要約, 新たに要約するメッセージ) は要約文字列を返す関数で、
+# 要約は捨てる範囲の末尾のメッセージごとにキャッシュされるため、
+# 会話が進んでも新しく捨てる部分だけを追加で要約します。
+class TokenBudgetPolicy:
+    def __init__(
+        self,
+        max_tokens: int,
+        strategy: str = "drop",
+        summarizer: Optional[Callable[[str, list], str]] = None,
+        token_counter: Callable[[dict], int] = estimate_tokens,
+        truncate_chars: int = 200,
+        max_cached_summaries: int = 64,
+    ):
+        if strategy not in ("drop", "truncate"):
+            raise ValueError(f"不明な strategy です: {strategy}")
+        self.max_tokens = max_tokens
+        self.strategy = strategy
+        self.summarizer = summarizer
+        self.token_counter = token_counter
+        self.truncate_chars = truncate_chars
+        self.max_cached_summaries = max_cached_summaries
+        # (要約済みの末尾のメッセージ, 要約済みの件数, 要約) のリスト
+        self._summaries = []
+        self._lock = threading.Lock()
+
+    def __call__(self, messages, system_message: dict) -> list:
+        budget = self.max_tokens - self.token_counter(system_message)
+
+        # 新しい単位から順に、上限に収まる範囲を残す
+        used = 0
+        cut = len(messages)
+        for index, (start, end) in enumerate(history_units(messages)):
+            tokens = sum(self.token_counter(messages[i]) for i in range(start, end))
+            if index > 0 and used + tokens > budget:
+                break
+            used += tokens
+            cut = start
+        if cut == 0:
+            return list(messages)
+
+        if self.summarizer is not None:
+            return self.summarize_until_fits(messages, cut, budget - used)
+        kept = messages[cut:]
+        if self.strategy == "truncate":
+            return self.truncate(messages[:cut], budget - used) + kept
+        return kept
+
+    # 要約のメッセージも上限に数え、収まらなければ残した単位を古いものから要約に回すメソッド
+    # 最新の単位は常に残します。remaining は残した単位を除いた予算です。
+    def summarize_until_fits(self, messages, cut: int, remaining: int) -> list:
+        # 残した単位の (終了位置, トークン数) を新しいものから順に並べる
+        kept = messages[cut:]
+        kept_units = [
+            (cut + end, sum(self.token_counter(m) for m in kept[start:end]))
+            for start, end in history_units(kept)
+        ]
+        summary = self.summary_message(messages[:cut])
+        while len(kept_units) > 1 and self.token_counter(summary) > remaining:
+            cut, tokens = kept_units.pop()
+            remaining += tokens
+            summary = self.summary_message(messages[:cut])
+        return [summary, *messages[cut:]]
+
+    # 捨てる範囲を要約したシステムメッセージを返すメソッド
+    def summary_message(self, dropped: list) -> dict:
+        return {
+            "role": "system",
+            "content": f"これまでの会話の要約: {self.summarize(dropped)}",
+        }
+
+    # 捨てる範囲の要約を返すメソッド（キャッシュ済みの要約から続きだけを要約する）
+    def summarize(self, dropped: list) -> str:
+        previous, done = "", 0
+        with self._lock:
+            for last, count, summary in self._summaries:
+                if done < count <= len(dropped) and dropped[count - 1] is last:
+                    previous, done = summary, count
+        if done == len(dropped):
+            return previous
+
+        summary = self.summarizer(previous, dropped[done:])
+        with self._lock:
+            self._summaries.append((dropped[-1], len(dropped), summary))
+            del self._summaries[: -self.max_cached_summaries]
+        return summary
+
+    # 古い単位の内容を切り詰め、残りの予算に収まる新しいものだけを返すメソッド
+    def truncate(self, dropped: list, budget: int) -> list:
+        result = []
+        for start, end in history_units(dropped):
+            unit = [self.truncate_message(m) for m in dropped[start:end]]
+            tokens = sum(self.token_counter(m) for m in unit)
+            if tokens > budget:
+                break
+            budget -= tokens
+            result[:0] = unit
+        return result
+
+    def truncate_message(self, message: dict) -> dict:
+        content = message.get("content")
+        if not isinstance(content, str) or len(content) <= self.truncate_chars:
+            return message
+        return {**message, "content": content[: self.truncate_chars] + "…"}
+
+
+# チャットコンプリートで要約を作成する summarizer を返す関数
+def llm_summarizer(client, model: str = "gpt-4o-mini") -> Callable[[str, list], str]:
+    def summarize(previous: str, messages: list) -> str:
+        transcript = "\n".join(
+            f"{m.get('role')}: {m.get('content') or ''}" for m in messages
+        )
+        completion = client.chat.completions.create(
+            model=model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "これまでの要約と新しい会話をまとめ、"
+                    "後の応答に必要な事実を残した簡潔な要約を作成してください。",
+                },
+                {
+                    "role": "user",
+                    "content": f"これまでの要約:\n{previous}\n\n新しい会話:\n{transcript}",
+                },
+            ],
+        )
+        return completion.choices[0].message.content
+
+    return summarize
@@ -0,0 +1,303 @@
+# 標準ライブラリのインポート
+import asyncio
+import math
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Hashable, Optional, Tuple
+
+
+# デフォルトで再試行する例外を返す関数（APITimeoutError は APIConnectionError に含まれる）
+# openai は最初に LatencyPolicy を作成するときにインポートします。
+def retryable_errors() -> Tuple[type, ...]:
+    from openai import APIConnectionError, InternalServerError, RateLimitError
+
+    return (APIConnectionError, InternalServerError, RateLimitError)
+
+
+# RETRYABLE_ERRORS は参照されたときに作成する
+def __getattr__(name: str):
+    if name == "RETRYABLE_ERRORS":
+        return retryable_errors()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# キー（モデルとストリーミングの有無）ごとに直近の所要時間を保持するクラス
+class LatencyTracker:
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    # 所要時間（秒）を記録するメソッド
+    def observe(self, key: Hashable, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def count(self, key: Hashable) -> int:
+        with self._lock:
+            return len(self._samples.get(key, ()))
+
+    # 直近の所要時間の分位点を返すメソッド（記録がなければ None）
+    def percentile(self, key: Hashable, quantile: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if not samples:
+            return None
+        index = min(len(samples) - 1, math.ceil(quantile * len(samples)) - 1)
+        return samples[max(index, 0)]
+
+
+# 再試行とヘッジの回数を通常のリクエスト数の一定割合に抑えるトークンバケット
+# リクエストごとに ratio 個のトークンが貯まり、再試行とヘッジは1個ずつ消費します。
+# 障害時に再試行が増えすぎて、自ら負荷を増やすことを防ぎます。
+class RetryBudget:
+    def __init__(
+        self, ratio: float = 0.1, initial: float = 10.0, max_tokens: float = 100.0
+    ):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = min(initial, max_tokens)
+        self._lock = threading.Lock()
+
+    # 通常のリクエストを記録するメソッド
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    # 再試行またはヘッジのためにトークンを1個消費するメソッド（足りなければ False）
+    def try_withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @property
+    def tokens(self) -> float:
+        return self._tokens
+
+
+# 結果がストリームであれば閉じる関数（ヘッジで負けたリクエストの接続を解放する）
+def close_quietly(result) -> None:
+    close = getattr(result, "close", None)
+    if close is None:
+        return
+    try:
+        close()
+    except Exception:
+        pass
+
+
+# 非同期版の close_quietly
+async def aclose_quietly(result) -> None:
+    close = getattr(result, "close", None)
+    if close is None:
+        return
+    try:
+        outcome = close()
+        if asyncio.iscoroutine(outcome):
+            await outcome
+    except Exception:
+        pass
+
+
+# チャットコンプリートのテールレイテンシを抑えるポリシー
+# - ヘッジ: 最初のリクエストが、そのモデルの直近の所要時間の hedge_quantile 分位点
+#   （記録が min_samples 件に満たない間はヘッジしない、下限は min_hedge_delay 秒）を
+#   超えても返らなければ同じリクエストをもう1つ送り、先に返った方を使います。
+#   負けた方は、非同期ではキャンセルし、同期ではストリームであれば閉じます。
+# - 再試行: retry_on の例外が発生した場合、最大 max_retries 回まで、
+#   ジッター付きの指数バックオフ（0〜min(backoff_max, backoff_base * 2**n) 秒）の後に
+#   再試行します。
+# 再試行とヘッジは共通の RetryBudget を消費し、予算が尽きた場合は行いません。
+# OpenAI クライアント自身の再試行と重ならないよう、接続プールのクライアントは Swarm が
+# max_retries=0 で作成します。クライアントを指定する場合は max_retries=0 で作成してください。
+class LatencyPolicy:
+    def __init__(
+        self,
+        hedge: bool = True,
+        hedge_quantile: float = 0.95,
+        min_hedge_delay: float = 0.05,
+        min_samples: int = 20,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        timeout: Optional[float] = None,
+        retry_on: Optional[Tuple[type, ...]] = None,
+        budget: Optional[RetryBudget] = None,
+        tracker: Optional[LatencyTracker] = None,
+        max_hedge_workers: int = 16,
+    ):
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # 1回のリクエストのタイムアウト（秒、None の場合はクライアントの設定）
+        self.timeout = timeout
+        # 再試行する例外（None の場合は retryable_errors() の例外）
+        self.retry_on = retryable_errors() if retry_on is None else retry_on
+        self.budget = budget or RetryBudget()
+        self.tracker = tracker or LatencyTracker()
+        self.max_hedge_workers = max_hedge_workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.retries = 0
+        self.budget_exhausted = 0
+
+    # ヘッジを送るまでの待ち時間を返すメソッド（ヘッジしない場合は None）
+    def hedge_delay(self, key: Hashable) -> Optional[float]:
+        if not self.hedge or self.tracker.count(key) < self.min_samples:
+            return None
+        delay = self.tracker.percentile(key, self.hedge_quantile)
+        return max(self.min_hedge_delay, delay)
+
+    # n 回目の再試行の前に待つ時間を返すメソッド（フルジッター）
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    # 予算を1個消費するメソッド（予算が尽きていれば記録して False を返す）
+    def withdraw(self) -> bool:
+        if self.budget.try_withdraw():
+            return True
+        self.budget_exhausted += 1
+        return False
+
+    # 再試行するかどうかを判定し、再試行する場合は予算を消費するメソッド
+    def should_retry(self, error: Exception, attempt: int) -> bool:
+        if not isinstance(error, self.retry_on) or attempt >= self.max_retries:
+            return False
+        if not self.withdraw():
+            return False
+        self.retries += 1
+        return True
+
+    # ヘッジ用のスレッドプールを取得するメソッド（初回呼び出し時に作成）
+    def executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_hedge_workers,
+                    thread_name_prefix="swarm-hedge",
+                )
+            return self._executor
+
+    # request() の所要時間を記録しながら実行するメソッド
+    def timed(self, key: Hashable, request: Callable):
+        start = time.perf_counter()
+        result = request()
+        self.tracker.observe(key, time.perf_counter() - start)
+        return result
+
+    async def atimed(self, key: Hashable, request: Callable):
+        start = time.perf_counter()
+        result = await request()
+        self.tracker.observe(key, time.perf_counter() - start)
+        return result
+
+    # ポリシーに従って request()（引数なしでリクエストを送る関数）を実行するメソッド
+    def call(self, key: Hashable, request: Callable):
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                return self.hedged(key, request)
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    raise
+            time.sleep(self.backoff(attempt))
+            attempt += 1
+
+    # 非同期版の call（request() はコルーチンを返す関数）
+    async def acall(self, key: Hashable, request: Callable):
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                return await self.ahedged(key, request)
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    raise
+            await asyncio.sleep(self.backoff(attempt))
+            attempt += 1
+
+    # 1回のリクエストを、遅い場合はヘッジしながら実行するメソッド
+    def hedged(self, key: Hashable, request: Callable):
+        delay = self.hedge_delay(key)
+        if delay is None:
+            return self.timed(key, request)
+
+        executor = self.executor()
+        primary = executor.submit(self.timed, key, request)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self.withdraw():
+            return primary.result()
+
+        self.hedges += 1
+        hedge = executor.submit(self.timed, key, request)
+        pending = {primary, hedge}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            # 先に失敗した方は無視し、もう一方の結果を待つ
+            winner = next((f for f in done if f.exception() is None), None)
+            if winner is not None or not pending:
+                break
+        if winner is None:
+            return primary.result()
+        if winner is hedge:
+            self.hedge_wins += 1
+        # 負けた方は実行前であれば取り消し、結果がストリームであれば閉じる
+        for future in {primary, hedge} - {winner}:
+            if not future.cancel():
+                future.add_done_callback(
+                    lambda f: f.exception() is None and close_quietly(f.result())
+                )
+        return winner.result()
+
+    # 非同期版の hedged（負けたリクエストはキャンセルする）
+    async def ahedged(self, key: Hashable, request: Callable):
+        delay = self.hedge_delay(key)
+        if delay is None:
+            return await self.atimed(key, request)
+
+        primary = asyncio.ensure_future(self.atimed(key, request))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not self.withdraw():
+            return await primary
+
+        self.hedges += 1
+        hedge = asyncio.ensure_future(self.atimed(key, request))
+        pending = {primary, hedge}
+        try:
+            while True:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                winner = next((t for t in done if t.exception() is None), None)
+                if winner is not None or not pending:
+                    break
+        except BaseException:
+            for task in (primary, hedge):
+                task.cancel()
+            raise
+        if winner is None:
+            return primary.result()
+        if winner is hedge:
+            self.hedge_wins += 1
+        for task in {primary, hedge} - {winner}:
+            if task.done():
+                if task.exception() is None:
+                    await aclose_quietly(task.result())
+            else:
+                task.cancel()
+        return winner.result()
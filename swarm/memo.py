@@ -0,0 +1,166 @@
+# 標準ライブラリのインポート
+import hashlib
+import json
+import threading
+from typing import Callable, Iterable, Optional
+
+# ローカルのインポート
+from .cache import MemoryCacheTier, SQLiteCacheTier
+from .types import Agent, Result
+from .util import __CTX_VARS_NAME__
+
+# メモ化する関数に付ける属性の名前
+__MEMO_ATTR__ = "__swarm_memo__"
+
+
+# エージェント関数の結果のメモ化
+# キーは関数の完全な名前と、引数を正規化した JSON のハッシュです。
+# context_variables を受け取る関数は、context_keys を指定しない限りメモ化しません
+# （指定した場合はそのキーの値もキーに含めます。空にすると値を無視します）。
+# エージェントへの引き継ぎを含む結果は保存しません。
+# path を指定すると SQLite に保存し、同じファイルを使う他のプロセスと共有します。
+class FunctionMemo:
+    def __init__(
+        self,
+        ttl: Optional[float] = None,
+        maxsize: int = 1024,
+        path: Optional[str] = None,
+        max_disk_entries: Optional[int] = None,
+        context_keys: Optional[Iterable[str]] = None,
+    ):
+        self.memory = MemoryCacheTier(maxsize=maxsize, ttl=ttl)
+        self.disk = (
+            SQLiteCacheTier(
+                path, max_entries=max_disk_entries, ttl=ttl, table="function_results"
+            )
+            if path
+            else None
+        )
+        self.context_keys = None if context_keys is None else tuple(context_keys)
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._lock = threading.Lock()
+
+    # 関数と引数からキーを返すメソッド（メモ化できない呼び出しは None）
+    def key(self, func: Callable, args: dict) -> Optional[str]:
+        args = dict(args)
+        context_variables = args.pop(__CTX_VARS_NAME__, None)
+        payload = {"function": f"{func.__module__}.{func.__qualname__}", "args": args}
+        if context_variables is not None:
+            if self.context_keys is None:
+                return None
+            payload["context"] = {
+                name: context_variables.get(name) for name in self.context_keys
+            }
+        try:
+            canonical = json.dumps(
+                payload, sort_keys=True, ensure_ascii=False, separators=(",", ":")
+            )
+        except (TypeError, ValueError):
+            return None
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    # 保存された結果を探し、(キー, 結果) を返すメソッド（見つからなければ結果は None）
+    def lookup(self, func: Callable, args: dict):
+        key = self.key(func, args)
+        if key is None:
+            self.count("bypassed")
+            return None, None
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            entry = self.disk.get_entry(key)
+            if entry is not None:
+                value = entry[0]
+                self.memory.set(key, value, created=entry[1])
+        if value is None:
+            self.count("misses")
+            return key, None
+        self.count("hits")
+        return key, Result(**json.loads(value))
+
+    # 関数の結果を保存するメソッド（保存できない結果は無視する）
+    def store(self, key: Optional[str], raw_result) -> None:
+        if key is None:
+            return
+        value = pack_result(raw_result)
+        if value is None:
+            return
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    # ヒット数などの集計を辞書として返すメソッド
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self.memory),
+        }
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+
+# 関数の結果を保存用の JSON 文字列に変換する関数（保存できなければ None）
+def pack_result(raw_result) -> Optional[str]:
+    if isinstance(raw_result, Agent):
+        return None
+    if isinstance(raw_result, Result):
+        if raw_result.agent is not None:
+            return None
+        payload = {
+            "value": raw_result.value,
+            "context_variables": raw_result.context_variables,
+        }
+    else:
+        try:
+            payload = {"value": str(raw_result)}
+        except Exception:
+            return None
+    try:
+        return json.dumps(payload, ensure_ascii=False)
+    except (TypeError, ValueError):
+        return None
+
+
+# エージェント関数の結果をメモ化するように指定するデコレーター
+# 天気や文書の検索のように、同じ引数なら同じ結果を返す関数に付けます。
+#   @memoize
+#   @memoize(ttl=300, maxsize=256, path="tools.db", context_keys=["user_id"])
+def memoize(
+    func: Optional[Callable] = None,
+    *,
+    ttl: Optional[float] = None,
+    maxsize: int = 1024,
+    path: Optional[str] = None,
+    max_disk_entries: Optional[int] = None,
+    context_keys: Optional[Iterable[str]] = None,
+):
+    memo = FunctionMemo(
+        ttl=ttl,
+        maxsize=maxsize,
+        path=path,
+        max_disk_entries=max_disk_entries,
+        context_keys=context_keys,
+    )
+
+    def decorate(func: Callable) -> Callable:
+        setattr(func, __MEMO_ATTR__, memo)
+        return func
+
+    return decorate(func) if func is not None else decorate
+
+
+# 関数のメモを返す関数（メモ化しない関数は None）
+def memo_of(func: Callable) -> Optional[FunctionMemo]:
+    return getattr(func, __MEMO_ATTR__, None)
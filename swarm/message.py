@@ -0,0 +1,184 @@
+# 標準ライブラリのインポート
+from collections.abc import Mapping, MutableMapping
+from typing import Iterable, List, Optional
+
+# スロットに保持するキー（この順に列挙される）
+MESSAGE_FIELDS = (
+    "content",
+    "sender",
+    "role",
+    "function_call",
+    "tool_calls",
+    "tool_call_id",
+    "tool_name",
+    "refusal",
+    "audio",
+    "annotations",
+)
+_FIELD_SET = frozenset(MESSAGE_FIELDS)
+
+# コンプリートのメッセージから、値が None でもそのまま保持する追加のフィールド
+_COMPLETION_FIELDS = ("refusal", "audio", "annotations")
+
+
+# スロットに値がないことを表す値
+class _Missing:
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "<missing>"
+
+
+_MISSING = _Missing()
+
+
+# 会話履歴のメッセージを保持する軽量なクラス
+# 辞書と同じように読み書きでき（message["content"]、get、in、==、dict(message)）、
+# リクエストを組み立てるときに to_dict() で API に渡す辞書になります。
+# よく使うキーはスロットに、それ以外のキーは extra の辞書に保持するため、
+# 辞書よりも1件あたりのメモリが小さくなります。
+class Message(MutableMapping):
+    __slots__ = MESSAGE_FIELDS + ("extra",)
+
+    def __init__(self, fields: Optional[Mapping] = None, **kwargs):
+        for name in MESSAGE_FIELDS:
+            setattr(self, name, _MISSING)
+        self.extra = None
+        if fields:
+            self.update(fields)
+        if kwargs:
+            self.update(kwargs)
+
+    # 辞書やメッセージから作成するメソッド（Message はそのまま返す）
+    @classmethod
+    def from_value(cls, value) -> "Message":
+        if isinstance(value, Message):
+            return value
+        if not isinstance(value, Mapping):
+            raise TypeError(f"メッセージは辞書である必要があります: {value!r}")
+        return cls(value)
+
+    # チャットコンプリートのメッセージから作成するメソッド（JSON を経由しない）
+    @classmethod
+    def from_completion(cls, message, sender: str) -> "Message":
+        result = cls(
+            content=message.content,
+            sender=sender,
+            role=message.role,
+            function_call=dump_function(getattr(message, "function_call", None)),
+            tool_calls=[
+                {
+                    "id": tool_call.id,
+                    "function": dump_function(tool_call.function),
+                    "type": tool_call.type,
+                }
+                for tool_call in message.tool_calls
+            ]
+            if message.tool_calls
+            else None,
+        )
+        for name in _COMPLETION_FIELDS:
+            value = getattr(message, name, _MISSING)
+            if value is not _MISSING:
+                result[name] = dump_value(value)
+        return result
+
+    # API に渡す辞書を返すメソッド
+    def to_dict(self) -> dict:
+        result = {}
+        for name in MESSAGE_FIELDS:
+            value = getattr(self, name)
+            if value is not _MISSING:
+                result[name] = value
+        if self.extra:
+            result.update(self.extra)
+        return result
+
+    def copy(self) -> "Message":
+        return Message(self)
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            value = getattr(self, key)
+            if value is _MISSING:
+                raise KeyError(key)
+            return value
+        if self.extra is None:
+            raise KeyError(key)
+        return self.extra[key]
+
+    def __setitem__(self, key, value) -> None:
+        if key in _FIELD_SET:
+            setattr(self, key, value)
+            return
+        if self.extra is None:
+            self.extra = {}
+        self.extra[key] = value
+
+    def __delitem__(self, key) -> None:
+        if key in _FIELD_SET:
+            if getattr(self, key) is _MISSING:
+                raise KeyError(key)
+            setattr(self, key, _MISSING)
+            return
+        if self.extra is None:
+            raise KeyError(key)
+        del self.extra[key]
+
+    def __iter__(self):
+        for name in MESSAGE_FIELDS:
+            if getattr(self, name) is not _MISSING:
+                yield name
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self) -> int:
+        count = sum(getattr(self, name) is not _MISSING for name in MESSAGE_FIELDS)
+        return count + (len(self.extra) if self.extra else 0)
+
+    def __contains__(self, key) -> bool:
+        if key in _FIELD_SET:
+            return getattr(self, key) is not _MISSING
+        return self.extra is not None and key in self.extra
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Mapping):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    def __reduce__(self):
+        return Message, (self.to_dict(),)
+
+    def __repr__(self) -> str:
+        return f"Message({self.to_dict()!r})"
+
+
+# 関数呼び出しを辞書にする関数
+def dump_function(function) -> Optional[dict]:
+    if function is None:
+        return None
+    return {"arguments": function.arguments, "name": function.name}
+
+
+# pydantic のモデルを JSON と同じ形の値にする関数
+def dump_value(value):
+    if isinstance(value, list):
+        return [dump_value(item) for item in value]
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    return value
+
+
+# 履歴を API に渡すメッセージのリストにする関数
+def wire_messages(messages: Iterable) -> List[dict]:
+    return [
+        message.to_dict() if isinstance(message, Message) else message
+        for message in messages
+    ]
+
+
+# json.dumps の default に指定する関数（Message は辞書に、それ以外は文字列にする）
+def json_default(value):
+    if isinstance(value, Message):
+        return value.to_dict()
+    return str(value)
@@ -0,0 +1,100 @@
+# 標準ライブラリのインポート
+import asyncio
+import inspect
+from collections.abc import Mapping
+from typing import Callable, Iterable, Optional
+
+# ローカルのインポート
+from .types import Agent, Result
+from .util import __CTX_VARS_NAME__
+
+# プロセスプールで実行する関数に付ける属性の名前
+__PROCESS_ATTR__ = "__swarm_run_in_process__"
+
+
+# エージェント関数をプロセスプールで実行するように指定するデコレーター
+# CPU を多く使う関数（文書の解析や重い計算など）が会話ループや他の会話を止めないようにします。
+# 関数はモジュールのトップレベルで定義し、引数と戻り値は pickle できる必要があります。
+# 戻り値の Agent（Result.agent を含む）は名前だけを返し、呼び出し元のプロセスで
+# 同じ名前のエージェント（Swarm の agents、コンパイル済みのグラフ、関数のモジュールの順に
+# 探す）に戻します。
+def run_in_process(func: Callable) -> Callable:
+    setattr(func, __PROCESS_ATTR__, True)
+    return func
+
+
+def runs_in_process(func: Callable) -> bool:
+    return getattr(func, __PROCESS_ATTR__, False)
+
+
+# プロセス間で受け渡すエージェントの参照
+class AgentRef:
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __reduce__(self):
+        return AgentRef, (self.name,)
+
+
+# プロセス間で受け渡す関数の戻り値
+class ProcessResult:
+    __slots__ = ("value", "agent")
+
+    def __init__(self, value, agent: Optional[AgentRef] = None):
+        self.value = value
+        self.agent = agent
+
+    def __reduce__(self):
+        return ProcessResult, (self.value, self.agent)
+
+
+# プロセスに送る引数を作成する関数（コンテキスト変数は通常の辞書にする）
+def process_args(args: dict) -> dict:
+    context_variables = args.get(__CTX_VARS_NAME__)
+    if isinstance(context_variables, Mapping) and type(context_variables) is not dict:
+        args = {**args, __CTX_VARS_NAME__: dict(context_variables)}
+    return args
+
+
+# ワーカープロセスで関数を実行し、戻り値のエージェントを参照に置き換える関数
+def call_in_process(func: Callable, args: dict) -> ProcessResult:
+    result = func(**args)
+    if inspect.isawaitable(result):
+        result = asyncio.run(result)
+    if isinstance(result, Agent):
+        return ProcessResult(None, AgentRef(result.name))
+    if isinstance(result, Result) and result.agent is not None:
+        return ProcessResult(
+            result.model_copy(update={"agent": None}), AgentRef(result.agent.name)
+        )
+    return ProcessResult(result)
+
+
+# 名前でエージェントを探す関数
+# agents（Swarm に登録したエージェントやグラフのエージェント）を先に探し、見つからなければ
+# 関数のモジュールのグローバル変数から探します。
+def resolve_agent(
+    func: Callable, ref: AgentRef, agents: Iterable[Agent] = ()
+) -> Agent:
+    for agent in agents:
+        if agent.name == ref.name:
+            return agent
+    for value in getattr(func, "__globals__", {}).values():
+        if isinstance(value, Agent) and value.name == ref.name:
+            return value
+    raise LookupError(
+        f"関数 {func.__name__} が返したエージェント {ref.name} が見つかりません"
+        "（Swarm の agents に登録してください）。"
+    )
+
+
+# ワーカープロセスの戻り値を、関数を直接呼んだ場合と同じ形に戻す関数
+def unpack_result(func: Callable, packed: ProcessResult, agents: Iterable[Agent] = ()):
+    if packed.agent is None:
+        return packed.value
+    agent = resolve_agent(func, packed.agent, agents)
+    if packed.value is None:
+        return agent
+    return packed.value.model_copy(update={"agent": agent})
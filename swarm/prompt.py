@@ -0,0 +1,69 @@
+# 標準ライブラリのインポート
+import json
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, Optional
+
+# ローカルのインポート
+from .message import json_default
+
+
+# プロバイダーのプロンプトキャッシュが効きやすいリクエストの並べ方
+# リクエストの先頭（システムメッセージとツール）を、ターンや会話をまたいでバイト単位で
+# 同じにするため、次のように並べます。
+#   - ツールは名前順に並べ、キーを再帰的に並べ替える
+#   - static_instructions=True の場合、関数の指示は空のコンテキスト変数で作成する
+#     （存在しないキーは空文字列）
+#   - コンテキスト変数は履歴の後ろのシステムメッセージに JSON として入れる
+#     （context_keys を指定した場合はそのキーだけ。値がなければメッセージを付けない）
+# 末尾のメッセージは各リクエストにだけ付け、履歴には保存しません。
+class CanonicalPromptLayout:
+    def __init__(
+        self,
+        static_instructions: bool = True,
+        context_keys: Optional[Iterable[str]] = None,
+        context_prefix: str = "context_variables: ",
+        maxsize: int = 256,
+    ):
+        self.static_instructions = static_instructions
+        self.context_keys = None if context_keys is None else tuple(context_keys)
+        self.context_prefix = context_prefix
+        self.maxsize = maxsize
+        # ツールの JSON（CompiledTools.payload()）ごとの並べ替えたツール
+        self._tools = OrderedDict()
+        self._lock = threading.Lock()
+
+    # 並べ替えたツールのリストを返すメソッド（payload はキーを並べ替えた JSON）
+    def tools(self, payload: bytes) -> List[dict]:
+        with self._lock:
+            tools = self._tools.get(payload)
+            if tools is not None:
+                self._tools.move_to_end(payload)
+                return tools
+        tools = sorted(json.loads(payload), key=lambda t: t["function"]["name"])
+        with self._lock:
+            self._tools[payload] = tools
+            while len(self._tools) > self.maxsize:
+                self._tools.popitem(last=False)
+        return tools
+
+    # 履歴の後ろに付けるコンテキスト変数のメッセージを返すメソッド（なければ None）
+    def context_message(self, context_variables) -> Optional[dict]:
+        if self.context_keys is None:
+            values = dict(context_variables)
+        else:
+            values = {
+                key: context_variables[key]
+                for key in self.context_keys
+                if key in context_variables
+            }
+        if not values:
+            return None
+        content = json.dumps(
+            values,
+            ensure_ascii=False,
+            sort_keys=True,
+            separators=(",", ":"),
+            default=json_default,
+        )
+        return {"role": "system", "content": self.context_prefix + content}
@@ -1,44 +1,42 @@
 import json
 
 from swarm import Swarm
+from swarm.events import (
+    ContentDelta,
+    FinalResponse,
+    ToolCallDelta,
+    TurnEnd,
+    coalesce,
+    typed_events,
+)
 
 # ストリーミング応答を処理して出力する関数
-# 受け取ったストリーミングレスポンスを処理し、必要に応じて内容を出力します
-def process_and_print_streaming_response(response):
-    content = ""  # 現在のメッセージの内容を保持
-    last_sender = ""  # 最後のメッセージ送信者を保持
-
-    for chunk in response:
-        # 送信者が含まれている場合、最後の送信者として記録
-        if "sender" in chunk:
-            last_sender = chunk["sender"]
-
-        # メッセージ内容が含まれている場合、それを出力
-        if "content" in chunk and chunk["content"] is not None:
-            # 最初のメッセージ部分の場合、送信者を表示
-            if not content and last_sender:
-                print(f"\033[94m{last_sender}:\033[0m", end=" ", flush=True)
-                last_sender = ""
-            print(chunk["content"], end="", flush=True)
-            content += chunk["content"]
-
-        # ツール呼び出しが含まれている場合、その情報を出力
-        if "tool_calls" in chunk and chunk["tool_calls"] is not None:
-            for tool_call in chunk["tool_calls"]:
-                f = tool_call["function"]
-                name = f["name"]
-                if not name:
-                    continue
-                print(f"\033[94m{last_sender}: \033[95m{name}\033[0m()")
+# 受け取ったストリーミングレスポンスを型付きのイベントに変換し、連続する差分を interval 秒
+# ごとにまとめて出力します（トークンごとに出力とフラッシュをしないため）
+def process_and_print_streaming_response(response, interval=0.05):
+    printing = False  # アシスタントのメッセージを出力中かどうか
+
+    for event in coalesce(typed_events(response), max_chars=None, interval=interval):
+        # メッセージ内容の差分を出力（最初の部分の場合は送信者も表示）
+        if isinstance(event, ContentDelta):
+            if not printing:
+                print(f"\033[94m{event.agent}:\033[0m", end=" ")
+                printing = True
+            print(event.content, end="", flush=True)
+
+        # ツール呼び出しの最初の差分で、その名前を出力
+        elif isinstance(event, ToolCallDelta):
+            if event.name:
+                print(f"\033[94m{event.agent}: \033[95m{event.name}\033[0m()")
 
         # 応答メッセージの終わりが来た場合、新しい行を表示
-        if "delim" in chunk and chunk["delim"] == "end" and content:
+        elif isinstance(event, TurnEnd) and printing:
             print()  # 応答メッセージの終わり
-            content = ""
+            printing = False
 
         # 完全なレスポンスが含まれている場合、それを返す
-        if "response" in chunk:
-            return chunk["response"]
+        elif isinstance(event, FinalResponse):
+            return event.response
 
 # メッセージをきれいに出力する関数
 # 会話メッセージを整形して表示します
@@ -67,18 +65,21 @@ def pretty_print_messages(messages) -> None:
 
 # デモループを実行する関数
 # Swarmクライアントを使用してインタラクティブなデモループを実行します
+# session を指定した場合、会話はセッションのログに保存され、途中から再開できます
 def run_demo_loop(
-    starting_agent, context_variables=None, stream=False, debug=False
+    starting_agent, context_variables=None, stream=False, debug=False, session=None
 ) -> None:
     client = Swarm()  # Swarmクライアントのインスタンス化
     print("Swarm CLI を開始します 🐝")
 
-    messages = []  # メッセージの履歴を保持
+    messages = []  # メッセージの履歴を保持（セッションを使う場合は新しい入力のみ）
     agent = starting_agent  # 開始エージェントを設定
 
     while True:
         # ユーザー入力を取得し、メッセージリストに追加
         user_input = input("\033[90mユーザー\033[0m: ")
+        if session is not None:
+            messages = []
         messages.append({"role": "user", "content": user_input})
 
         # Swarmクライアントを使用してエージェントを実行
@@ -88,6 +89,7 @@ def run_demo_loop(
             context_variables=context_variables or {},
             stream=stream,
             debug=debug,
+            session=session,
         )
 
         # ストリーミング応答を処理するか、メッセージを整形して表示
@@ -0,0 +1,386 @@
+# 標準ライブラリのインポート
+import argparse
+import asyncio
+import importlib
+import json
+import time
+import weakref
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Union
+
+# ローカルのインポート
+from .core import AsyncSwarm
+from .message import json_default
+from .session import MemorySessionStore, Session, SessionStore
+from .types import Agent, Response
+
+# リクエストボディの上限（バイト）
+MAX_BODY_BYTES = 1 << 20
+
+
+# サーバーがクライアントに返すエラー
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# JSON に変換する関数（メッセージは辞書に、変換できない値は文字列にする）
+def dump_json(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, default=json_default).encode("utf-8")
+
+
+# Response を JSON に変換できる辞書にする関数
+def response_to_dict(response: Response, session_id: Optional[str] = None) -> dict:
+    result = {
+        "messages": response.messages,
+        "agent": response.agent.name if response.agent else None,
+        "context_variables": response.context_variables,
+        "usage": response.usage.model_dump(),
+    }
+    if session_id is not None:
+        result["session_id"] = session_id
+    return result
+
+
+# ストリーミングのイベントを Server-Sent Events の1件に変換する関数
+# {"delim": ...} は delim、最後の {"response": ...} は response、{"error": ...} は error、
+# {"arguments": ...}（ツール呼び出しの引数のイベント）は arguments、それ以外は delta
+# イベントになります。
+def sse_event(event: dict, session_id: Optional[str] = None) -> bytes:
+    if "delim" in event:
+        name, data = "delim", event
+    elif "error" in event:
+        name, data = "error", event
+    elif "response" in event:
+        name, data = "response", response_to_dict(event["response"], session_id)
+    elif "arguments" in event:
+        arguments = event["arguments"]
+        events = [e._asdict() for e in arguments["events"]]
+        name, data = "arguments", {"index": arguments["index"], "events": events}
+    else:
+        name, data = "delta", event
+    return b"event: " + name.encode() + b"\ndata: " + dump_json(data) + b"\n\n"
+
+
+# Swarm の会話を HTTP で提供する ASGI アプリケーション
+# エンドポイント:
+#   POST /run              会話を実行し、結果を JSON で返す
+#   POST /stream           会話を実行し、イベントを Server-Sent Events で返す
+#   POST /sessions         新しいセッションを作成する
+#   GET  /sessions/{id}    セッションのメッセージ、コンテキスト変数、エージェント名を返す
+#   DELETE /sessions/{id}  セッションを削除する
+#   GET  /healthz          ヘルスチェック
+# /run と /stream のボディ:
+#   {"messages": [...], "agent": 名前, "session_id": ID, "context_variables": {...},
+#    "model_override": ..., "max_turns": ..., "execute_tools": ...}
+# /stream では "argument_events": true でツール呼び出しの引数のイベントも送ります。
+# session_id を指定した場合、messages はセッションに続ける新しいメッセージだけを渡します。
+# agent を省略した場合は、セッションの最後のエージェント、なければ agents の最初のエージェントを
+# 使います。
+# 同時に実行する会話は max_concurrency 件までで、同じセッションの会話は1件ずつ実行します。
+# /stream の差分のイベントは flush_interval 秒ごとにまとめて送ります（delim と response は
+# すぐに送ります）。
+class SwarmApp:
+    def __init__(
+        self,
+        agents: Union[Agent, Iterable[Agent], Dict[str, Agent]],
+        swarm: Optional[AsyncSwarm] = None,
+        session_store: Optional[SessionStore] = None,
+        max_sessions: int = 1024,
+        max_concurrency: int = 16,
+        max_body_bytes: int = MAX_BODY_BYTES,
+        flush_interval: Optional[float] = 0.05,
+    ):
+        if isinstance(agents, Agent):
+            agents = [agents]
+        if not isinstance(agents, dict):
+            agents = {agent.name: agent for agent in agents}
+        if not agents:
+            raise ValueError("エージェントを1つ以上指定してください。")
+        self.agents = agents
+        self.default_agent = next(iter(agents.values()))
+        self.swarm = swarm
+        # ストアを指定しない場合はメモリ上に保持し、読み込み済みのセッションの LRU から
+        # 外れたセッションはストアからも削除する
+        self.evict_from_store = session_store is None
+        self.session_store = session_store or MemorySessionStore(maxsize=None)
+        self.max_sessions = max_sessions
+        self.max_concurrency = max_concurrency
+        self.max_body_bytes = max_body_bytes
+        # /stream で差分のイベントをまとめて送る間隔（秒、None の場合はイベントごとに送る）
+        self.flush_interval = flush_interval
+        # 読み込み済みのセッション（LRU）と、セッションごとのロック
+        self._sessions = OrderedDict()
+        self._session_locks = weakref.WeakValueDictionary()
+        self._semaphore = None
+
+    # Swarm クライアントを取得するメソッド（指定がなければ初回呼び出し時に作成）
+    def client(self) -> AsyncSwarm:
+        if self.swarm is None:
+            self.swarm = AsyncSwarm()
+        return self.swarm
+
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    # セッションを取得するメソッド（読み込み済みのものを再利用する）
+    def session(self, session_id: str) -> Session:
+        session = self._sessions.get(session_id)
+        if session is None:
+            try:
+                session = self.session_store.load(session_id)
+            except ValueError as e:
+                raise HTTPError(400, str(e))
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                evicted, _ = self._sessions.popitem(last=False)
+                if self.evict_from_store:
+                    self.session_store.delete(evicted)
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def session_lock(self, session_id: str) -> asyncio.Lock:
+        lock = self._session_locks.get(session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._session_locks[session_id] = lock
+        return lock
+
+    # リクエストボディから会話の引数を組み立てるメソッド
+    def run_kwargs(self, body: dict) -> dict:
+        messages = body.get("messages", [])
+        if not isinstance(messages, list):
+            raise HTTPError(400, "messages はリストで指定してください。")
+        session_id = body.get("session_id")
+        if session_id is not None and not isinstance(session_id, str):
+            raise HTTPError(400, "session_id は文字列で指定してください。")
+        session = self.session(session_id) if session_id is not None else None
+
+        agent_name = body.get("agent")
+        if agent_name is None:
+            # 引き継ぎ先が agents に含まれていない場合は最初のエージェントに戻る
+            last_agent = session.agent_name if session else None
+            agent = self.agents.get(last_agent, self.default_agent)
+        elif agent_name in self.agents:
+            agent = self.agents[agent_name]
+        else:
+            raise HTTPError(404, f"エージェントが見つかりません: {agent_name}")
+
+        kwargs = {
+            "agent": agent,
+            "messages": messages,
+            "context_variables": body.get("context_variables") or {},
+            "model_override": body.get("model_override"),
+            "execute_tools": body.get("execute_tools", True),
+            "session": session,
+        }
+        if body.get("max_turns") is not None:
+            kwargs["max_turns"] = body["max_turns"]
+        return kwargs
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        try:
+            await self.dispatch(scope, receive, send)
+        except HTTPError as e:
+            await self.send_json(send, e.status, {"error": e.message})
+
+    # 起動と終了の通知に応答するメソッド
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    # パスとメソッドに応じて処理を振り分けるメソッド
+    async def dispatch(self, scope, receive, send):
+        method, path = scope["method"], scope["path"].rstrip("/")
+        if path == "/healthz" and method == "GET":
+            await self.send_json(send, 200, {"status": "ok"})
+        elif path in ("/run", "/stream") and method == "POST":
+            body = await self.read_json(receive)
+            kwargs = self.run_kwargs(body)
+            if path == "/run":
+                await self.handle_run(send, kwargs)
+            else:
+                kwargs["argument_events"] = bool(body.get("argument_events"))
+                await self.handle_stream(send, kwargs)
+        elif path == "/sessions" and method == "POST":
+            session = self.session_store.create()
+            await self.send_json(send, 201, {"session_id": session.id})
+        elif path.startswith("/sessions/") and method in ("GET", "DELETE"):
+            session_id = path[len("/sessions/") :]
+            if method == "DELETE":
+                self._sessions.pop(session_id, None)
+                self.session_store.delete(session_id)
+                await self.send_json(send, 200, {"session_id": session_id})
+                return
+            session = self.session(session_id)
+            await self.send_json(
+                send,
+                200,
+                {
+                    "session_id": session.id,
+                    "messages": session.messages,
+                    "context_variables": session.context_variables,
+                    "agent": session.agent_name,
+                },
+            )
+        else:
+            raise HTTPError(404, "見つかりません。")
+
+    # 会話を実行し、結果を JSON で返すメソッド
+    async def handle_run(self, send, kwargs: dict):
+        session = kwargs["session"]
+        async with self.semaphore():
+            try:
+                if session is None:
+                    response = await self.client().arun(**kwargs)
+                else:
+                    async with self.session_lock(session.id):
+                        response = await self.client().arun(**kwargs)
+            except Exception as e:
+                raise HTTPError(500, f"{type(e).__name__}: {e}")
+        await self.send_json(
+            send, 200, response_to_dict(response, session and session.id)
+        )
+
+    # 会話を実行し、イベントを Server-Sent Events で返すメソッド
+    # 会話の途中で例外が発生した場合は error イベントを送って終了します。
+    # 差分は flush_interval 秒に1回まとめて送り、トークンごとの書き込みを減らします。
+    async def handle_stream(self, send, kwargs: dict):
+        session = kwargs["session"]
+        session_id = session and session.id
+        async with self.semaphore():
+            lock = self.session_lock(session_id) if session else None
+            if lock is not None:
+                await lock.acquire()
+            try:
+                await send(
+                    {
+                        "type": "http.response.start",
+                        "status": 200,
+                        "headers": [
+                            (b"content-type", b"text/event-stream; charset=utf-8"),
+                            (b"cache-control", b"no-cache"),
+                        ],
+                    }
+                )
+                events = self.client().arun_and_stream(**kwargs)
+                pending, flushed = [], float("-inf")
+                try:
+                    async for event in events:
+                        pending.append(sse_event(event, session_id))
+                        now = time.perf_counter()
+                        if (
+                            self.flush_interval is None
+                            or now - flushed >= self.flush_interval
+                            or "delim" in event
+                            or "response" in event
+                        ):
+                            await self.send_body(send, pending)
+                            pending, flushed = [], now
+                except Exception as e:
+                    pending.append(sse_event({"error": f"{type(e).__name__}: {e}"}))
+                finally:
+                    await events.aclose()
+                if pending:
+                    await self.send_body(send, pending)
+                await send({"type": "http.response.body", "body": b""})
+            finally:
+                if lock is not None:
+                    lock.release()
+
+    # Server-Sent Events のイベントをまとめて1回で送るメソッド
+    async def send_body(self, send, events: List[bytes]):
+        await send(
+            {"type": "http.response.body", "body": b"".join(events), "more_body": True}
+        )
+
+    # リクエストボディを JSON として読み込むメソッド
+    async def read_json(self, receive) -> dict:
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                raise HTTPError(400, "クライアントが切断しました。")
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > self.max_body_bytes:
+                raise HTTPError(413, "リクエストボディが大きすぎます。")
+            chunks.append(chunk)
+            if not message.get("more_body", False):
+                break
+        try:
+            body = json.loads(b"".join(chunks) or b"{}")
+        except json.JSONDecodeError:
+            raise HTTPError(400, "リクエストボディが JSON ではありません。")
+        if not isinstance(body, dict):
+            raise HTTPError(400, "リクエストボディは JSON オブジェクトで指定してください。")
+        return body
+
+    async def send_json(self, send, status: int, value) -> None:
+        body = dump_json(value)
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"application/json; charset=utf-8"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+# "モジュール:属性" の形式で指定されたオブジェクトを読み込む関数
+def load_object(target: str):
+    module_name, _, attribute = target.partition(":")
+    obj = importlib.import_module(module_name)
+    for name in (attribute or "app").split("."):
+        obj = getattr(obj, name)
+    return obj
+
+
+# 指定したエージェント（またはアプリケーション）を uvicorn で提供する関数
+#   python -m swarm.server my_agents:triage_agent --port 8000
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Swarm の会話を HTTP で提供します。")
+    parser.add_argument("target", help="モジュール:エージェント または モジュール:アプリ")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--max-sessions", type=int, default=1024)
+    args = parser.parse_args(argv)
+
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("uvicorn が必要です: pip install uvicorn")
+
+    target = load_object(args.target)
+    if isinstance(target, SwarmApp) or not isinstance(target, (Agent, list, dict)):
+        app = target
+    else:
+        app = SwarmApp(
+            target,
+            max_sessions=args.max_sessions,
+            max_concurrency=args.max_concurrency,
+        )
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+# 標準ライブラリのインポート
+import abc
+import json
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Iterable, Iterator, Optional
+
+# ローカルのインポート
+from .history import History
+from .message import Message, json_default
+
+# セッションIDとして使える文字列（ファイル名にそのまま使うため制限する）
+_SESSION_ID = re.compile(r"^[A-Za-z0-9_\-][A-Za-z0-9_.\-]*$")
+
+
+# レコードを JSON 文字列に変換する関数
+def dump_record(record: dict) -> str:
+    return json.dumps(
+        record, ensure_ascii=False, separators=(",", ":"), default=json_default
+    )
+
+
+# 会話のセッション
+# 保存済みのメッセージ、コンテキスト変数、最後のエージェント名は最初に参照したときに
+# ストアから読み込みます。追記はその場でストアのログに書き込まれるため、
+# 別のプロセスでも同じIDから会話を再開できます。
+class Session:
+    def __init__(self, store: "SessionStore", session_id: str):
+        self.store = store
+        self.id = session_id
+        self._messages = None
+        self._context_variables = None
+        self._agent_name = None
+        self._lock = threading.Lock()
+
+    # ログを再生してセッションの状態を組み立てるメソッド（読み込み済みなら何もしない）
+    def _load(self) -> None:
+        with self._lock:
+            if self._messages is not None:
+                return
+            messages, context_variables, agent_name = [], {}, None
+            for record in self.store.read(self.id):
+                kind = record.get("type")
+                if kind == "message":
+                    messages.append(Message(record["message"]))
+                elif kind == "context":
+                    context_variables.update(record["values"])
+                elif kind == "agent":
+                    agent_name = record["name"]
+            self._messages = messages
+            self._context_variables = context_variables
+            self._agent_name = agent_name
+
+    @property
+    def messages(self) -> list:
+        self._load()
+        return self._messages
+
+    @property
+    def context_variables(self) -> dict:
+        self._load()
+        return self._context_variables
+
+    # 最後に応答したエージェントの名前（会話の再開時にエージェントを選ぶために使う）
+    @property
+    def agent_name(self) -> Optional[str]:
+        self._load()
+        return self._agent_name
+
+    # 保存済みのメッセージから、以降の追記を記録する履歴を作成するメソッド
+    def history(self) -> "SessionHistory":
+        return SessionHistory(self.messages, self)
+
+    # メッセージをログに追記するメソッド
+    def append_messages(self, messages: Iterable[dict]) -> None:
+        messages = list(messages)
+        if not messages:
+            return
+        self.store.append(
+            self.id, [{"type": "message", "message": m} for m in messages]
+        )
+        if self._messages is not None:
+            self._messages.extend(messages)
+
+    # コンテキスト変数の変更分をログに追記するメソッド（値が変わらないキーは記録しない）
+    # 変更分は保存済みの値と比べるため、読み込んでいなければ先に読み込みます。
+    def update_context(self, values: dict) -> None:
+        current = self.context_variables
+        values = {
+            key: value
+            for key, value in values.items()
+            if key not in current or current[key] != value
+        }
+        if not values:
+            return
+        self.store.append(self.id, [{"type": "context", "values": values}])
+        current.update(values)
+
+    # 応答するエージェントが変わったことをログに追記するメソッド
+    def set_agent(self, name: str) -> None:
+        if name == self.agent_name:
+            return
+        self.store.append(self.id, [{"type": "agent", "name": name}])
+        self._agent_name = name
+
+    def __repr__(self) -> str:
+        return f"Session({self.id!r})"
+
+
+# 追記したメッセージをセッションのログにも書き込む履歴
+class SessionHistory(History):
+    __slots__ = ("session",)
+
+    def __init__(self, messages: Optional[Iterable] = None, session: Session = None):
+        super().__init__(messages)
+        self.session = session
+
+    def append(self, message) -> None:
+        super().append(message)
+        self.session.append_messages([message])
+
+    # 複数のメッセージは1回の書き込みでログに追記する
+    def extend(self, messages: Iterable) -> None:
+        messages = list(messages)
+        for message in messages:
+            History.append(self, message)
+        self.session.append_messages(messages)
+
+
+# セッションストアの基底クラス
+# サブクラスは append(session_id, records)、read(session_id)、delete(session_id) を実装します。
+class SessionStore(abc.ABC):
+    # セッションを読み込むメソッド（実際の読み込みは最初に参照したときに行う）
+    def load(self, session_id: str) -> Session:
+        if not _SESSION_ID.match(session_id):
+            raise ValueError(f"セッションIDに使えない文字が含まれています: {session_id!r}")
+        return Session(self, session_id)
+
+    # 新しいIDでセッションを作成するメソッド
+    def create(self) -> Session:
+        return self.load(uuid.uuid4().hex)
+
+    # セッションのログにレコードを追記するメソッド
+    @abc.abstractmethod
+    def append(self, session_id: str, records: list) -> None: ...
+
+    # セッションのログのレコードを書き込んだ順に返すメソッド（ないセッションは空）
+    @abc.abstractmethod
+    def read(self, session_id: str) -> Iterator[dict]: ...
+
+    # セッションのログを削除するメソッド
+    @abc.abstractmethod
+    def delete(self, session_id: str) -> None: ...
+
+
+# メモリ上に保持するストア
+# セッション数が maxsize（None の場合は無制限）を超えた場合は、最後に書き込みまたは
+# 読み込みされた時刻が古いセッションから削除します。プロセスを再起動するとセッションは失われます。
+class MemorySessionStore(SessionStore):
+    def __init__(self, maxsize: Optional[int] = 1024):
+        self.maxsize = maxsize
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+
+    def append(self, session_id: str, records: list) -> None:
+        with self._lock:
+            log = self._records.get(session_id)
+            if log is None:
+                log = self._records[session_id] = []
+            # 呼び出し元が変更しても影響しないよう、JSON 文字列として保持する
+            log.extend(dump_record(record) for record in records)
+            self._records.move_to_end(session_id)
+            while self.maxsize is not None and len(self._records) > self.maxsize:
+                self._records.popitem(last=False)
+
+    def read(self, session_id: str) -> Iterator[dict]:
+        with self._lock:
+            log = self._records.get(session_id)
+            if log is None:
+                return
+            self._records.move_to_end(session_id)
+            log = list(log)
+        for record in log:
+            yield json.loads(record)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._records.pop(session_id, None)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._records
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+
+# セッションごとに1つの JSON Lines ファイルへ追記するストア
+# 書き込みの途中で終了した場合、最後の不完全な行は読み込み時に無視され、次の追記の前に
+# 切り詰められます。
+class JSONLinesSessionStore(SessionStore):
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.jsonl")
+
+    def append(self, session_id: str, records: list) -> None:
+        data = "".join(dump_record(record) + "\n" for record in records)
+        with self._lock:
+            with open(self.path(session_id), "a+b") as f:
+                self.drop_partial_line(f)
+                f.write(data.encode("utf-8"))
+
+    # 書き込みの途中で終了した最後の不完全な行を切り詰めるメソッド
+    # 不完全な行の後ろに追記すると、その行と追記した行が読めなくなるためです。
+    @staticmethod
+    def drop_partial_line(f, block_size: int = 4096) -> None:
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b"\n":
+            return
+        pos = end
+        while pos > 0:
+            start = max(0, pos - block_size)
+            f.seek(start)
+            newline = f.read(pos - start).rfind(b"\n")
+            if newline >= 0:
+                f.truncate(start + newline + 1)
+                return
+            pos = start
+        f.truncate(0)
+
+    def read(self, session_id: str) -> Iterator[dict]:
+        try:
+            f = open(self.path(session_id), encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                yield json.loads(line)
+
+    def delete(self, session_id: str) -> None:
+        try:
+            os.remove(self.path(session_id))
+        except FileNotFoundError:
+            pass
+
+
+# 1つの SQLite データベースに全セッションのログを追記するストア
+class SQLiteSessionStore(SessionStore):
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS session_records ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "session_id TEXT NOT NULL, record TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS session_records_session "
+                "ON session_records (session_id, seq)"
+            )
+
+    def append(self, session_id: str, records: list) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO session_records (session_id, record) VALUES (?, ?)",
+                [(session_id, dump_record(record)) for record in records],
+            )
+
+    def read(self, session_id: str) -> Iterator[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT record FROM session_records WHERE session_id = ? ORDER BY seq",
+                (session_id,),
+            ).fetchall()
+        for (record,) in rows:
+            yield json.loads(record)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM session_records WHERE session_id = ?", (session_id,)
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,242 @@
+# 標準ライブラリのインポート
+import json
+import random
+import threading
+import time
+from typing import Iterable, List, Optional
+
+# OTLP のスパンの種類
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+
+# OTLP のステータスコード
+STATUS_CODE_OK = 1
+STATUS_CODE_ERROR = 2
+
+
+# 計測区間（スパン）を表すクラス
+# with 文で使うと、例外が発生した場合はエラーとして記録し、ブロックを抜けたときに終了します。
+class Span:
+    __slots__ = (
+        "tracer",
+        "name",
+        "kind",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "events",
+        "status_code",
+        "status_message",
+    )
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        parent: Optional["Span"] = None,
+        kind: int = SPAN_KIND_INTERNAL,
+        attributes: Optional[dict] = None,
+    ):
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.events = []
+        self.status_code = None
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    # スパン内の出来事を記録するメソッド
+    def add_event(self, name: str, **attributes) -> None:
+        self.events.append((time.time_ns(), name, attributes))
+
+    # 例外をエラーとして記録するメソッド
+    def record_error(self, error: BaseException) -> None:
+        self.status_code = STATUS_CODE_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"
+        self.add_event(
+            "exception",
+            **{"exception.type": type(error).__name__, "exception.message": str(error)},
+        )
+
+    # 開始からの経過時間（ミリ秒）を返すメソッド
+    def elapsed_ms(self) -> float:
+        return (time.time_ns() - self.start_ns) / 1e6
+
+    # スパンを終了し、エクスポーターに渡すメソッド（2回目以降の呼び出しは無視）
+    def end(self) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if self.status_code is None:
+            self.status_code = STATUS_CODE_OK
+        self.tracer.on_end(self)
+
+    def __enter__(self) -> "Span":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        # ジェネレーターが途中で閉じられた場合はエラーとして扱わない
+        if exc is not None and not isinstance(exc, GeneratorExit):
+            self.record_error(exc)
+        self.end()
+
+
+# トレーサーが設定されていない場合に使う、何もしないスパン
+class NullSpan:
+    __slots__ = ()
+
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key: str, value) -> None:
+        pass
+
+    def add_event(self, name: str, **attributes) -> None:
+        pass
+
+    def record_error(self, error: BaseException) -> None:
+        pass
+
+    def elapsed_ms(self) -> float:
+        return 0.0
+
+    def end(self) -> None:
+        pass
+
+    def __enter__(self) -> "NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+# スパンを作成し、終了したスパンをエクスポーターに渡すクラス
+# エクスポーターは export(span) メソッドを持つオブジェクトです。
+class Tracer:
+    def __init__(self, exporters: Iterable = (), service_name: str = "swarm"):
+        self.exporters = list(exporters)
+        self.service_name = service_name
+
+    def start_span(
+        self,
+        name: str,
+        parent=None,
+        kind: int = SPAN_KIND_INTERNAL,
+        **attributes,
+    ) -> Span:
+        if parent is not None and parent.span_id is None:
+            parent = None
+        return Span(self, name, parent=parent, kind=kind, attributes=attributes)
+
+    def on_end(self, span: Span) -> None:
+        for exporter in self.exporters:
+            exporter.export(span)
+
+
+# 属性の値を OTLP の AnyValue に変換する関数
+def otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otlp_attributes(attributes: dict) -> list:
+    return [
+        {"key": key, "value": otlp_value(value)}
+        for key, value in attributes.items()
+        if value is not None
+    ]
+
+
+# スパンを OTLP/JSON の Span オブジェクトに変換する関数
+def span_to_otlp(span: Span) -> dict:
+    otlp = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": otlp_attributes(span.attributes),
+        "events": [
+            {
+                "timeUnixNano": str(time_ns),
+                "name": name,
+                "attributes": otlp_attributes(attributes),
+            }
+            for time_ns, name, attributes in span.events
+        ],
+        "status": {"code": span.status_code},
+    }
+    if span.parent_id:
+        otlp["parentSpanId"] = span.parent_id
+    if span.status_message:
+        otlp["status"]["message"] = span.status_message
+    return otlp
+
+
+# 終了したスパンを OTLP 互換の JSON Lines としてファイルに書き出すエクスポーター
+# 1行が1つの ExportTraceServiceRequest（resourceSpans）で、1つのスパンを含みます。
+class JSONLinesExporter:
+    def __init__(self, path: str, service_name: str = "swarm"):
+        self.path = path
+        self.resource = {
+            "attributes": otlp_attributes({"service.name": service_name})
+        }
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(
+            {
+                "resourceSpans": [
+                    {
+                        "resource": self.resource,
+                        "scopeSpans": [
+                            {"scope": {"name": "swarm"}, "spans": [span_to_otlp(span)]}
+                        ],
+                    }
+                ]
+            },
+            ensure_ascii=False,
+        )
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+# 終了したスパンをメモリ上に保持するエクスポーター（テストや対話的な調査用）
+class InMemoryExporter:
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    # 名前でスパンを絞り込むメソッド
+    def by_name(self, name: str) -> List[Span]:
+        return [span for span in self.spans if span.name == name]
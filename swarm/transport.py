@@ -0,0 +1,183 @@
+# 標準ライブラリのインポート
+import asyncio
+import importlib
+import importlib.util
+import threading
+from typing import TYPE_CHECKING, Dict, Optional
+
+# openai は最初にクライアントを作成するときにインポートする（import swarm を軽くするため）
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+
+# HTTP/2 が使えるかどうか（h2 パッケージがインストールされているか）を返す関数
+def http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+# 実行中のイベントループを返す関数（なければ None）
+def running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+# プロセス内で共有する HTTP 接続プール
+# 同期では1つの HTTP クライアントを、非同期ではイベントループごとに1つの HTTP クライアントを
+# 共有し、その上に OpenAI クライアントをベース URL ごとに1つずつ作成します。client() を使う
+# Swarm はすべて同じ接続を再利用するため、短い会話を何度も実行しても TLS ハンドシェイクの
+# やり直しが発生しません。非同期の接続は作成したイベントループに属するため、asyncio.run を
+# 繰り返す場合もループごとに別のクライアントを使い、閉じたループのクライアントは破棄します。
+# base_urls はモデル名からベース URL への対応で、含まれないモデルはデフォルトの URL を使います。
+# その他のキーワード引数（api_key、timeout、max_retries など）は OpenAI クライアントに渡します。
+# client() と async_client() に max_retries を指定すると、同じ接続を共有したまま SDK の
+# 再試行回数だけが異なるクライアントを返します（LatencyPolicy を使う Swarm が 0 を指定する）。
+class ConnectionPool:
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: Optional[bool] = None,
+        base_urls: Optional[Dict[str, str]] = None,
+        **client_kwargs,
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        # 指定がなければ、h2 がインストールされている場合に HTTP/2 を使う
+        self.http2 = http2_available() if http2 is None else http2
+        self.base_urls = dict(base_urls or {})
+        self.client_kwargs = client_kwargs
+        self._http_client = None
+        self._clients = {}
+        # イベントループ（ループの外で作成したものは None）ごとの
+        # {"http": HTTP クライアント, ベース URL: OpenAI クライアント}
+        self._async_clients = {}
+        self._lock = threading.Lock()
+
+    # 接続数の上限とキープアライブの設定を返すメソッド
+    # Limits は OpenAI SDK が使う HTTP ライブラリ（SDK のバージョンにより httpx または
+    # httpx2）から作成します。
+    def limits(self):
+        import openai
+
+        base = openai.DefaultHttpxClient.__mro__[1]
+        http = importlib.import_module(base.__module__.split(".")[0])
+        return http.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    # 共有の同期 HTTP クライアントを返すメソッド（初回呼び出し時に作成）
+    def http_client(self):
+        import openai
+
+        with self._lock:
+            if self._http_client is None:
+                self._http_client = openai.DefaultHttpxClient(
+                    limits=self.limits(), http2=self.http2
+                )
+            return self._http_client
+
+    # 実行中のイベントループの非同期 HTTP クライアントを返すメソッド（初回呼び出し時に作成）
+    def async_http_client(self):
+        import openai
+
+        with self._lock:
+            clients = self._loop_clients()
+            if "http" not in clients:
+                clients["http"] = openai.DefaultAsyncHttpxClient(
+                    limits=self.limits(), http2=self.http2
+                )
+            return clients["http"]
+
+    # 実行中のイベントループのクライアントの辞書を返すメソッド（ロックを取得して呼び出す）
+    # 閉じたイベントループのクライアントは、接続を閉じられないため参照だけを破棄します。
+    def _loop_clients(self) -> dict:
+        for loop in [loop for loop in self._async_clients if loop is not None]:
+            if loop.is_closed():
+                del self._async_clients[loop]
+        return self._async_clients.setdefault(running_loop(), {})
+
+    # モデルのベース URL を返すメソッド（指定がなければ None）
+    def base_url(self, model: Optional[str] = None) -> Optional[str]:
+        return self.base_urls.get(model) if model else None
+
+    # モデルに対応する同期 OpenAI クライアントを返すメソッド
+    def client(
+        self, model: Optional[str] = None, max_retries: Optional[int] = None
+    ) -> "OpenAI":
+        import openai
+
+        return self._client(
+            self._clients, openai.OpenAI, self.http_client(), model, max_retries
+        )
+
+    # モデルに対応する、実行中のイベントループの非同期 OpenAI クライアントを返すメソッド
+    def async_client(
+        self, model: Optional[str] = None, max_retries: Optional[int] = None
+    ) -> "AsyncOpenAI":
+        import openai
+
+        http_client = self.async_http_client()
+        with self._lock:
+            clients = self._loop_clients()
+        return self._client(
+            clients, openai.AsyncOpenAI, http_client, model, max_retries
+        )
+
+    # クライアントをベース URL と max_retries ごとに作成して再利用するメソッド
+    def _client(self, clients: dict, cls, http_client, model, max_retries=None):
+        base_url = self.base_url(model)
+        key = base_url if max_retries is None else (base_url, max_retries)
+        client = clients.get(key)
+        if client is not None:
+            return client
+        kwargs = dict(self.client_kwargs)
+        if base_url:
+            kwargs["base_url"] = base_url
+        if max_retries is not None:
+            kwargs["max_retries"] = max_retries
+        client = cls(http_client=http_client, **kwargs)
+        with self._lock:
+            return clients.setdefault(key, client)
+
+    # 同期 HTTP クライアントを閉じるメソッド
+    def close(self) -> None:
+        with self._lock:
+            http_client, self._http_client = self._http_client, None
+            self._clients = {}
+        if http_client is not None:
+            http_client.close()
+
+    # 実行中のイベントループの非同期 HTTP クライアントを閉じるメソッド
+    async def aclose(self) -> None:
+        with self._lock:
+            clients = self._async_clients.pop(running_loop(), {})
+        http_client = clients.get("http")
+        if http_client is not None:
+            await http_client.aclose()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+# プロセス全体で共有するデフォルトの接続プールを返す関数
+# Swarm() や AsyncSwarm() をクライアントなしで作成した場合はこのプールを使います。
+def default_pool() -> ConnectionPool:
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ConnectionPool()
+        return _default_pool
+
+
+# デフォルトの接続プールを差し替える関数（以降に作成する Swarm に反映される）
+def set_default_pool(pool: Optional[ConnectionPool]) -> None:
+    global _default_pool
+    with _default_pool_lock:
+        _default_pool = pool
@@ -1,29 +1,52 @@
-from openai.types.chat import ChatCompletionMessage
-from openai.types.chat.chat_completion_message_tool_call import (
-    ChatCompletionMessageToolCall,
-    Function,
-)
 from typing import List, Callable, Union, Optional
 
 # Third-party imports
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
+
+from .cascade import ModelCascade
+from .usage import TokenUsage
+
+# openai の型の名前（以前はこのモジュールからインポートしていたため、参照されたときに読み込む）
+_OPENAI_TYPES = {
+    "ChatCompletionMessage": "openai.types.chat",
+    "ChatCompletionMessageToolCall": "openai.types.chat",
+    "Function": "openai.types.chat.chat_completion_message_tool_call",
+}
+
+
+def __getattr__(name: str):
+    module = _OPENAI_TYPES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+
+    return getattr(importlib.import_module(module), name)
+
 
 AgentFunction = Callable[[], Union[str, "Agent", dict]]
 
 
 class Agent(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     name: str = "Agent"
     model: str = "gpt-4o"
     instructions: Union[str, Callable[[], str]] = "You are a helpful agent."
     functions: List[AgentFunction] = []
     tool_choice: str = None
     parallel_tool_calls: bool = True
+    # 各コンプリートの前に履歴を絞り込むポリシー（Swarm の設定より優先）
+    history_policy: Optional[Callable] = None
+    # 小さいモデルを先に試し、必要な場合だけ model で生成し直すカスケード
+    cascade: Optional[ModelCascade] = None
 
 
 class Response(BaseModel):
-    messages: List = []
+    messages: List[dict] = []
     agent: Optional[Agent] = None
     context_variables: dict = {}
+    # コンプリートの usage の合計（キャッシュされたプロンプトのトークン数を含む）
+    usage: TokenUsage = Field(default_factory=TokenUsage)
 
 
 class Result(BaseModel):
@@ -0,0 +1,202 @@
+# 標準ライブラリのインポート
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional
+
+# パッケージ/ライブラリのインポート
+from pydantic import BaseModel, Field
+
+
+# コンプリートの usage からキャッシュされたプロンプトのトークン数を返す関数
+def cached_prompt_tokens(usage) -> int:
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (getattr(details, "cached_tokens", None) or 0) if details else 0
+
+
+# 1回のコンプリート（ターン）で使ったトークン数
+# agent はコンプリートを要求したエージェント名、model は応答したモデル、seconds は
+# リクエストからストリームの最後のチャンクまでの時間です。
+class TurnUsage(BaseModel):
+    agent: Optional[str] = None
+    model: Optional[str] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    seconds: float = 0.0
+
+
+# 会話で使ったトークン数の合計
+# cached_tokens はプロバイダーのプロンプトキャッシュから読まれたプロンプトのトークン数で、
+# uncached_prompt_tokens との比率からキャッシュの効果（遅延と費用）を確認できます。
+# turns にはターンごとの内訳が入り、by_agent() と cost() はそこから集計します。
+class TokenUsage(BaseModel):
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    seconds: float = 0.0
+    turns: List[TurnUsage] = Field(default_factory=list)
+
+    # キャッシュされなかったプロンプトのトークン数
+    @property
+    def uncached_prompt_tokens(self) -> int:
+        return self.prompt_tokens - self.cached_tokens
+
+    # プロンプトのトークンのうちキャッシュされたものの割合
+    @property
+    def cache_hit_rate(self) -> float:
+        if not self.prompt_tokens:
+            return 0.0
+        return self.cached_tokens / self.prompt_tokens
+
+    # プロンプトと生成のトークン数の合計
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    # 1秒あたりの生成のトークン数（コンプリートにかかった時間で割る）
+    @property
+    def tokens_per_second(self) -> float:
+        if not self.seconds:
+            return 0.0
+        return self.completion_tokens / self.seconds
+
+    # コンプリート（またはストリームの最後のチャンク）の usage を1ターンとして加えるメソッド
+    # usage が None の場合（キャッシュの再生や usage を返さないプロバイダー）も、
+    # トークン数 0 のターンとして記録します。
+    def add(
+        self,
+        usage,
+        agent: Optional[str] = None,
+        model: Optional[str] = None,
+        seconds: float = 0.0,
+    ) -> None:
+        turn = TurnUsage(agent=agent, model=model, seconds=seconds)
+        if usage is not None:
+            turn.prompt_tokens = usage.prompt_tokens or 0
+            turn.completion_tokens = usage.completion_tokens or 0
+            turn.cached_tokens = cached_prompt_tokens(usage)
+        self.add_turn(turn)
+
+    # ターンの使用量を加えるメソッド
+    def add_turn(self, turn: TurnUsage) -> None:
+        self.requests += 1
+        self.prompt_tokens += turn.prompt_tokens
+        self.completion_tokens += turn.completion_tokens
+        self.cached_tokens += turn.cached_tokens
+        self.seconds += turn.seconds
+        self.turns.append(turn)
+
+    # エージェント名ごとの使用量を返すメソッド
+    def by_agent(self) -> Dict[str, "TokenUsage"]:
+        agents = {}
+        for turn in self.turns:
+            agents.setdefault(turn.agent, TokenUsage()).add_turn(turn)
+        return agents
+
+    # 価格表から費用を計算するメソッド（価格が分からないモデルがあれば None）
+    def cost(self, prices: "PriceTable") -> Optional[float]:
+        return prices.cost(self)
+
+
+# 複数の会話の使用量を合計する関数
+def merge_usage(usages: Iterable[TokenUsage]) -> TokenUsage:
+    total = TokenUsage()
+    for usage in usages:
+        for turn in usage.turns:
+            total.add_turn(turn)
+    return total
+
+
+# モデルの価格（100万トークンあたり、cached_input を省略した場合は input と同じ）
+ModelPrice = namedtuple(
+    "ModelPrice", ["input", "output", "cached_input"], defaults=[None]
+)
+
+
+# モデル名からトークンの価格を引く価格表
+# 価格は変わるため組み込みの値は持たず、利用者が設定します。モデル名が完全に一致しない
+# 場合は、日付などの数字で始まる接尾辞を除いた名前で引きます（"gpt-4o" で
+# "gpt-4o-2024-08-06" は引けますが、"gpt-4o-mini" は引けません）。
+class PriceTable:
+    def __init__(self, prices: Optional[Dict[str, ModelPrice]] = None):
+        self.prices = {
+            model: price if isinstance(price, ModelPrice) else ModelPrice(*price)
+            for model, price in (prices or {}).items()
+        }
+
+    # モデルの価格を設定するメソッド
+    def set(
+        self,
+        model: str,
+        input: float,
+        output: float,
+        cached_input: Optional[float] = None,
+    ) -> "PriceTable":
+        self.prices[model] = ModelPrice(input, output, cached_input)
+        return self
+
+    # モデルの価格を返すメソッド（見つからなければ None）
+    def price(self, model: Optional[str]) -> Optional[ModelPrice]:
+        if model is None:
+            return None
+        price = self.prices.get(model)
+        if price is not None:
+            return price
+        matches = [
+            name
+            for name in self.prices
+            if model.startswith(name + "-") and model[len(name) + 1 :][:1].isdigit()
+        ]
+        return self.prices[max(matches, key=len)] if matches else None
+
+    # ターンまたは会話の使用量の費用を返すメソッド（価格が分からないモデルがあれば None）
+    def cost(self, usage) -> Optional[float]:
+        turns = usage.turns if isinstance(usage, TokenUsage) else [usage]
+        total = 0.0
+        for turn in turns:
+            if not turn.prompt_tokens and not turn.completion_tokens:
+                continue
+            price = self.price(turn.model)
+            if price is None:
+                return None
+            cached_price = price.cached_input
+            if cached_price is None:
+                cached_price = price.input
+            total += (
+                (turn.prompt_tokens - turn.cached_tokens) * price.input
+                + turn.cached_tokens * cached_price
+                + turn.completion_tokens * price.output
+            ) / 1_000_000
+        return total
+
+
+# run_many などの結果（Response または例外）ごとのトークン数、速度、費用を返す関数
+# 各行は index、requests、prompt_tokens、completion_tokens、cached_tokens、seconds、
+# tokens_per_second、cost（prices を指定した場合）で、例外の行は index と error です。
+def usage_report(
+    results: Iterable, prices: Optional[PriceTable] = None
+) -> List[dict]:
+    rows = []
+    for index, result in enumerate(results):
+        if isinstance(result, BaseException):
+            error = f"{type(result).__name__}: {result}"
+            rows.append({"index": index, "error": error})
+            continue
+        rows.append(usage_row(index, result.usage, prices))
+    return rows
+
+
+# 使用量を usage_report の1行にする関数
+def usage_row(index, usage: TokenUsage, prices: Optional[PriceTable] = None) -> dict:
+    row = {
+        "index": index,
+        "requests": usage.requests,
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "cached_tokens": usage.cached_tokens,
+        "seconds": usage.seconds,
+        "tokens_per_second": usage.tokens_per_second,
+    }
+    if prices is not None:
+        row["cost"] = prices.cost(usage)
+    return row
@@ -1,5 +1,14 @@
 import inspect
+import json
+import re
+import threading
+from collections import OrderedDict, namedtuple
 from datetime import datetime
+from typing import List
+
+from .message import Message
+
+__CTX_VARS_NAME__ = "context_variables"  # コンテキスト変数の名称
 
 # デバッグメッセージを出力する関数
 # デバッグモードが有効な場合にのみメッセージを出力します。
@@ -88,3 +97,414 @@ def function_to_json(func) -> dict:
             },
         },
     }
+
+
+# context_variables をモデルから隠したツールのJSON表現を作成する関数
+def function_to_tool(func) -> dict:
+    tool = function_to_json(func)
+    params = tool["function"]["parameters"]
+    params["properties"].pop(__CTX_VARS_NAME__, None)
+    if __CTX_VARS_NAME__ in params["required"]:
+        params["required"].remove(__CTX_VARS_NAME__)
+    return tool
+
+
+# 関数が context_variables を引数に取るかどうかを判定する関数
+def takes_context_variables(func) -> bool:
+    code = getattr(func, "__code__", None)
+    return code is not None and __CTX_VARS_NAME__ in code.co_varnames
+
+
+# エージェントの関数一覧をコンパイルした結果を保持するクラス
+# tools と function_map は共有されるため、呼び出し側で変更してはいけません。
+class CompiledTools:
+    __slots__ = ("tools", "function_map", "context_functions", "_payload")
+
+    def __init__(self, tools: list, function_map: dict, context_functions: frozenset):
+        self.tools = tools
+        self.function_map = function_map
+        self.context_functions = context_functions
+        self._payload = None
+
+    # tools をシリアライズしたバイト列（初回呼び出し時に作成）
+    def payload(self) -> bytes:
+        if self._payload is None:
+            self._payload = json.dumps(
+                self.tools, ensure_ascii=False, separators=(",", ":"), sort_keys=True
+            ).encode("utf-8")
+        return self._payload
+
+
+# ツールのJSON表現をキャッシュするクラス
+# 関数オブジェクトごとのスキーマと、関数一覧（タプル）ごとのコンパイル結果を LRU で保持します。
+# Agent.functions の中身が変わるとキーのタプルも変わるため、自動的に再コンパイルされます。
+class ToolCache:
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._schemas = OrderedDict()
+        self._compiled = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, cache: OrderedDict, key):
+        with self._lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
+
+    def _put(self, cache: OrderedDict, key, value) -> None:
+        with self._lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > self.maxsize:
+                cache.popitem(last=False)
+
+    # 1つの関数のツールスキーマを取得するメソッド
+    def schema(self, func) -> dict:
+        schema = self._get(self._schemas, func)
+        if schema is None:
+            schema = function_to_tool(func)
+            self._put(self._schemas, func, schema)
+        return schema
+
+    # 関数一覧をコンパイルするメソッド
+    def compile(self, functions) -> CompiledTools:
+        key = tuple(functions)
+        compiled = self._get(self._compiled, key)
+        if compiled is None:
+            compiled = CompiledTools(
+                tools=[self.schema(f) for f in key],
+                function_map={f.__name__: f for f in key},
+                context_functions=frozenset(
+                    f.__name__ for f in key if takes_context_variables(f)
+                ),
+            )
+            self._put(self._compiled, key, compiled)
+        return compiled
+
+    def clear(self) -> None:
+        with self._lock:
+            self._schemas.clear()
+            self._compiled.clear()
+
+
+# 部分的な JSON の解析で発生するイベント
+# kind は次のいずれかで、path はルートからのキーとインデックスのタプルです。
+#   key           オブジェクトのキーが確定した（value はキー）
+#   value_prefix  文字列の値の続き（value は新しく届いた部分で、つなげると値になる）
+#   value         値が確定した（オブジェクトと配列は閉じたとき）
+#   done          ルートの値が確定した（value はルートの値）
+JSONEvent = namedtuple("JSONEvent", ["kind", "path", "value"])
+
+# 部分的な JSON の解析の状態
+_VALUE = 0  # 値を待っている
+_VALUE_OR_END = 1  # "[" の直後
+_KEY_OR_END = 2  # "{" の直後
+_KEY = 3  # オブジェクトの "," の直後
+_COLON = 4  # キーの後
+_AFTER_VALUE = 5  # 値の後（"," か閉じ括弧を待っている）
+_STRING = 6  # 文字列の中
+_DONE = 7  # ルートの値が確定した
+
+_STRING_SPECIAL = re.compile(r'["\\]')
+_LITERAL_END = re.compile(r"[\s,\]}]")
+_WHITESPACE = " \t\n\r"
+
+
+# 断片に分かれて届く JSON を1回だけ走査して解析するクラス
+# feed() に断片を渡すと、その断片で確定した JSONEvent のリストを返します。
+# 断片の境界で切れたエスケープシーケンスや数値などは、次の断片と合わせて解析します。
+# JSON として正しくない場合は ValueError を送出します。
+class PartialJSONParser:
+    __slots__ = (
+        "_stack",
+        "_state",
+        "_pending",
+        "_string",
+        "_escaped",
+        "_is_key",
+        "done",
+        "value",
+    )
+
+    def __init__(self):
+        # 開いているオブジェクトと配列の [コンテナ, 現在のキー] のリスト
+        self._stack = []
+        self._state = _VALUE
+        # 前の断片で解析できなかった末尾
+        self._pending = ""
+        # 解析中の文字列の断片（エスケープシーケンスはそのまま）
+        self._string = []
+        self._escaped = False
+        self._is_key = False
+        self.done = False
+        self.value = None
+
+    # 現在解析している値の path を返すメソッド
+    def path(self) -> tuple:
+        return tuple(
+            frame[1] if isinstance(frame[0], dict) else len(frame[0])
+            for frame in self._stack
+        )
+
+    # 断片を解析し、発生したイベントのリストを返すメソッド
+    def feed(self, fragment: str) -> List[JSONEvent]:
+        events = []
+        text = self._pending + fragment if self._pending else fragment
+        self._pending = ""
+        i, n = 0, len(text)
+        while i < n:
+            state = self._state
+            if state == _STRING:
+                match = _STRING_SPECIAL.search(text, i)
+                end = match.start() if match else n
+                if end > i:
+                    chunk = text[i:end]
+                    self._string.append(chunk)
+                    if not self._is_key:
+                        events.append(JSONEvent("value_prefix", self.path(), chunk))
+                    i = end
+                    continue
+                if text[i] == '"':
+                    i += 1
+                    self.end_string(events)
+                    continue
+                # エスケープシーケンス（\uXXXX は6文字、サロゲートペアは12文字）
+                length = 2
+                if text[i + 1 : i + 2] == "u":
+                    length = 6
+                    if text[i + 2 : i + 4].lower() in ("d8", "d9", "da", "db"):
+                        length = 12
+                if i + length > n:
+                    self._pending = text[i:]
+                    break
+                sequence = text[i : i + length]
+                decoded = json.loads('"' + sequence + '"')
+                self._string.append(sequence)
+                self._escaped = True
+                if not self._is_key:
+                    events.append(JSONEvent("value_prefix", self.path(), decoded))
+                i += length
+                continue
+
+            char = text[i]
+            if char in _WHITESPACE:
+                i += 1
+                continue
+            if state == _VALUE or state == _VALUE_OR_END:
+                if state == _VALUE_OR_END and char == "]":
+                    i += 1
+                    self.close(events)
+                elif char == "{":
+                    i += 1
+                    self._stack.append([{}, None])
+                    self._state = _KEY_OR_END
+                elif char == "[":
+                    i += 1
+                    self._stack.append([[], None])
+                    self._state = _VALUE_OR_END
+                elif char == '"':
+                    i += 1
+                    self.start_string(False)
+                else:
+                    # 数値、true、false、null は区切り文字が届くまで確定しない
+                    match = _LITERAL_END.search(text, i)
+                    if match is None:
+                        self._pending = text[i:]
+                        break
+                    value = json.loads(text[i : match.start()])
+                    i = match.start()
+                    self.complete(value, events)
+            elif state == _KEY_OR_END or state == _KEY:
+                if state == _KEY_OR_END and char == "}":
+                    i += 1
+                    self.close(events)
+                elif char == '"':
+                    i += 1
+                    self.start_string(True)
+                else:
+                    raise self.error(text, i)
+            elif state == _COLON:
+                if char != ":":
+                    raise self.error(text, i)
+                i += 1
+                self._state = _VALUE
+            elif state == _AFTER_VALUE:
+                container = self._stack[-1][0]
+                i += 1
+                if char == ",":
+                    self._state = _KEY if isinstance(container, dict) else _VALUE
+                elif char == "}" and isinstance(container, dict):
+                    self.close(events)
+                elif char == "]" and isinstance(container, list):
+                    self.close(events)
+                else:
+                    raise self.error(text, i - 1)
+            else:
+                raise self.error(text, i)
+        return events
+
+    # 文字列の解析を始めるメソッド
+    def start_string(self, is_key: bool) -> None:
+        self._state = _STRING
+        self._is_key = is_key
+        self._escaped = False
+
+    # 文字列の解析を終え、キーまたは値として確定するメソッド
+    def end_string(self, events: List[JSONEvent]) -> None:
+        raw = "".join(self._string)
+        self._string = []
+        value = json.loads('"' + raw + '"') if self._escaped else raw
+        if self._is_key:
+            self._stack[-1][1] = value
+            self._state = _COLON
+            events.append(JSONEvent("key", self.path(), value))
+        else:
+            self.complete(value, events)
+
+    # オブジェクトまたは配列を閉じるメソッド
+    def close(self, events: List[JSONEvent]) -> None:
+        container = self._stack.pop()[0]
+        self.complete(container, events)
+
+    # 値を確定し、親のコンテナに加えるメソッド
+    def complete(self, value, events: List[JSONEvent]) -> None:
+        if not self._stack:
+            self.done = True
+            self.value = value
+            self._state = _DONE
+            events.append(JSONEvent("done", (), value))
+            return
+        path = self.path()
+        frame = self._stack[-1]
+        if isinstance(frame[0], dict):
+            frame[0][frame[1]] = value
+        else:
+            frame[0].append(value)
+        self._state = _AFTER_VALUE
+        events.append(JSONEvent("value", path, value))
+
+    # 解析できない位置を示す例外を返すメソッド
+    def error(self, text: str, index: int) -> ValueError:
+        return ValueError(f"JSON として解析できません: {text[index : index + 20]!r}")
+
+
+# ストリーミングの差分からアシスタントメッセージを組み立てるクラス
+# 差分オブジェクトを直接読み取り、断片をリストに追加して最後に一度だけ結合します。
+# 1つのチャンクに含まれるすべてのツール呼び出し（index ごと）を扱います。
+# parse_arguments=True の場合は、ツール呼び出しの引数を PartialJSONParser で届いた順に
+# 解析し、引数のイベントと、引数が閉じたツール呼び出しを返せるようにします。
+class StreamAccumulator:
+    __slots__ = (
+        "sender",
+        "parse_arguments",
+        "_content",
+        "_tool_calls",
+        "_parsers",
+        "_events",
+        "_closed",
+    )
+
+    def __init__(self, sender: str, parse_arguments: bool = False):
+        self.sender = sender
+        self.parse_arguments = parse_arguments
+        self._content = []
+        # index -> [id の断片, type の断片, name の断片, arguments の断片]
+        self._tool_calls = {}
+        # index -> 引数のパーサー（JSON として正しくなかった場合は None）
+        self._parsers = {}
+        # まだ返していない (index, 引数のイベントのリスト) と、引数が閉じた index
+        self._events = []
+        self._closed = set()
+
+    # 差分（ChoiceDelta）を取り込むメソッド
+    def add(self, delta) -> None:
+        content = delta.content
+        if content:
+            self._content.append(content)
+        tool_calls = delta.tool_calls
+        if not tool_calls:
+            return
+        for tool_call in tool_calls:
+            parts = self._tool_calls.get(tool_call.index)
+            if parts is None:
+                parts = self._tool_calls[tool_call.index] = ([], [], [], [])
+            if tool_call.id:
+                parts[0].append(tool_call.id)
+            if tool_call.type:
+                parts[1].append(tool_call.type)
+            function = tool_call.function
+            if function is not None:
+                if function.name:
+                    parts[2].append(function.name)
+                if function.arguments:
+                    parts[3].append(function.arguments)
+                    if self.parse_arguments:
+                        self.parse(tool_call.index, function.arguments)
+
+    # 引数の断片を解析するメソッド
+    def parse(self, index: int, fragment: str) -> None:
+        if index not in self._parsers:
+            self._parsers[index] = PartialJSONParser()
+        parser = self._parsers[index]
+        if parser is None:
+            return
+        try:
+            events = parser.feed(fragment)
+        except ValueError:
+            # 正しくない引数は、ストリームの後で通常どおりエラーとして扱う
+            self._parsers[index] = None
+            self._closed.discard(index)
+            return
+        if events:
+            self._events.append((index, events))
+            if parser.done and isinstance(parser.value, dict):
+                self._closed.add(index)
+
+    # 前回の呼び出しの後に発生した引数のイベントを (index, イベントのリスト) で返すメソッド
+    def argument_events(self) -> List[tuple]:
+        events, self._events = self._events, []
+        return events
+
+    # 引数が JSON のオブジェクトとして閉じ、これ以上変わらないツール呼び出しを返すメソッド
+    # 差分は index の順に届くため、次の index の差分が届いた呼び出しを確定したものとし、
+    # 最後の呼び出しは final=True（ストリームの終わり）の場合だけ返します。
+    # 前回の呼び出しの後に確定したものだけを、index の順に辞書のリストで返します。
+    # parse_arguments=True の場合だけ使え、引数を解析し直さないため、ストリームの途中で
+    # 繰り返し呼び出せます。
+    def closed_tool_calls(self, final: bool = False) -> List[dict]:
+        closed = []
+        last = max(self._tool_calls, default=None)
+        for index in sorted(self._closed):
+            if index == last and not final:
+                continue
+            tool_call = self.tool_call(self._tool_calls[index])
+            if tool_call["id"] and tool_call["function"]["name"]:
+                self._closed.discard(index)
+                closed.append(tool_call)
+        return closed
+
+    # 断片からツール呼び出しの辞書を組み立てるメソッド
+    @staticmethod
+    def tool_call(parts) -> dict:
+        return {
+            "function": {
+                "arguments": "".join(parts[3]),
+                "name": "".join(parts[2]),
+            },
+            "id": "".join(parts[0]),
+            "type": "".join(parts[1]),
+        }
+
+    # 組み立てたメッセージを返すメソッド
+    def message(self) -> Message:
+        tool_calls = [
+            self.tool_call(parts) for _, parts in sorted(self._tool_calls.items())
+        ]
+        return Message(
+            content="".join(self._content),
+            sender=self.sender,
+            role="assistant",
+            function_call=None,
+            tool_calls=tool_calls or None,
+        )
@@ -1,44 +1,29 @@
-from unittest.mock import MagicMock
-from swarm.types import ChatCompletionMessage, ChatCompletionMessageToolCall, Function
-from openai import OpenAI
-from openai.types.chat.chat_completion import ChatCompletion, Choice
-import json
-
-# モックレスポンスを作成する関数
-def create_mock_response(message, function_calls=[], model="gpt-4o"):
-    role = message.get("role", "assistant")
-    content = message.get("content", "")
-    tool_calls = (
-        [
-            ChatCompletionMessageToolCall(
-                id="mock_tc_id",
-                type="function",
-                function=Function(
-                    name=call.get("name", ""),
-                    arguments=json.dumps(call.get("args", {})),
-                ),
-            )
-            for call in function_calls
-        ]
-        if function_calls
-        else None
-    )
+from unittest.mock import AsyncMock, MagicMock
+from openai.types.chat.chat_completion import ChatCompletion
+
+# 応答を組み立てる関数とスクリプト式のクライアントは、ベンチマークと共有する
+from benchmarks._mock import (
+    ScriptedOpenAIClient,
+    create_mock_response,
+    create_mock_stream,
+    create_mock_usage,
+)
+
+
+# チャンクのリストを非同期イテレータとして返すクラス
+class MockAsyncStream:
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._chunks)
+        except StopIteration:
+            raise StopAsyncIteration
 
-    return ChatCompletion(
-        id="mock_cc_id",
-        created=1234567890,
-        model=model,
-        object="chat.completion",
-        choices=[
-            Choice(
-                message=ChatCompletionMessage(
-                    role=role, content=content, tool_calls=tool_calls
-                ),
-                finish_reason="stop",
-                index=0,
-            )
-        ],
-    )
 
 # モックのOpenAIクライアントクラス
 class MockOpenAIClient:
@@ -67,33 +52,56 @@ class MockOpenAIClient:
         self.chat.completions.create.assert_called_with(**kwargs)
 
 
-# モッククライアントの初期化
-client = MockOpenAIClient()
-
-# 一連のモックレスポンスを設定
-client.set_sequential_responses(
-    [
-        create_mock_response(
-            {"role": "assistant", "content": "最初のレスポンス"},
-            [
-                {
-                    "name": "process_refund",
-                    "args": {"item_id": "item_123", "reason": "高すぎる"},
-                }
-            ],
-        ),
-        create_mock_response({"role": "assistant", "content": "二番目のレスポンス"}),
-    ]
-)
+# モックのAsyncOpenAIクライアントクラス
+# ストリーミング用のチャンクのリストは MockAsyncStream に包んで返します。
+class AsyncMockOpenAIClient(MockOpenAIClient):
+    def __init__(self):
+        super().__init__()
+        self.chat.completions.create = AsyncMock()
+
+    def set_response(self, response):
+        self.chat.completions.create.side_effect = None
+        self.chat.completions.create.return_value = self._wrap(response)
+
+    def set_sequential_responses(self, responses):
+        wrapped = [self._wrap(response) for response in responses]
+        self.chat.completions.create.side_effect = wrapped
+
+    @staticmethod
+    def _wrap(response):
+        if isinstance(response, list):
+            return MockAsyncStream(response)
+        return response
+
+
+if __name__ == "__main__":
+    # モッククライアントの初期化
+    client = MockOpenAIClient()
+
+    # 一連のモックレスポンスを設定
+    client.set_sequential_responses(
+        [
+            create_mock_response(
+                {"role": "assistant", "content": "最初のレスポンス"},
+                [
+                    {
+                        "name": "process_refund",
+                        "args": {"item_id": "item_123", "reason": "高すぎる"},
+                    }
+                ],
+            ),
+            create_mock_response({"role": "assistant", "content": "二番目のレスポンス"}),
+        ]
+    )
+
+    # これは最初のモックレスポンスを返すべきです
+    first_response = client.chat.completions.create()
+    print(
+        first_response.choices[0].message
+    )  # 出力: role='agent' content='最初のレスポンス'
 
-# これは最初のモックレスポンスを返すべきです
-first_response = client.chat.completions.create()
-print(
-    first_response.choices[0].message
-)  # 出力: role='agent' content='最初のレスポンス'
-
-# これは二番目のモックレスポンスを返すべきです
-second_response = client.chat.completions.create()
-print(
-    second_response.choices[0].message
-)  # 出力: role='agent' content='二番目のレスポンス'
+    # これは二番目のモックレスポンスを返すべきです
+    second_response = client.chat.completions.create()
+    print(
+        second_response.choices[0].message
+    )  # 出力: role='agent' content='二番目のレスポンス'
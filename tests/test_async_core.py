@@ -0,0 +1,333 @@
+import asyncio
+import time
+
+import pytest
+from swarm import AsyncSwarm, Agent
+from tests.mock_client import (
+    AsyncMockOpenAIClient,
+    create_mock_response,
+    create_mock_stream,
+)
+from unittest.mock import Mock
+
+DEFAULT_RESPONSE_CONTENT = "サンプルレスポンス内容"
+
+# AsyncMockOpenAIClientを用いたテストで共通して使用するfixture
+@pytest.fixture
+def mock_openai_client():
+    m = AsyncMockOpenAIClient()
+    m.set_response(
+        create_mock_response({"role": "assistant", "content": DEFAULT_RESPONSE_CONTENT})
+    )
+    return m
+
+# シンプルなメッセージを使ったarun関数のテスト
+def test_arun_with_simple_message(mock_openai_client: AsyncMockOpenAIClient):
+    agent = Agent()
+    client = AsyncSwarm(client=mock_openai_client)
+    messages = [{"role": "user", "content": "こんにちは、調子はどうですか？"}]
+    response = asyncio.run(client.arun(agent=agent, messages=messages))
+
+    assert response.messages[-1]["role"] == "assistant"
+    assert response.messages[-1]["content"] == DEFAULT_RESPONSE_CONTENT
+
+# 同期関数と非同期関数の両方をツールとして呼び出すテスト
+def test_arun_sync_and_async_tools(mock_openai_client: AsyncMockOpenAIClient):
+    sync_mock = Mock()
+    async_mock = Mock()
+
+    def get_weather(location):
+        sync_mock(location=location)
+        return "今日は晴れです。"
+
+    async def get_time(location):
+        async_mock(location=location)
+        await asyncio.sleep(0)
+        return "12:00"
+
+    agent = Agent(name="テストエージェント", functions=[get_weather, get_time])
+    mock_openai_client.set_sequential_responses(
+        [
+            create_mock_response(
+                message={"role": "assistant", "content": ""},
+                function_calls=[
+                    {"name": "get_weather", "args": {"location": "東京"}},
+                    {"name": "get_time", "args": {"location": "東京"}},
+                ],
+            ),
+            create_mock_response(
+                {"role": "assistant", "content": DEFAULT_RESPONSE_CONTENT}
+            ),
+        ]
+    )
+
+    client = AsyncSwarm(client=mock_openai_client)
+    messages = [{"role": "user", "content": "東京の天気と時刻は？"}]
+    response = asyncio.run(client.arun(agent=agent, messages=messages))
+
+    sync_mock.assert_called_once_with(location="東京")
+    async_mock.assert_called_once_with(location="東京")
+    assert [m["content"] for m in response.messages if m["role"] == "tool"] == [
+        "今日は晴れです。",
+        "12:00",
+    ]
+    assert response.messages[-1]["content"] == DEFAULT_RESPONSE_CONTENT
+
+# 非同期のエージェント間引き継ぎとコンテキスト変数の更新のテスト
+def test_arun_handoff(mock_openai_client: AsyncMockOpenAIClient):
+    async def transfer_to_agent2(context_variables):
+        return agent2
+
+    agent1 = Agent(name="テストエージェント1", functions=[transfer_to_agent2])
+    agent2 = Agent(name="テストエージェント2")
+
+    mock_openai_client.set_sequential_responses(
+        [
+            create_mock_response(
+                message={"role": "assistant", "content": ""},
+                function_calls=[{"name": "transfer_to_agent2"}],
+            ),
+            create_mock_response(
+                {"role": "assistant", "content": DEFAULT_RESPONSE_CONTENT}
+            ),
+        ]
+    )
+
+    client = AsyncSwarm(client=mock_openai_client)
+    messages = [{"role": "user", "content": "エージェント2と話したい"}]
+    response = asyncio.run(client.arun(agent=agent1, messages=messages))
+
+    assert response.agent == agent2
+    assert response.messages[-1]["sender"] == "テストエージェント2"
+
+# 複数の会話が1つのイベントループ上で並行して進むことのテスト
+def test_arun_conversations_overlap(mock_openai_client: AsyncMockOpenAIClient):
+    async def slow_lookup():
+        await asyncio.sleep(0.2)
+        return "ok"
+
+    agent = Agent(functions=[slow_lookup])
+    client = AsyncSwarm(client=mock_openai_client)
+
+    async def main():
+        responses = [
+            create_mock_response(
+                message={"role": "assistant", "content": ""},
+                function_calls=[{"name": "slow_lookup"}],
+            ),
+            create_mock_response(
+                {"role": "assistant", "content": DEFAULT_RESPONSE_CONTENT}
+            ),
+        ]
+        # 会話ごとに「ツール呼び出し → 最終応答」の順に返す
+        mock_openai_client.set_sequential_responses(
+            [responses[0]] * 5 + [responses[1]] * 5
+        )
+        return await asyncio.gather(
+            *[
+                client.arun(agent=agent, messages=[{"role": "user", "content": "hi"}])
+                for _ in range(5)
+            ]
+        )
+
+    start = time.perf_counter()
+    results = asyncio.run(main())
+    assert time.perf_counter() - start < 0.8
+    assert all(r.messages[-1]["content"] == DEFAULT_RESPONSE_CONTENT for r in results)
+
+# arun_and_stream のストリーミングとツール呼び出しのテスト
+def test_arun_and_stream(mock_openai_client: AsyncMockOpenAIClient):
+    get_weather_mock = Mock()
+
+    async def get_weather(location):
+        get_weather_mock(location=location)
+        return "今日は晴れです。"
+
+    agent = Agent(name="テストエージェント", functions=[get_weather])
+    mock_openai_client.set_sequential_responses(
+        [
+            create_mock_stream(
+                {"role": "assistant", "content": ""},
+                [{"name": "get_weather", "args": {"location": "サンフランシスコ"}}],
+            ),
+            create_mock_stream(
+                {"role": "assistant", "content": DEFAULT_RESPONSE_CONTENT}
+            ),
+        ]
+    )
+
+    client = AsyncSwarm(client=mock_openai_client)
+
+    async def collect():
+        return [
+            chunk
+            async for chunk in client.arun_and_stream(
+                agent=agent, messages=[{"role": "user", "content": "天気は？"}]
+            )
+        ]
+
+    chunks = asyncio.run(collect())
+    response = chunks[-1]["response"]
+
+    get_weather_mock.assert_called_once_with(location="サンフランシスコ")
+    assert [c["delim"] for c in chunks if "delim" in c] == ["start", "end"] * 2
+    assert response.messages[1]["role"] == "tool"
+    assert response.messages[-1]["content"] == DEFAULT_RESPONSE_CONTENT
+
+# 引数が閉じたツール呼び出しがストリームの途中でタスクとして開始されるテスト
+def test_arun_and_stream_eager_tool_calls(mock_openai_client: AsyncMockOpenAIClient):
+    calls = []
+
+    async def get_weather(location):
+        calls.append(location)
+        return f"{location}は晴れです。"
+
+    agent = Agent(name="テストエージェント", functions=[get_weather])
+    mock_openai_client.set_sequential_responses(
+        [
+            create_mock_stream(
+                {"role": "assistant", "content": ""},
+                [
+                    {"name": "get_weather", "args": {"location": "東京"}},
+                    {"name": "get_weather", "args": {"location": "大阪"}},
+                ],
+            ),
+            create_mock_stream(
+                {"role": "assistant", "content": DEFAULT_RESPONSE_CONTENT}
+            ),
+        ]
+    )
+
+    client = AsyncSwarm(client=mock_openai_client, eager_tool_calls=True)
+
+    async def collect():
+        return [
+            chunk
+            async for chunk in client.arun_and_stream(
+                agent=agent, messages=[{"role": "user", "content": "天気は？"}]
+            )
+        ]
+
+    chunks = asyncio.run(collect())
+    response = chunks[-1]["response"]
+
+    assert calls == ["東京", "大阪"]
+    assert [m["content"] for m in response.messages[1:3]] == [
+        "東京は晴れです。",
+        "大阪は晴れです。",
+    ]
+    assert response.messages[-1]["content"] == DEFAULT_RESPONSE_CONTENT
+
+# ストリームが例外を送出した場合、先に開始したツール呼び出しのタスクが取り消されるテスト
+def test_arun_and_stream_cancels_eager_tool_calls(
+    mock_openai_client: AsyncMockOpenAIClient,
+):
+    cancelled = []
+
+    async def get_weather(location):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(location)
+            raise
+
+    agent = Agent(name="テストエージェント", functions=[get_weather])
+    chunks = create_mock_stream(
+        {"role": "assistant", "content": ""},
+        [
+            {"name": "get_weather", "args": {"location": "東京"}},
+            {"name": "get_weather", "args": {"location": "大阪"}},
+        ],
+    )
+
+    # 2番目のツール呼び出しが始まった後に失敗するストリーム
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+            tool_calls = chunk.choices[0].delta.tool_calls
+            if tool_calls and tool_calls[0].index == 1:
+                await asyncio.sleep(0)
+                raise RuntimeError("切断")
+
+    mock_openai_client.set_sequential_responses([stream()])
+    client = AsyncSwarm(client=mock_openai_client, eager_tool_calls=True)
+
+    async def collect():
+        async for _ in client.arun_and_stream(
+            agent=agent, messages=[{"role": "user", "content": "天気は？"}]
+        ):
+            pass
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(collect())
+    assert cancelled == ["東京"]
+
+# 並列ツール呼び出しを並行して実行するテスト
+def test_arun_concurrent_tool_calls(mock_openai_client: AsyncMockOpenAIClient):
+    def slow_sync(key):
+        time.sleep(0.2)
+        return f"同期: {key}"
+
+    async def slow_async(key):
+        await asyncio.sleep(0.2)
+        return f"非同期: {key}"
+
+    agent = Agent(functions=[slow_sync, slow_async])
+    mock_openai_client.set_sequential_responses(
+        [
+            create_mock_response(
+                message={"role": "assistant", "content": ""},
+                function_calls=[
+                    {"name": "slow_sync", "args": {"key": "a"}},
+                    {"name": "slow_async", "args": {"key": "b"}},
+                    {"name": "missing", "args": {}},
+                    {"name": "slow_sync", "args": {"key": "c"}},
+                ],
+            ),
+            create_mock_response(
+                {"role": "assistant", "content": DEFAULT_RESPONSE_CONTENT}
+            ),
+        ]
+    )
+
+    client = AsyncSwarm(client=mock_openai_client, concurrent_tool_calls=True)
+    start = time.perf_counter()
+    response = asyncio.run(
+        client.arun(agent=agent, messages=[{"role": "user", "content": "hi"}])
+    )
+
+    assert time.perf_counter() - start < 0.5
+    assert [m["content"] for m in response.messages if m["role"] == "tool"] == [
+        "同期: a",
+        "非同期: b",
+        "エラー: ツール missing が見つかりません。",
+        "同期: c",
+    ]
+
+# 複数の会話を非同期でバッチ実行するテスト
+def test_arun_many(mock_openai_client: AsyncMockOpenAIClient):
+    running = 0
+    peak = 0
+
+    async def create(**kwargs):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+        content = kwargs["messages"][-1]["content"]
+        if content == "fail":
+            raise RuntimeError("API エラー")
+        return create_mock_response({"role": "assistant", "content": content})
+
+    mock_openai_client.chat.completions.create.side_effect = create
+    client = AsyncSwarm(client=mock_openai_client)
+    agent = Agent()
+    jobs = [(agent, [{"role": "user", "content": str(i)}]) for i in range(10)]
+    jobs[7] = (agent, [{"role": "user", "content": "fail"}])
+
+    results = asyncio.run(client.arun_many(jobs, max_concurrency=3))
+
+    assert peak == 3
+    assert isinstance(results[7], RuntimeError)
+    assert results[9].messages[-1]["content"] == "9"
@@ -0,0 +1,49 @@
+from benchmarks import bench_import
+from benchmarks._mock import ScriptedOpenAIClient
+from benchmarks.bench_e2e import run_benchmarks
+from swarm import Agent, Swarm
+
+# スクリプト式のモッククライアントが会話ごとに同じ手順を再生することのテスト
+def test_scripted_client_replays_script_per_conversation():
+    def lookup(key):
+        return "値"
+
+    client = Swarm(
+        client=ScriptedOpenAIClient(
+            [
+                {"function_calls": [{"name": "lookup", "args": {"key": "a"}}]},
+                {"content": "完了"},
+            ]
+        )
+    )
+    agent = Agent(functions=[lookup])
+    for _ in range(2):
+        response = client.run(
+            agent=agent, messages=[{"role": "user", "content": "こんにちは"}]
+        )
+        roles = [m["role"] for m in response.messages]
+        assert roles == ["assistant", "tool", "assistant"]
+        assert response.messages[-1]["content"] == "完了"
+    assert client.client.calls == 4
+
+# ベンチマークが最後まで実行でき、必要な項目を出力することのテスト
+def test_e2e_benchmark_quick_run():
+    report = run_benchmarks(quick=True)
+    results = report["results"]
+
+    multi_turn = results["multi_turn"]
+    assert multi_turn["turns"] == 2 * multi_turn["conversations"]
+    multi_handoff = results["multi_handoff"]
+    assert multi_handoff["turns"] == 4 * multi_handoff["conversations"]
+    assert results["streaming"]["chunks_per_sec"] > 0
+    assert results["memory"]["retained_bytes_per_conversation"] > 0
+    assert set(results["history_scaling"]) == {"10", "100"}
+    assert set(results["tool_count_scaling"]) == {"1", "10"}
+
+# swarm のインポートが予算内に収まり、openai などを読み込まないことのテスト
+# （マシンの速度の差を考慮して、予算を3倍にして確認する）
+def test_import_time_budget():
+    report = bench_import.run_benchmarks(repeat=1, budget_scale=3)
+    for statement, result in report["results"].items():
+        assert result["forbidden_loaded"] == [], statement
+        assert result["median_ms"] <= result["budget_ms"], statement
@@ -0,0 +1,110 @@
+import time
+
+from swarm import Agent, CompletionCache, Swarm
+from swarm.cache import completion_cache_key
+from tests.mock_client import (
+    MockOpenAIClient,
+    create_mock_response,
+    create_mock_stream,
+)
+
+DEFAULT_RESPONSE_CONTENT = "サンプルレスポンス内容"
+
+# 同じ入力の2回目の run はキャッシュから返されることのテスト
+def test_run_uses_completion_cache():
+    mock_openai_client = MockOpenAIClient()
+    mock_openai_client.set_response(
+        create_mock_response({"role": "assistant", "content": DEFAULT_RESPONSE_CONTENT})
+    )
+    cache = CompletionCache()
+    client = Swarm(client=mock_openai_client, completion_cache=cache)
+    messages = [{"role": "user", "content": "こんにちは"}]
+
+    first = client.run(agent=Agent(), messages=messages)
+    second = client.run(agent=Agent(), messages=messages)
+    client.run(agent=Agent(), messages=[{"role": "user", "content": "別の質問"}])
+
+    assert mock_openai_client.chat.completions.create.call_count == 2
+    assert first.messages == second.messages
+    assert (cache.hits, cache.misses) == (1, 2)
+
+# キャッシュから返したコンプリートのトークン数は集計されないことのテスト
+def test_cache_hits_report_no_usage():
+    mock_openai_client = MockOpenAIClient()
+    mock_openai_client.set_response(
+        create_mock_response(
+            {"role": "assistant", "content": DEFAULT_RESPONSE_CONTENT},
+            usage={"prompt": 100, "completion": 10},
+        )
+    )
+    client = Swarm(client=mock_openai_client, completion_cache=CompletionCache())
+    messages = [{"role": "user", "content": "こんにちは"}]
+
+    first = client.run(agent=Agent(), messages=messages).usage
+    second = client.run(agent=Agent(), messages=messages).usage
+    events = list(client.run(agent=Agent(), messages=messages, stream=True))
+
+    assert mock_openai_client.chat.completions.create.call_count == 1
+    assert (first.prompt_tokens, first.completion_tokens) == (100, 10)
+    assert (second.requests, second.total_tokens) == (1, 0)
+    assert events[-1]["response"].usage.total_tokens == 0
+
+# キャッシュされたストリームが同じ形のイベントとして再生されることのテスト
+def test_run_and_stream_replays_cached_stream():
+    calls = []
+
+    def get_weather(location):
+        calls.append(location)
+        return "晴れ"
+
+    agent = Agent(functions=[get_weather])
+    stream_responses = [
+        create_mock_stream(
+            {"role": "assistant", "content": ""},
+            [{"name": "get_weather", "args": {"location": "東京"}}],
+        ),
+        create_mock_stream({"role": "assistant", "content": DEFAULT_RESPONSE_CONTENT}),
+    ]
+    mock_openai_client = MockOpenAIClient()
+    mock_openai_client.set_sequential_responses(
+        [iter(chunks) for chunks in stream_responses]
+    )
+    client = Swarm(client=mock_openai_client, completion_cache=CompletionCache())
+    messages = [{"role": "user", "content": "天気は？"}]
+
+    def run():
+        events = list(client.run(agent=agent, messages=messages, stream=True))
+        content = "".join(e.get("content") or "" for e in events if "delim" not in e)
+        return events[-1]["response"], content
+
+    first, first_content = run()
+    second, second_content = run()
+
+    assert mock_openai_client.chat.completions.create.call_count == 2
+    assert calls == ["東京", "東京"]
+    assert first_content == second_content == DEFAULT_RESPONSE_CONTENT
+    assert second.messages[0]["tool_calls"] == first.messages[0]["tool_calls"]
+    assert second.messages[-1]["content"] == DEFAULT_RESPONSE_CONTENT
+
+# SQLite 層、TTL、件数によるエビクションのテスト
+def test_sqlite_tier_ttl_and_eviction(tmp_path):
+    path = str(tmp_path / "completions.db")
+    completion = create_mock_response({"role": "assistant", "content": "保存"})
+    key = completion_cache_key({"model": "gpt-4o", "messages": []})
+
+    CompletionCache(path=path).set(key, completion)
+    # 新しいインスタンス（別プロセスを想定）でもディスクから読み出せる
+    restored = CompletionCache(path=path).get(key)
+    assert restored.choices[0].message.content == "保存"
+
+    expiring = CompletionCache(ttl=0.05, path=path)
+    expiring.set(key, completion)
+    time.sleep(0.1)
+    assert expiring.get(key) is None
+
+    bounded = CompletionCache(maxsize=2, path=path, max_disk_entries=2)
+    for i in range(3):
+        bounded.set(f"key-{i}", completion)
+    assert len(bounded.memory) == 2 and len(bounded.disk) == 2
+    assert bounded.memory.get("key-0") is None
+    assert bounded.get("key-2") is not None
@@ -0,0 +1,182 @@
+import asyncio
+
+from openai.types.chat.chat_completion import ChoiceLogprobs
+from openai.types.chat.chat_completion_token_logprob import ChatCompletionTokenLogprob
+
+from swarm import Agent, AsyncSwarm, ModelCascade, Swarm
+from tests.mock_client import (
+    AsyncMockOpenAIClient,
+    MockOpenAIClient,
+    create_mock_response,
+)
+
+MESSAGES = [{"role": "user", "content": "予約を変更したいです"}]
+
+
+def transfer_to_flights(reason: str):
+    return "flights"
+
+
+def make_agent(**kwargs):
+    return Agent(
+        name="トリアージ",
+        functions=[transfer_to_flights],
+        cascade=ModelCascade(model="gpt-4o-mini", **kwargs),
+    )
+
+
+def tool_call_response(name="transfer_to_flights", args={"reason": "変更"}):
+    return create_mock_response(
+        {"role": "assistant", "content": ""}, [{"name": name, "args": args}]
+    )
+
+
+def text_response(content, logprobs=None):
+    completion = create_mock_response({"role": "assistant", "content": content})
+    if logprobs is not None:
+        completion.choices[0].logprobs = ChoiceLogprobs(
+            content=[
+                ChatCompletionTokenLogprob(
+                    token="x", logprob=logprob, bytes=None, top_logprobs=[]
+                )
+                for logprob in logprobs
+            ]
+        )
+    return completion
+
+
+def models_called(mock):
+    calls = mock.chat.completions.create.call_args_list
+    return [call.kwargs["model"] for call in calls]
+
+# 小さいモデルの有効なツール呼び出しが採用されることのテスト
+def test_cascade_accepts_valid_tool_call():
+    agent = make_agent()
+    mock = MockOpenAIClient()
+    mock.chat.completions.create.side_effect = [tool_call_response()]
+    client = Swarm(client=mock)
+
+    client.run(agent=agent, messages=MESSAGES, execute_tools=False)
+    assert models_called(mock) == ["gpt-4o-mini"]
+    stats = agent.cascade.stats("トリアージ")
+    assert stats["accepted"] == 1
+    assert stats["accept_rate"] == 1.0
+
+# 不明な関数、必須の引数の不足、内容だけの応答はエスカレートすることのテスト
+def test_cascade_escalates_invalid_results():
+    agent = make_agent()
+    final = text_response("確認します")
+    mock = MockOpenAIClient()
+    mock.chat.completions.create.side_effect = [
+        tool_call_response(name="transfer_to_hotels"),
+        final,
+        tool_call_response(args={}),
+        final,
+        text_response("たぶん"),
+        final,
+    ]
+    client = Swarm(client=mock)
+
+    for _ in range(3):
+        response = client.run(agent=agent, messages=MESSAGES, execute_tools=False)
+        assert response.messages[-1]["content"] == "確認します"
+    assert models_called(mock) == ["gpt-4o-mini", "gpt-4o"] * 3
+    stats = agent.cascade.stats()["トリアージ"]
+    assert stats["escalated"] == 3
+    assert stats["accept_rate"] == 0.0
+
+# min_logprob を指定した場合、確信度の高い内容の応答が採用されることのテスト
+def test_cascade_logprob_threshold():
+    agent = make_agent(min_logprob=-0.5)
+    mock = MockOpenAIClient()
+    mock.chat.completions.create.side_effect = [
+        text_response("はい", logprobs=[-0.1, -0.2]),
+        text_response("いいえ", logprobs=[-2.0, -0.1]),
+        text_response("確認します"),
+    ]
+    client = Swarm(client=mock)
+
+    response = client.run(agent=agent, messages=MESSAGES)
+    assert response.messages[-1]["content"] == "はい"
+    response = client.run(agent=agent, messages=MESSAGES)
+    assert response.messages[-1]["content"] == "確認します"
+    assert mock.chat.completions.create.call_args_list[0].kwargs["logprobs"] is True
+    stats = agent.cascade.stats("トリアージ")
+    assert (stats["accepted"], stats["escalated"]) == (1, 1)
+    assert stats["saved_ms"] is not None
+
+# model_override を指定した場合はカスケードを使わないことのテスト
+def test_cascade_skipped_with_model_override():
+    agent = make_agent()
+    mock = MockOpenAIClient()
+    mock.set_response(text_response("はい"))
+    Swarm(client=mock).run(agent=agent, messages=MESSAGES, model_override="gpt-4.1")
+
+    assert models_called(mock) == ["gpt-4.1"]
+    assert agent.cascade.stats() == {}
+
+# ストリーミングでは採用した結果が合成チャンクとして返されることのテスト
+def test_cascade_streaming_and_async():
+    agent = make_agent()
+    mock = MockOpenAIClient()
+    mock.chat.completions.create.side_effect = [tool_call_response()]
+    events = list(
+        Swarm(client=mock).run(
+            agent=agent, messages=MESSAGES, stream=True, execute_tools=False
+        )
+    )
+    message = events[-1]["response"].messages[-1]
+    assert message["tool_calls"][0]["function"]["name"] == "transfer_to_flights"
+    assert mock.chat.completions.create.call_args.kwargs["stream"] is False
+
+    mock = AsyncMockOpenAIClient()
+    mock.chat.completions.create.side_effect = [tool_call_response()]
+    response = asyncio.run(
+        AsyncSwarm(client=mock).arun(
+            agent=agent, messages=MESSAGES, execute_tools=False
+        )
+    )
+    assert response.messages[-1]["tool_calls"][0]["function"]["name"] == (
+        "transfer_to_flights"
+    )
+    assert agent.cascade.stats("トリアージ")["accepted"] == 2
+
+# 小さいモデルのトークン数が、エスカレートした場合もストリーミングの場合も集計されることのテスト
+def test_cascade_reports_draft_usage():
+    agent = make_agent()
+    mock = MockOpenAIClient()
+    mock.chat.completions.create.side_effect = [
+        create_mock_response(
+            {"role": "assistant", "content": "たぶん"},
+            model="gpt-4o-mini",
+            usage={"prompt": 100, "completion": 5},
+        ),
+        create_mock_response(
+            {"role": "assistant", "content": "確認します"},
+            usage={"prompt": 100, "completion": 8},
+        ),
+    ]
+    client = Swarm(client=mock)
+
+    usage = client.run(agent=agent, messages=MESSAGES).usage
+    assert [(t.model, t.completion_tokens) for t in usage.turns] == [
+        ("gpt-4o-mini", 5),
+        ("gpt-4o", 8),
+    ]
+    assert (usage.requests, usage.prompt_tokens) == (2, 200)
+
+    mock.chat.completions.create.side_effect = [
+        create_mock_response(
+            {"role": "assistant", "content": ""},
+            [{"name": "transfer_to_flights", "args": {"reason": "変更"}}],
+            model="gpt-4o-mini",
+            usage={"prompt": 100, "completion": 12},
+        )
+    ]
+    events = list(
+        client.run(agent=agent, messages=MESSAGES, stream=True, execute_tools=False)
+    )
+    usage = events[-1]["response"].usage
+    assert [(t.model, t.completion_tokens) for t in usage.turns] == [
+        ("gpt-4o-mini", 12)
+    ]
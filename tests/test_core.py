@@ -1,6 +1,15 @@
+import asyncio
+import threading
+import time
+
 import pytest
 from swarm import Swarm, Agent
-from tests.mock_client import MockOpenAIClient, create_mock_response
+from swarm.types import Result
+from tests.mock_client import (
+    MockOpenAIClient,
+    create_mock_response,
+    create_mock_stream,
+)
 from unittest.mock import Mock
 import json
 
@@ -143,3 +152,288 @@ def test_handoff(mock_openai_client: MockOpenAIClient):
     assert response.agent == agent2
     assert response.messages[-1]["role"] == "assistant"
     assert response.messages[-1]["content"] == DEFAULT_RESPONSE_CONTENT
+
+# 単独の async def のツールも同期の Swarm で完了まで実行されるテスト
+@pytest.mark.parametrize("concurrent", [False, True])
+def test_single_async_tool_call(mock_openai_client: MockOpenAIClient, concurrent):
+    async def async_lookup(key):
+        await asyncio.sleep(0.01)
+        return f"非同期: {key}"
+
+    agent = Agent(functions=[async_lookup])
+    mock_openai_client.set_sequential_responses(
+        [
+            create_mock_response(
+                message={"role": "assistant", "content": ""},
+                function_calls=[{"name": "async_lookup", "args": {"key": "a"}}],
+            ),
+            create_mock_response(
+                {"role": "assistant", "content": DEFAULT_RESPONSE_CONTENT}
+            ),
+        ]
+    )
+
+    client = Swarm(client=mock_openai_client, concurrent_tool_calls=concurrent)
+    response = client.run(agent=agent, messages=[{"role": "user", "content": "調べて"}])
+
+    tool_messages = [m for m in response.messages if m["role"] == "tool"]
+    assert [m["content"] for m in tool_messages] == ["非同期: a"]
+
+# 並列ツール呼び出しを並行して実行するテスト
+def test_concurrent_tool_calls(mock_openai_client: MockOpenAIClient):
+    def slow_lookup(key):
+        time.sleep(0.2)
+        return f"値: {key}"
+
+    async def async_lookup(key):
+        await asyncio.sleep(0.2)
+        return Result(value=f"非同期: {key}", context_variables={"last": key})
+
+    def transfer_to_agent2():
+        return agent2
+
+    def transfer_to_agent3():
+        return agent3
+
+    agent2 = Agent(name="テストエージェント2")
+    agent3 = Agent(name="テストエージェント3")
+    agent1 = Agent(
+        name="テストエージェント1",
+        functions=[slow_lookup, async_lookup, transfer_to_agent2, transfer_to_agent3],
+    )
+
+    mock_openai_client.set_sequential_responses(
+        [
+            create_mock_response(
+                message={"role": "assistant", "content": ""},
+                function_calls=[
+                    {"name": "slow_lookup", "args": {"key": "a"}},
+                    {"name": "async_lookup", "args": {"key": "b"}},
+                    {"name": "slow_lookup", "args": {"key": "c"}},
+                    {"name": "transfer_to_agent3"},
+                    {"name": "transfer_to_agent2"},
+                ],
+            ),
+            create_mock_response(
+                {"role": "assistant", "content": DEFAULT_RESPONSE_CONTENT}
+            ),
+        ]
+    )
+
+    client = Swarm(client=mock_openai_client, concurrent_tool_calls=True)
+    start = time.perf_counter()
+    response = client.run(
+        agent=agent1, messages=[{"role": "user", "content": "まとめて調べて"}]
+    )
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.5
+    tool_messages = [m for m in response.messages if m["role"] == "tool"]
+    assert [m["content"] for m in tool_messages[:3]] == [
+        "値: a",
+        "非同期: b",
+        "値: c",
+    ]
+    # 引き継ぎはツール呼び出しの順で最後のものが優先される
+    assert response.agent == agent2
+    assert response.context_variables == {"last": "b"}
+
+# run_and_stream のストリーミングとツール呼び出しのテスト
+def test_run_and_stream(mock_openai_client: MockOpenAIClient):
+    get_weather_mock = Mock()
+
+    def get_weather(location):
+        get_weather_mock(location=location)
+        return "今日は晴れです。"
+
+    agent = Agent(name="テストエージェント", functions=[get_weather])
+    mock_openai_client.set_sequential_responses(
+        [
+            create_mock_stream(
+                {"role": "assistant", "content": ""},
+                [
+                    {"name": "get_weather", "args": {"location": "東京"}},
+                    {"name": "get_weather", "args": {"location": "大阪"}},
+                ],
+            ),
+            create_mock_stream(
+                {"role": "assistant", "content": DEFAULT_RESPONSE_CONTENT}
+            ),
+        ]
+    )
+
+    client = Swarm(client=mock_openai_client)
+    chunks = list(
+        client.run(
+            agent=agent,
+            messages=[{"role": "user", "content": "天気は？"}],
+            stream=True,
+        )
+    )
+    response = chunks[-1]["response"]
+
+    assert get_weather_mock.call_count == 2
+    assert chunks[1]["sender"] == "テストエージェント"
+    tool_calls = response.messages[0]["tool_calls"]
+    assert [json.loads(t["function"]["arguments"]) for t in tool_calls] == [
+        {"location": "東京"},
+        {"location": "大阪"},
+    ]
+    assert response.messages[-1]["content"] == DEFAULT_RESPONSE_CONTENT
+
+# 引数が確定したツール呼び出しがストリームの途中で実行され、結果が順に反映されるテスト
+def test_run_and_stream_eager_tool_calls(mock_openai_client: MockOpenAIClient):
+    started = threading.Event()
+
+    def get_weather(location):
+        if location == "東京":
+            started.set()
+        return f"{location}は晴れです。"
+
+    agent = Agent(name="テストエージェント", functions=[get_weather])
+    chunks = create_mock_stream(
+        {"role": "assistant", "content": ""},
+        [
+            {"name": "get_weather", "args": {"location": "東京"}},
+            {"name": "get_weather", "args": {"location": "大阪"}},
+        ],
+    )
+    second_call = next(
+        i
+        for i, chunk in enumerate(chunks)
+        if chunk.choices[0].delta.tool_calls
+        and chunk.choices[0].delta.tool_calls[0].index == 1
+    )
+    observed = []
+
+    # 2番目のツール呼び出しの最初の差分を送った後、残りを送る前に、最初の呼び出しが
+    # 始まっているかを記録する
+    def stream():
+        for i, chunk in enumerate(chunks):
+            if i == second_call + 1:
+                observed.append(started.wait(timeout=2))
+            yield chunk
+
+    mock_openai_client.set_sequential_responses(
+        [
+            stream(),
+            create_mock_stream(
+                {"role": "assistant", "content": DEFAULT_RESPONSE_CONTENT}
+            ),
+        ]
+    )
+
+    client = Swarm(client=mock_openai_client, eager_tool_calls=True)
+    events = list(
+        client.run_and_stream(
+            agent=agent, messages=[{"role": "user", "content": "天気は？"}]
+        )
+    )
+    response = events[-1]["response"]
+
+    assert observed == [True]
+    assert [m["content"] for m in response.messages[1:3]] == [
+        "東京は晴れです。",
+        "大阪は晴れです。",
+    ]
+    assert response.messages[-1]["content"] == DEFAULT_RESPONSE_CONTENT
+
+# argument_events=True でツール呼び出しの引数のイベントが返されるテスト
+def test_run_and_stream_argument_events(mock_openai_client: MockOpenAIClient):
+    def search(query):
+        return "結果"
+
+    agent = Agent(name="テストエージェント", functions=[search])
+    mock_openai_client.set_sequential_responses(
+        [
+            create_mock_stream(
+                {"role": "assistant", "content": ""},
+                [{"name": "search", "args": {"query": "東京の天気"}}],
+                chunk_size=3,
+            ),
+            create_mock_stream(
+                {"role": "assistant", "content": DEFAULT_RESPONSE_CONTENT}
+            ),
+        ]
+    )
+
+    client = Swarm(client=mock_openai_client)
+    chunks = list(
+        client.run_and_stream(
+            agent=agent,
+            messages=[{"role": "user", "content": "調べて"}],
+            argument_events=True,
+        )
+    )
+    events = [
+        event
+        for chunk in chunks
+        if "arguments" in chunk
+        for event in chunk["arguments"]["events"]
+    ]
+
+    assert all(c["arguments"]["index"] == 0 for c in chunks if "arguments" in c)
+    assert events[0].kind == "key" and events[0].path == ("query",)
+    prefixes = [e.value for e in events if e.kind == "value_prefix"]
+    assert len(prefixes) > 1 and "".join(prefixes) == "東京の天気"
+    assert events[-1].kind == "done" and events[-1].value == {"query": "東京の天気"}
+    assert chunks[-1]["response"].messages[1]["content"] == "結果"
+
+# 複数の会話をバッチ実行するテスト
+def test_run_many(mock_openai_client: MockOpenAIClient):
+    # 最後のユーザーメッセージをそのまま返す（"fail" の場合は例外）
+    def create(**kwargs):
+        time.sleep(0.1)
+        content = kwargs["messages"][-1]["content"]
+        if content == "fail":
+            raise RuntimeError("API エラー")
+        return create_mock_response({"role": "assistant", "content": content})
+
+    mock_openai_client.chat.completions.create.side_effect = create
+    client = Swarm(client=mock_openai_client)
+    agent = Agent()
+    jobs = [
+        (agent, [{"role": "user", "content": str(i)}], {"i": i}) for i in range(8)
+    ]
+    jobs[3] = {"agent": agent, "messages": [{"role": "user", "content": "fail"}]}
+    progress = []
+
+    start = time.perf_counter()
+    results = client.run_many(
+        jobs, max_concurrency=4, on_progress=lambda done, total: progress.append(done)
+    )
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.6
+    assert isinstance(results[3], RuntimeError)
+    assert [r.messages[-1]["content"] for i, r in enumerate(results) if i != 3] == [
+        "0",
+        "1",
+        "2",
+        "4",
+        "5",
+        "6",
+        "7",
+    ]
+    assert results[5].context_variables == {"i": 5}
+    assert progress == list(range(1, 9))
+
+# 複数のスレッドから同時に取得してもスレッドプールが1つだけ作成されるテスト
+def test_tool_executor_created_once(mock_openai_client: MockOpenAIClient):
+    client = Swarm(client=mock_openai_client)
+    barrier = threading.Barrier(8)
+    executors = []
+
+    def get_executor():
+        barrier.wait()
+        executors.append(client.tool_executor())
+
+    threads = [threading.Thread(target=get_executor) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    client.close()
+
+    assert len(executors) == 8
+    assert all(executor is executors[0] for executor in executors)
@@ -0,0 +1,129 @@
+import asyncio
+
+from swarm import Agent, AsyncSwarm, Swarm
+from swarm.events import (
+    ContentDelta,
+    DeltaCoalescer,
+    FinalResponse,
+    Handoff,
+    ToolCallDelta,
+    TurnEnd,
+    TurnStart,
+    coalesce,
+)
+from swarm.repl.repl import process_and_print_streaming_response
+from tests.mock_client import (
+    AsyncMockOpenAIClient,
+    MockOpenAIClient,
+    create_mock_stream,
+)
+
+support = Agent(name="サポート")
+
+
+def transfer_to_support():
+    return support
+
+
+triage = Agent(name="受付", functions=[transfer_to_support])
+
+
+# 引き継ぎを含む会話のストリーム（ツール呼び出し、引き継ぎ先の応答）を設定する関数
+def set_handoff_streams(mock):
+    mock.set_sequential_responses(
+        [
+            create_mock_stream(
+                {"role": "assistant", "content": "担当に代わります。"},
+                [{"name": "transfer_to_support", "args": {}}],
+                chunk_size=2,
+            ),
+            create_mock_stream(
+                {"role": "assistant", "content": "サポートです。ご用件をどうぞ。"},
+                chunk_size=2,
+            ),
+        ]
+    )
+
+
+# 型付きのイベントにターン、差分、引き継ぎ、最終的な Response が含まれることのテスト
+def test_stream_events_reports_turns_and_handoffs():
+    mock = MockOpenAIClient()
+    set_handoff_streams(mock)
+    client = Swarm(client=mock)
+    messages = [{"role": "user", "content": "助けて"}]
+
+    events = list(client.stream_events(agent=triage, messages=messages))
+    deltas = (ContentDelta, ToolCallDelta)
+    kinds = [type(e) for e in events if not isinstance(e, deltas)]
+    assert kinds == [TurnStart, TurnEnd, Handoff, TurnStart, TurnEnd, FinalResponse]
+    assert Handoff("受付", "サポート") in events
+    assert [e for e in events if isinstance(e, TurnStart)] == [
+        TurnStart("受付", 1),
+        TurnStart("サポート", 2),
+    ]
+    contents = [e for e in events if isinstance(e, ContentDelta)]
+    assert len(contents) > 2
+    assert "".join(e.content for e in contents if e.agent == "受付") == "担当に代わります。"
+    tool_calls = [e for e in events if isinstance(e, ToolCallDelta)]
+    assert tool_calls[0].name == "transfer_to_support"
+    assert events[-1].response.agent is support
+
+    # 時間の窓なしでまとめると、ターンの差分は1つずつになる
+    set_handoff_streams(mock)
+    events = list(
+        client.stream_events(
+            agent=triage,
+            messages=messages,
+            coalescer=DeltaCoalescer(max_chars=None, interval=None),
+        )
+    )
+    contents = [e.content for e in events if isinstance(e, ContentDelta)]
+    assert contents == ["担当に代わります。", "サポートです。ご用件をどうぞ。"]
+    tool_calls = [e for e in events if isinstance(e, ToolCallDelta)]
+    assert [(t.id, t.name, t.arguments) for t in tool_calls] == [
+        ("mock_tc_id_0", "transfer_to_support", "{}")
+    ]
+
+    # AsyncSwarm でも同じイベントになる
+    async_mock = AsyncMockOpenAIClient()
+    set_handoff_streams(async_mock)
+    async_client = AsyncSwarm(client=async_mock)
+
+    async def collect():
+        return [
+            event
+            async for event in async_client.astream_events(
+                agent=triage, messages=messages, coalescer=DeltaCoalescer(None, None)
+            )
+        ]
+
+    assert [type(e) for e in asyncio.run(collect())] == [type(e) for e in events]
+
+# 差分が文字数と時間の窓でまとめられることのテスト
+def test_coalesce_by_size_and_interval():
+    deltas = [ContentDelta("a", "xy")] * 5 + [ContentDelta("b", "z")]
+    merged = list(coalesce(deltas, max_chars=4, interval=None))
+    assert [e.content for e in merged] == ["xyxy", "xyxy", "xy", "z"]
+
+    # 最初の差分はすぐに返し、窓の中の差分はまとめる
+    merged = list(coalesce(deltas, max_chars=None, interval=60))
+    assert [e.content for e in merged] == ["xy", "xyxyxyxy", "z"]
+
+    # 窓が 0 の場合はまとめない
+    assert list(coalesce(deltas, max_chars=None, interval=0)) == deltas
+
+# REPL がまとめた差分を出力することのテスト
+def test_repl_prints_coalesced_stream(capsys):
+    mock = MockOpenAIClient()
+    set_handoff_streams(mock)
+    client = Swarm(client=mock)
+    stream = client.run(
+        agent=triage, messages=[{"role": "user", "content": "助けて"}], stream=True
+    )
+
+    response = process_and_print_streaming_response(stream, interval=60)
+    output = capsys.readouterr().out
+    assert response.agent is support
+    assert "担当に代わります。" in output
+    assert "transfer_to_support" in output
+    assert "サポートです。ご用件をどうぞ。" in output
@@ -0,0 +1,96 @@
+import pytest
+
+from swarm import Agent, Swarm, compile_agents
+from swarm.graph import GraphError
+from swarm.types import Result
+from tests.mock_client import MockOpenAIClient, create_mock_response
+
+sales_agent = Agent(name="営業", instructions="商品を案内します。")
+refunds_agent = Agent(name="返金", instructions="返金を処理します。")
+
+
+def transfer_to_sales():
+    return sales_agent
+
+
+def transfer_to_refunds():
+    return Result(value="返金へ", agent=refunds_agent)
+
+
+def transfer_back_to_triage():
+    return triage_agent
+
+
+triage_agent = Agent(
+    name="トリアージ", functions=[transfer_to_sales, transfer_to_refunds]
+)
+sales_agent.functions = [transfer_back_to_triage]
+
+# 引き継ぎの辺がグローバル変数、Result、クロージャーからたどられることのテスト
+def test_compile_discovers_handoff_edges():
+    graph = compile_agents([triage_agent])
+
+    assert graph.edges() == {
+        "トリアージ": ["営業", "返金"],
+        "営業": ["トリアージ"],
+        "返金": [],
+    }
+    assert graph.issues == []
+
+    support = Agent(name="サポート")
+
+    def transfer_to_support():
+        return support
+
+    entry = Agent(name="入口", functions=[transfer_to_support])
+    assert compile_agents([entry]).edges()["入口"] == ["サポート"]
+
+# たどれないエージェントと不明なツールが問題として記録されることのテスト
+def test_compile_flags_unreachable_agents_and_unknown_tools():
+    def lookup():
+        return "値"
+
+    orphan = Agent(name="孤立", functions=[lookup, lookup], tool_choice="search")
+    graph = compile_agents([triage_agent, orphan])
+
+    kinds = sorted((issue.kind, issue.agent) for issue in graph.issues)
+    assert kinds == [
+        ("duplicate_tool", "孤立"),
+        ("unknown_tool", "孤立"),
+        ("unreachable", "孤立"),
+    ]
+    graph.check(kinds=["invalid_tool_name"])
+    with pytest.raises(GraphError) as error:
+        graph.check()
+    assert len(error.value.issues) == 3
+    with pytest.raises(GraphError):
+        compile_agents([triage_agent, orphan], strict=True)
+
+# コンパイル済みのエージェントはテンプレートを使い、変更されると作り直されることのテスト
+def test_swarm_uses_prerendered_templates():
+    mock = MockOpenAIClient()
+    mock.set_response(create_mock_response({"role": "assistant", "content": "はい"}))
+    client = Swarm(client=mock)
+    graph = client.compile([triage_agent])
+    template = graph.template(sales_agent)
+    assert template.system_message == {"role": "system", "content": "商品を案内します。"}
+    assert template.compiled.payload()
+
+    messages = [{"role": "user", "content": "こんにちは"}]
+    client.run(agent=sales_agent, messages=messages)
+    sent = mock.chat.completions.create.call_args.kwargs
+    assert sent["messages"][0] is template.system_message
+    assert sent["tools"] is template.params["tools"]
+    assert sent["model"] == "gpt-4o" and sent["parallel_tool_calls"] is True
+
+    agent = Agent(name="動的", instructions=lambda cv: f"{cv['name']}さん向け")
+    graph = client.compile([agent])
+    client.run(agent=agent, messages=messages, context_variables={"name": "太郎"})
+    sent = mock.chat.completions.create.call_args.kwargs
+    assert sent["messages"][0] == {"role": "system", "content": "太郎さん向け"}
+
+    agent.instructions = "変更後"
+    client.run(agent=agent, messages=messages)
+    sent = mock.chat.completions.create.call_args.kwargs
+    assert sent["messages"][0] == {"role": "system", "content": "変更後"}
+    assert graph.template(agent).system_message == sent["messages"][0]
@@ -0,0 +1,231 @@
+import asyncio
+import json
+import threading
+
+from swarm import (
+    Agent,
+    AsyncSwarm,
+    ContextVariables,
+    History,
+    Swarm,
+    TokenBudgetPolicy,
+)
+from tests.mock_client import (
+    AsyncMockOpenAIClient,
+    MockOpenAIClient,
+    create_mock_response,
+)
+
+# 呼び出し元のリストを変更せずに追記できることのテスト
+def test_history_does_not_mutate_source_list():
+    source = [{"role": "user", "content": "1"}]
+    history = History(source)
+    history.append({"role": "assistant", "content": "2"})
+
+    assert source == [{"role": "user", "content": "1"}]
+    assert history == [
+        {"role": "user", "content": "1"},
+        {"role": "assistant", "content": "2"},
+    ]
+    assert history[0] is source[0]
+
+# fork() した履歴がそれぞれ独立して追記できることのテスト
+def test_history_fork_shares_prefix():
+    base = History()
+    base.extend({"role": "user", "content": str(i)} for i in range(5))
+    left = base.fork()
+    right = base.fork()
+    left.append({"role": "assistant", "content": "left"})
+    right.append({"role": "assistant", "content": "right"})
+    right.append({"role": "user", "content": "more"})
+
+    assert len(base) == 5
+    assert [m["content"] for m in left] == ["0", "1", "2", "3", "4", "left"]
+    assert [m["content"] for m in right] == ["0", "1", "2", "3", "4", "right", "more"]
+    assert left[2] is right[2]
+    assert right[-1]["content"] == "more"
+    assert [m["content"] for m in right[4:6]] == ["4", "right"]
+    assert [m["content"] for m in right[::3]] == ["0", "3", "more"]
+
+# コンテキスト変数への書き込みが元の辞書に影響しないことのテスト
+def test_context_variables_copy_on_write():
+    source = {"name": "ジェームズ", "user_id": 123}
+    context = ContextVariables.from_mapping(source)
+    context["name"] = "ハナコ"
+    context.update({"plan": "pro"})
+    branch = context.fork()
+    branch["plan"] = "free"
+
+    assert source == {"name": "ジェームズ", "user_id": 123}
+    assert context.to_dict() == {"name": "ハナコ", "user_id": 123, "plan": "pro"}
+    assert branch["plan"] == "free"
+
+# run が履歴を深くコピーせずに会話を分岐できることのテスト
+def test_run_with_forked_history():
+    mock_openai_client = MockOpenAIClient()
+    mock_openai_client.set_response(
+        create_mock_response({"role": "assistant", "content": "応答"})
+    )
+    client = Swarm(client=mock_openai_client)
+
+    first = {"role": "user", "content": "こんにちは"}
+    history = History([first])
+    branch = history.fork()
+    branch.append({"role": "user", "content": "分岐"})
+
+    response = client.run(agent=Agent(), messages=branch)
+    sent = mock_openai_client.chat.completions.create.call_args.kwargs["messages"]
+
+    assert sent[1] is first
+    assert [m["content"] for m in sent[1:]] == ["こんにちは", "分岐"]
+    assert len(response.messages) == 1
+    assert len(history) == 1 and len(branch) == 2
+
+# ツールには JSON に変換できる通常の辞書が渡され、最上位への書き込みが会話に反映されるテスト
+def test_tools_receive_plain_dict():
+    received = []
+
+    def save(context_variables):
+        received.append(context_variables)
+        context_variables["seen"] = True
+        return json.dumps(context_variables, ensure_ascii=False)
+
+    mock_openai_client = MockOpenAIClient()
+    mock_openai_client.set_sequential_responses(
+        [
+            create_mock_response(
+                {"role": "assistant", "content": ""}, [{"name": "save", "args": {}}]
+            ),
+            create_mock_response({"role": "assistant", "content": "完了"}),
+        ]
+    )
+    source = {"name": "ジェームズ"}
+    response = Swarm(client=mock_openai_client).run(
+        agent=Agent(functions=[save]),
+        messages=[{"role": "user", "content": "保存して"}],
+        context_variables=source,
+    )
+
+    assert type(received[0]) is dict
+    assert json.loads(response.messages[1]["content"])["name"] == "ジェームズ"
+    assert response.context_variables == {"name": "ジェームズ", "seen": True}
+    assert source == {"name": "ジェームズ"}
+
+# 1件あたり10トークンと数えるカウンタ
+def count_ten(message):
+    return 10
+
+
+def make_turns(count):
+    messages = []
+    for i in range(count):
+        messages.append({"role": "user", "content": f"質問{i}"})
+        messages.append(
+            {
+                "role": "assistant",
+                "content": "",
+                "tool_calls": [
+                    {
+                        "id": f"call_{i}",
+                        "type": "function",
+                        "function": {"name": "lookup", "arguments": "{}"},
+                    }
+                ],
+            }
+        )
+        messages.append({"role": "tool", "tool_call_id": f"call_{i}", "content": "結果"})
+    return messages
+
+# 上限に収まらない古い単位を捨て、ツール呼び出しと結果を分けないことのテスト
+def test_token_budget_policy_drops_old_units():
+    policy = TokenBudgetPolicy(max_tokens=60, token_counter=count_ten)
+    messages = make_turns(3)
+    system = {"role": "system", "content": "指示"}
+
+    kept = policy(messages, system)
+
+    # システム 10 + 残り 50 → 最新の (assistant, tool) 20 と user 10 と 1つ前の単位 20
+    assert kept == messages[4:]
+    assert kept[0]["role"] == "assistant"
+    assert policy(messages[:2], system) == messages[:2]
+
+# 要約がキャッシュされ、新しく捨てる部分だけが追加で要約されることのテスト
+def test_token_budget_policy_summarizes_incrementally():
+    calls = []
+
+    def summarizer(previous, messages):
+        calls.append(len(messages))
+        return previous + "+" + str(len(messages))
+
+    policy = TokenBudgetPolicy(
+        max_tokens=40, token_counter=count_ten, summarizer=summarizer
+    )
+    system = {"role": "system", "content": "指示"}
+    messages = make_turns(4)
+
+    first = policy(messages[:9], system)
+    again = policy(messages[:9], system)
+    longer = policy(messages, system)
+
+    # 要約も上限に数えるため、収まらない古い単位は要約に回す
+    assert first[0] == {"role": "system", "content": "これまでの会話の要約: +6+1"}
+    assert first[1:] == messages[7:9]
+    assert again == first
+    assert longer[0]["content"] == "これまでの会話の要約: +6+1+2+1"
+    assert calls == [6, 1, 2, 1]
+    for result in (first, longer):
+        assert sum(count_ten(m) for m in [system, *result]) <= 40
+
+# 古い単位の内容を切り詰めて残すテスト
+def test_token_budget_policy_truncates():
+    policy = TokenBudgetPolicy(max_tokens=20, strategy="truncate", truncate_chars=3)
+    system = {"role": "system", "content": ""}
+    messages = [
+        {"role": "user", "content": "あ" * 30},
+        {"role": "assistant", "content": "い" * 30},
+        {"role": "user", "content": "う"},
+    ]
+
+    kept = policy(messages, system)
+
+    assert [m["content"] for m in kept] == ["いいい…", "う"]
+    assert messages[1]["content"] == "い" * 30
+
+# エージェントに設定したポリシーでリクエストの履歴が絞り込まれることのテスト
+def test_agent_history_policy_applied_to_request():
+    mock_openai_client = MockOpenAIClient()
+    mock_openai_client.set_response(
+        create_mock_response({"role": "assistant", "content": "応答"})
+    )
+    client = Swarm(client=mock_openai_client)
+    agent = Agent(
+        history_policy=TokenBudgetPolicy(max_tokens=30, token_counter=count_ten)
+    )
+    messages = [{"role": "user", "content": str(i)} for i in range(5)]
+
+    client.run(agent=agent, messages=messages)
+    sent = mock_openai_client.chat.completions.create.call_args.kwargs["messages"]
+
+    assert [m["content"] for m in sent[1:]] == ["3", "4"]
+
+# AsyncSwarm では要約がイベントループのスレッドの外で実行されることのテスト
+def test_async_swarm_summarizes_off_event_loop():
+    threads = []
+
+    def summarizer(previous, messages):
+        threads.append(threading.current_thread())
+        return "要約"
+
+    mock = AsyncMockOpenAIClient()
+    mock.set_response(create_mock_response({"role": "assistant", "content": "応答"}))
+    policy = TokenBudgetPolicy(
+        max_tokens=40, token_counter=count_ten, summarizer=summarizer
+    )
+    client = AsyncSwarm(client=mock, history_policy=policy)
+    messages = [{"role": "user", "content": str(i)} for i in range(5)]
+
+    asyncio.run(client.arun(agent=Agent(), messages=messages))
+    sent = mock.chat.completions.create.call_args.kwargs["messages"]
+
+    assert threads and threads[0] is not threading.main_thread()
+    assert [m["content"] for m in sent[1:]] == ["これまでの会話の要約: 要約", "3", "4"]
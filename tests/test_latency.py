@@ -0,0 +1,162 @@
+import asyncio
+import time
+
+import pytest
+
+from swarm import Agent, AsyncSwarm, LatencyPolicy, RetryBudget, Swarm
+from swarm.latency import LatencyTracker
+from tests.mock_client import (
+    AsyncMockOpenAIClient,
+    MockOpenAIClient,
+    create_mock_response,
+)
+
+KEY = ("gpt-4o", False)
+
+
+# 直近の所要時間が seconds 秒のサンプルで埋まったトラッカーを返す関数
+def warm_tracker(seconds=0.01, samples=20):
+    tracker = LatencyTracker()
+    for _ in range(samples):
+        tracker.observe(KEY, seconds)
+    return tracker
+
+
+# 失敗した回数だけ ConnectionError を送出してから value を返すリクエストを作成する関数
+def flaky(failures, value="ok"):
+    calls = []
+
+    def request():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise ConnectionError("接続に失敗しました")
+        return value
+
+    return request, calls
+
+# 直近の所要時間の分位点が計算されることのテスト
+def test_tracker_percentile():
+    tracker = LatencyTracker()
+    assert tracker.percentile(KEY, 0.95) is None
+    for i in range(1, 101):
+        tracker.observe(KEY, i / 100)
+
+    assert tracker.percentile(KEY, 0.95) == 0.95
+    assert tracker.percentile(KEY, 0.5) == 0.5
+
+# 再試行できる例外の場合、バックオフの後に再試行されることのテスト
+def test_retries_with_backoff():
+    policy = LatencyPolicy(retry_on=(ConnectionError,), backoff_base=0.001)
+    request, calls = flaky(2)
+
+    assert policy.call(KEY, request) == "ok"
+    assert len(calls) == 3
+    assert policy.retries == 2
+
+# 再試行の回数の上限と、再試行しない例外のテスト
+def test_retry_limits():
+    policy = LatencyPolicy(
+        retry_on=(ConnectionError,), max_retries=1, backoff_base=0.001
+    )
+    request, calls = flaky(5)
+    with pytest.raises(ConnectionError):
+        policy.call(KEY, request)
+    assert len(calls) == 2
+
+    def broken():
+        raise ValueError("再試行しない")
+
+    with pytest.raises(ValueError):
+        policy.call(KEY, broken)
+    assert policy.retries == 1
+
+# 予算が尽きた場合は再試行しないことのテスト
+def test_retry_budget_exhausted():
+    policy = LatencyPolicy(
+        retry_on=(ConnectionError,),
+        backoff_base=0.001,
+        budget=RetryBudget(ratio=0.5, initial=0),
+    )
+    request, calls = flaky(1)
+    with pytest.raises(ConnectionError):
+        policy.call(KEY, request)
+    assert len(calls) == 1
+    assert policy.budget_exhausted == 1
+
+    # 2回のリクエストで予算が1個貯まり、再試行できるようになる
+    request, calls = flaky(1)
+    assert policy.call(KEY, request) == "ok"
+    assert policy.retries == 1
+
+# 遅いリクエストがヘッジされ、先に返った方が使われることのテスト
+def test_sync_hedge_takes_faster_response():
+    policy = LatencyPolicy(tracker=warm_tracker())
+    calls = []
+
+    def request():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.5)
+            return "遅い"
+        return "速い"
+
+    start = time.perf_counter()
+    assert policy.call(KEY, request) == "速い"
+    assert time.perf_counter() - start < 0.4
+    assert policy.hedges == 1
+    assert policy.hedge_wins == 1
+
+# 記録が足りない間はヘッジしないことのテスト
+def test_no_hedge_without_samples():
+    policy = LatencyPolicy(tracker=warm_tracker(samples=5))
+    assert policy.hedge_delay(KEY) is None
+    assert policy.call(KEY, lambda: "ok") == "ok"
+    assert policy.hedges == 0
+
+# 非同期のヘッジでは負けたリクエストがキャンセルされることのテスト
+def test_async_hedge_cancels_loser():
+    policy = LatencyPolicy(tracker=warm_tracker())
+    calls = []
+    cancelled = []
+
+    async def request():
+        calls.append(1)
+        if len(calls) == 1:
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+            return "遅い"
+        return "速い"
+
+    async def run():
+        result = await policy.acall(KEY, request)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) == "速い"
+    assert cancelled == [1]
+    assert policy.hedge_wins == 1
+
+# Swarm と AsyncSwarm のコンプリートにポリシーが適用されることのテスト
+def test_swarm_uses_latency_policy():
+    response = create_mock_response({"role": "assistant", "content": "はい"})
+    mock = MockOpenAIClient()
+    mock.chat.completions.create.side_effect = [ConnectionError("失敗"), response]
+    policy = LatencyPolicy(retry_on=(ConnectionError,), backoff_base=0.001)
+    client = Swarm(client=mock, latency_policy=policy)
+
+    result = client.run(agent=Agent(), messages=[{"role": "user", "content": "やあ"}])
+    assert result.messages[-1]["content"] == "はい"
+    assert policy.retries == 1
+    assert policy.tracker.count(("gpt-4o", False)) == 1
+
+    mock = AsyncMockOpenAIClient()
+    mock.chat.completions.create.side_effect = [ConnectionError("失敗"), response]
+    client = AsyncSwarm(client=mock, latency_policy=policy)
+    result = asyncio.run(
+        client.arun(agent=Agent(), messages=[{"role": "user", "content": "やあ"}])
+    )
+    assert result.messages[-1]["content"] == "はい"
+    assert policy.retries == 2
@@ -0,0 +1,157 @@
+import asyncio
+import time
+
+from swarm import Agent, AsyncSwarm, Swarm, memoize
+from swarm.memo import memo_of
+from swarm.tracing import InMemoryExporter, Tracer
+from swarm.types import Result
+from tests.mock_client import (
+    AsyncMockOpenAIClient,
+    MockOpenAIClient,
+    create_mock_response,
+)
+
+MESSAGES = [{"role": "user", "content": "天気は？"}]
+
+
+def tool_turn(*calls):
+    return [
+        create_mock_response(
+            {"role": "assistant", "content": ""},
+            [{"name": name, "args": args} for name, args in calls],
+        ),
+        create_mock_response({"role": "assistant", "content": "完了"}),
+    ]
+
+# 同じ引数の呼び出しが会話をまたいで保存済みの結果を使い、スパンに記録されることのテスト
+def test_memoized_function_is_called_once_per_arguments():
+    calls = []
+
+    @memoize(ttl=60)
+    def get_weather(location):
+        calls.append(location)
+        return f"{location}は晴れ"
+
+    exporter = InMemoryExporter()
+    mock = MockOpenAIClient()
+    client = Swarm(client=mock, tracer=Tracer([exporter]))
+    agent = Agent(functions=[get_weather])
+
+    for _ in range(2):
+        mock.set_sequential_responses(
+            tool_turn(
+                ("get_weather", {"location": "東京"}),
+                ("get_weather", {"location": "大阪"}),
+            )
+        )
+        response = client.run(agent=agent, messages=MESSAGES)
+        assert response.messages[1]["content"] == "東京は晴れ"
+        assert response.messages[2]["content"] == "大阪は晴れ"
+
+    assert calls == ["東京", "大阪"]
+    statuses = [
+        span.attributes["swarm.tool.cache"] for span in exporter.by_name("swarm.tool")
+    ]
+    assert statuses == ["miss", "miss", "hit", "hit"]
+    assert memo_of(get_weather).stats()["hits"] == 2
+
+# context_variables を受け取る関数は context_keys を指定しない限りメモ化されないことのテスト
+def test_context_dependent_functions_are_bypassed_or_keyed():
+    calls = []
+
+    @memoize
+    def greet(context_variables):
+        calls.append("greet")
+        return f"こんにちは、{context_variables['name']}さん"
+
+    @memoize(context_keys=["user_id"])
+    def orders(context_variables, status):
+        calls.append("orders")
+        return Result(
+            value=f"{context_variables['user_id']}:{status}",
+            context_variables={"checked": True},
+        )
+
+    mock = MockOpenAIClient()
+    client = Swarm(client=mock)
+    agent = Agent(functions=[greet, orders])
+    results = []
+    for user_id in ("u1", "u1", "u2"):
+        mock.set_sequential_responses(
+            tool_turn(("greet", {}), ("orders", {"status": "open"}))
+        )
+        response = client.run(
+            agent=agent,
+            messages=MESSAGES,
+            context_variables={"name": "太郎", "user_id": user_id},
+        )
+        results.append(response.messages[2]["content"])
+        assert response.context_variables["checked"] is True
+
+    assert results == ["u1:open", "u1:open", "u2:open"]
+    assert calls.count("greet") == 3
+    assert calls.count("orders") == 2
+    assert memo_of(greet).stats()["bypassed"] == 3
+
+# 引き継ぎを含む結果は保存されず、TTL と件数の上限が守られることのテスト
+def test_handoffs_are_not_stored_and_bounds_apply():
+    other = Agent(name="他のエージェント")
+
+    @memoize(maxsize=1, ttl=0.05)
+    def lookup(key):
+        return key
+
+    @memoize
+    def transfer():
+        return other
+
+    memo = memo_of(lookup)
+    for key in ("a", "b"):
+        cache_key, _ = memo.lookup(lookup, {"key": key})
+        memo.store(cache_key, lookup(key))
+    assert memo.lookup(lookup, {"key": "a"})[1] is None
+    assert memo.lookup(lookup, {"key": "b"})[1].value == "b"
+    time.sleep(0.06)
+    assert memo.lookup(lookup, {"key": "b"})[1] is None
+
+    memo = memo_of(transfer)
+    cache_key, _ = memo.lookup(transfer, {})
+    memo.store(cache_key, transfer())
+    assert memo.lookup(transfer, {})[1] is None
+
+# path を指定したメモが SQLite を通じて共有されることのテスト
+def test_sqlite_memo_is_shared(tmp_path):
+    path = str(tmp_path / "tools.db")
+
+    def query_docs(query):
+        return f"{query}の結果"
+
+    memoize(path=path)(query_docs)
+    first = memo_of(query_docs)
+    key, _ = first.lookup(query_docs, {"query": "返品"})
+    first.store(key, query_docs("返品"))
+
+    # 別のプロセスで同じ関数をメモ化した場合と同じく、新しいメモから読み出す
+    memoize(path=path)(query_docs)
+    second = memo_of(query_docs)
+    assert second is not first
+    assert second.lookup(query_docs, {"query": "返品"})[1].value == "返品の結果"
+    assert len(second.disk) == 1
+
+# AsyncSwarm でも async def の関数がメモ化されることのテスト
+def test_async_swarm_memoizes_coroutines():
+    calls = []
+
+    @memoize
+    async def get_weather(location):
+        calls.append(location)
+        return "晴れ"
+
+    mock = AsyncMockOpenAIClient()
+    client = AsyncSwarm(client=mock)
+    agent = Agent(functions=[get_weather])
+    for _ in range(2):
+        mock.set_sequential_responses(tool_turn(("get_weather", {"location": "東京"})))
+        response = asyncio.run(client.arun(agent=agent, messages=MESSAGES))
+        assert response.messages[1]["content"] == "晴れ"
+    assert calls == ["東京"]
@@ -0,0 +1,84 @@
+import json
+import pickle
+
+from swarm import Agent, Swarm
+from swarm.message import Message, json_default
+from swarm.types import Response
+from tests.mock_client import MockOpenAIClient, create_mock_response
+
+
+# Message が辞書と同じように読み書きできることのテスト
+def test_message_behaves_like_a_dict():
+    message = Message(role="tool", tool_call_id="1", tool_name="f", content="値")
+    assert message["content"] == "値"
+    assert message.get("sender") is None
+    assert "sender" not in message and "tool_name" in message
+    assert message == {
+        "role": "tool",
+        "tool_call_id": "1",
+        "tool_name": "f",
+        "content": "値",
+    }
+
+    message["content"] = "新しい値"
+    message["name"] = "f"
+    del message["tool_name"]
+    assert dict(message) == {
+        "content": "新しい値",
+        "role": "tool",
+        "tool_call_id": "1",
+        "name": "f",
+    }
+    assert {**message, "content": "x"}["content"] == "x"
+    assert pickle.loads(pickle.dumps(message)) == message
+    assert json.loads(json.dumps([message], default=json_default)) == [dict(message)]
+
+# 履歴は Message で保持され、リクエストと Response には辞書として渡されることのテスト
+def test_run_keeps_compact_messages_and_sends_dicts():
+    mock = MockOpenAIClient()
+    mock.set_sequential_responses(
+        [
+            create_mock_response(
+                {"role": "assistant", "content": ""},
+                [{"name": "lookup", "args": {"key": "a"}}],
+            ),
+            create_mock_response({"role": "assistant", "content": "完了"}),
+        ]
+    )
+
+    def lookup(key):
+        return "値"
+
+    client = Swarm(client=mock)
+    response = client.run(
+        agent=Agent(name="エージェント", functions=[lookup]),
+        messages=[{"role": "user", "content": "こんにちは"}],
+    )
+
+    assert all(type(m) is dict for m in response.messages)
+    assert json.loads(json.dumps(response.messages)) == response.messages
+    assistant, tool, final = response.messages
+    assert assistant["sender"] == "エージェント"
+    # 値が None のフィールドもコンプリートのメッセージと同じように残る
+    assert "refusal" in assistant and assistant["refusal"] is None
+    assert assistant["tool_calls"] == [
+        {
+            "id": "mock_tc_id",
+            "function": {"arguments": '{"key": "a"}', "name": "lookup"},
+            "type": "function",
+        }
+    ]
+    assert tool == {
+        "role": "tool",
+        "tool_call_id": "mock_tc_id",
+        "tool_name": "lookup",
+        "content": "値",
+    }
+
+    sent = mock.chat.completions.create.call_args.kwargs["messages"]
+    assert all(type(m) is dict for m in sent)
+    assert sent[2:] == [assistant, tool]
+
+    dumped = json.loads(Response(messages=response.messages).model_dump_json())
+    assert dumped["messages"][-1]["content"] == "完了"
+    assert Response.model_validate(dumped).messages[1] == tool
@@ -0,0 +1,139 @@
+import asyncio
+import os
+import pickle
+
+import pytest
+
+from swarm import Agent, AsyncSwarm, Swarm, run_in_process
+from swarm.process import AgentRef, ProcessResult, call_in_process, unpack_result
+from swarm.types import Result
+from tests.mock_client import (
+    AsyncMockOpenAIClient,
+    MockOpenAIClient,
+    create_mock_response,
+)
+
+sales_agent = Agent(name="営業")
+
+
+@run_in_process
+def worker_pid():
+    return str(os.getpid())
+
+
+@run_in_process
+def transfer_to_sales():
+    return sales_agent
+
+
+@run_in_process
+def upgrade_plan(context_variables, level: int):
+    return Result(
+        value="アップグレードしました",
+        agent=sales_agent,
+        context_variables={"plan": f"{context_variables['plan']}+{level}"},
+    )
+
+
+@run_in_process
+async def async_worker_pid():
+    return str(os.getpid())
+
+
+@run_in_process
+def transfer_by_name(name: str):
+    return Agent(name=name)
+
+
+def tool_calls(*calls):
+    return create_mock_response(
+        {"role": "assistant", "content": ""},
+        [{"name": name, "args": args} for name, args in calls],
+    )
+
+
+FINAL = create_mock_response({"role": "assistant", "content": "完了"})
+MESSAGES = [{"role": "user", "content": "こんにちは"}]
+
+
+@pytest.fixture(scope="module")
+def client():
+    with Swarm(client=MockOpenAIClient(), max_process_workers=1) as client:
+        yield client
+
+# 戻り値のエージェントが名前の参照として受け渡され、元のエージェントに戻ることのテスト
+def test_agent_results_round_trip_as_refs():
+    packed = pickle.loads(pickle.dumps(call_in_process(transfer_to_sales, {})))
+    assert isinstance(packed, ProcessResult)
+    assert isinstance(packed.agent, AgentRef)
+    assert unpack_result(transfer_to_sales, packed) is sales_agent
+
+    args = {"context_variables": {"plan": "a"}, "level": 2}
+    packed = call_in_process(upgrade_plan, args)
+    result = unpack_result(upgrade_plan, pickle.loads(pickle.dumps(packed)))
+    assert result.agent is sales_agent
+    assert result.context_variables == {"plan": "a+2"}
+
+# 関数のモジュールにないエージェントは、Swarm の agents とグラフから探されることのテスト
+def test_runtime_agents_resolve_from_registry():
+    support = Agent(name="サポート")
+    packed = call_in_process(transfer_by_name, {"name": "サポート"})
+    with pytest.raises(LookupError):
+        unpack_result(transfer_by_name, packed)
+    assert unpack_result(transfer_by_name, packed, [support]) is support
+
+    client = Swarm(client=MockOpenAIClient(), agents=[support])
+    assert client.known_agents() == [support]
+    billing = Agent(name="請求")
+    client.compile([billing])
+    assert client.known_agents() == [support, billing]
+
+# run_in_process を指定した関数が別のプロセスで実行されることのテスト
+def test_functions_run_in_worker_process(client):
+    agent = Agent(functions=[worker_pid, transfer_to_sales])
+    client.client.set_sequential_responses(
+        [tool_calls(("worker_pid", {}), ("transfer_to_sales", {})), FINAL]
+    )
+    response = client.run(agent=agent, messages=MESSAGES)
+
+    pid = response.messages[1]["content"]
+    assert pid.isdigit() and int(pid) != os.getpid()
+    assert response.agent is sales_agent
+    assert response.messages[-1]["content"] == "完了"
+
+# コンテキスト変数と Result が受け渡されることのテスト（並行実行を含む）
+def test_process_context_variables_and_result(client):
+    agent = Agent(functions=[upgrade_plan, worker_pid])
+    client.concurrent_tool_calls = True
+    client.client.set_sequential_responses(
+        [tool_calls(("upgrade_plan", {"level": 3}), ("worker_pid", {})), FINAL]
+    )
+    try:
+        response = client.run(
+            agent=agent, messages=MESSAGES, context_variables={"plan": "basic"}
+        )
+    finally:
+        client.concurrent_tool_calls = False
+
+    assert response.messages[1]["content"] == "アップグレードしました"
+    assert response.context_variables == {"plan": "basic+3"}
+    assert response.agent is sales_agent
+
+# AsyncSwarm でも同期関数と async def の関数がプロセスプールで実行されることのテスト
+def test_async_swarm_uses_process_pool():
+    mock = AsyncMockOpenAIClient()
+    mock.set_sequential_responses(
+        [tool_calls(("worker_pid", {}), ("async_worker_pid", {})), FINAL]
+    )
+    agent = Agent(functions=[worker_pid, async_worker_pid])
+
+    async def run():
+        async with AsyncSwarm(client=mock, max_process_workers=1) as client:
+            response = await client.arun(agent=agent, messages=MESSAGES)
+        assert client._process_executor is None
+        return response
+
+    response = asyncio.run(run())
+
+    pids = {response.messages[1]["content"], response.messages[2]["content"]}
+    assert len(pids) == 1 and str(os.getpid()) not in pids
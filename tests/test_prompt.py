@@ -0,0 +1,111 @@
+import json
+
+from swarm import Agent, CanonicalPromptLayout, Swarm
+from tests.mock_client import (
+    MockOpenAIClient,
+    create_mock_response,
+    create_mock_stream,
+)
+
+
+def zeta_tool(query: str):
+    return query
+
+
+def alpha_tool(item_id: str, count: int = 1):
+    return item_id
+
+
+agent = Agent(
+    name="案内",
+    instructions=lambda cv: f"{cv['name']}さんの担当です。",
+    functions=[zeta_tool, alpha_tool],
+)
+
+
+# 送信したリクエストのうち、ターンをまたいで同じになるべき先頭の部分を返す関数
+def request_prefix(mock):
+    sent = mock.chat.completions.create.call_args.kwargs
+    return (
+        json.dumps(sent["messages"][0], ensure_ascii=False).encode("utf-8"),
+        json.dumps(sent["tools"], ensure_ascii=False).encode("utf-8"),
+    )
+
+# 先頭がコンテキスト変数によらずバイト単位で同じになり、変数は末尾に付くことのテスト
+def test_canonical_layout_keeps_prefix_stable():
+    mock = MockOpenAIClient()
+    mock.set_response(create_mock_response({"role": "assistant", "content": "はい"}))
+    client = Swarm(client=mock, prompt_layout=CanonicalPromptLayout())
+    messages = [{"role": "user", "content": "こんにちは"}]
+
+    prefixes = []
+    for context_variables in ({"name": "太郎", "id": 1}, {"id": 2, "name": "花子"}):
+        client.run(agent=agent, messages=messages, context_variables=context_variables)
+        prefixes.append(request_prefix(mock))
+    assert prefixes[0] == prefixes[1]
+
+    sent = mock.chat.completions.create.call_args.kwargs
+    assert sent["messages"][0] == {"role": "system", "content": "さんの担当です。"}
+    assert [tool["function"]["name"] for tool in sent["tools"]] == [
+        "alpha_tool",
+        "zeta_tool",
+    ]
+    assert sent["messages"][-1] == {
+        "role": "system",
+        "content": 'context_variables: {"id":2,"name":"花子"}',
+    }
+    # 末尾のメッセージは履歴に保存されない
+    response = client.run(agent=agent, messages=messages, context_variables={"id": 3})
+    assert [m["content"] for m in response.messages] == ["はい"]
+
+    layout = CanonicalPromptLayout(static_instructions=False, context_keys=["id"])
+    client = Swarm(client=mock, prompt_layout=layout)
+    client.run(agent=agent, messages=messages, context_variables={"name": "太郎"})
+    sent = mock.chat.completions.create.call_args.kwargs
+    assert sent["messages"][0]["content"] == "太郎さんの担当です。"
+    assert sent["messages"][-1] == messages[0]
+
+# キャッシュされたプロンプトのトークン数が Response.usage に集計されることのテスト
+def test_response_reports_cached_tokens():
+    mock = MockOpenAIClient()
+    mock.set_sequential_responses(
+        [
+            create_mock_response(
+                {"role": "assistant", "content": ""},
+                [{"name": "alpha_tool", "args": {"item_id": "a"}}],
+                usage={"prompt": 1200, "completion": 20, "cached": 0},
+            ),
+            create_mock_response(
+                {"role": "assistant", "content": "完了"},
+                usage={"prompt": 1300, "completion": 10, "cached": 1024},
+            ),
+        ]
+    )
+    client = Swarm(client=mock)
+    response = client.run(
+        agent=agent, messages=[{"role": "user", "content": "注文"}]
+    )
+    usage = response.usage
+    assert (usage.requests, usage.prompt_tokens, usage.completion_tokens) == (
+        2,
+        2500,
+        30,
+    )
+    assert usage.cached_tokens == 1024
+    assert usage.uncached_prompt_tokens == 1476
+    assert abs(usage.cache_hit_rate - 1024 / 2500) < 1e-9
+
+    mock.set_response(
+        create_mock_stream(
+            {"role": "assistant", "content": "ストリーム"},
+            usage={"prompt": 900, "completion": 5, "cached": 768},
+        )
+    )
+    mock.chat.completions.create.side_effect = None
+    events = list(
+        client.run_and_stream(
+            agent=agent, messages=[{"role": "user", "content": "こんにちは"}]
+        )
+    )
+    usage = events[-1]["response"].usage
+    assert (usage.requests, usage.prompt_tokens, usage.cached_tokens) == (1, 900, 768)
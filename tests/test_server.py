@@ -0,0 +1,151 @@
+import asyncio
+import json
+
+from swarm import Agent, AsyncSwarm
+from swarm.server import SwarmApp
+from swarm.types import Result
+from tests.mock_client import (
+    AsyncMockOpenAIClient,
+    create_mock_response,
+    create_mock_stream,
+)
+
+
+# ASGI アプリケーションにリクエストを送り、(ステータス, ヘッダー, ボディ) を返す関数
+def request(app, method, path, body=None):
+    payload = json.dumps(body).encode() if body is not None else b""
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "headers": []}
+    asyncio.run(app(scope, receive, send))
+    start = sent[0]
+    content = b"".join(m.get("body", b"") for m in sent[1:])
+    return start["status"], dict(start["headers"]), content
+
+
+# Server-Sent Events のボディを (イベント名, データ) のリストに変換する関数
+def parse_sse(content: bytes):
+    events = []
+    for block in content.decode().strip().split("\n\n"):
+        name, data = block.split("\n")
+        events.append((name[len("event: ") :], json.loads(data[len("data: ") :])))
+    return events
+
+
+def make_app(responses, **kwargs):
+    mock = AsyncMockOpenAIClient()
+    mock.set_sequential_responses(responses)
+    support = Agent(name="サポート")
+
+    def transfer_to_support():
+        return Result(value="引き継ぎ", agent=support, context_variables={"step": 1})
+
+    triage = Agent(name="トリアージ", functions=[transfer_to_support])
+    return SwarmApp([triage, support], swarm=AsyncSwarm(client=mock), **kwargs)
+
+# /run が会話の結果を JSON で返し、セッションに保存されることのテスト
+def test_run_endpoint_with_session():
+    app = make_app(
+        [
+            create_mock_response(
+                {"role": "assistant", "content": ""},
+                [{"name": "transfer_to_support", "args": {}}],
+            ),
+            create_mock_response({"role": "assistant", "content": "ご用件は？"}),
+            create_mock_response({"role": "assistant", "content": "承知しました"}),
+        ]
+    )
+    status, _, content = request(app, "POST", "/sessions")
+    session_id = json.loads(content)["session_id"]
+
+    status, headers, content = request(
+        app,
+        "POST",
+        "/run",
+        {
+            "messages": [{"role": "user", "content": "こんにちは"}],
+            "session_id": session_id,
+        },
+    )
+    assert status == 200
+    assert headers[b"content-type"].startswith(b"application/json")
+    result = json.loads(content)
+    assert result["agent"] == "サポート"
+    assert result["context_variables"] == {"step": 1}
+    assert result["session_id"] == session_id
+
+    # agent を省略すると、セッションの最後のエージェントで続ける
+    status, _, content = request(
+        app,
+        "POST",
+        "/run",
+        {
+            "messages": [{"role": "user", "content": "ありがとう"}],
+            "session_id": session_id,
+        },
+    )
+    assert json.loads(content)["messages"][-1]["content"] == "承知しました"
+
+    status, _, content = request(app, "GET", f"/sessions/{session_id}")
+    session = json.loads(content)
+    assert [m["role"] for m in session["messages"]] == [
+        "user",
+        "assistant",
+        "tool",
+        "assistant",
+        "user",
+        "assistant",
+    ]
+    assert session["agent"] == "サポート"
+
+# /stream がイベントを Server-Sent Events で返すことのテスト
+def test_stream_endpoint_emits_sse():
+    app = make_app([create_mock_stream({"role": "assistant", "content": "こんにちは"})])
+    status, headers, content = request(
+        app, "POST", "/stream", {"messages": [{"role": "user", "content": "やあ"}]}
+    )
+    assert status == 200
+    assert headers[b"content-type"].startswith(b"text/event-stream")
+    events = parse_sse(content)
+    names = [name for name, _ in events]
+    assert names[0] == "delim" and names[-2] == "delim" and names[-1] == "response"
+    deltas = [data for name, data in events if name == "delta"]
+    text = "".join(data.get("content") or "" for data in deltas)
+    assert text == "こんにちは"
+    assert events[-1][1]["messages"][-1]["content"] == "こんにちは"
+
+# 会話中の例外が error イベントとして返されることのテスト
+def test_stream_endpoint_reports_errors():
+    app = make_app([RuntimeError("接続できません")])
+    status, _, content = request(
+        app, "POST", "/stream", {"messages": [{"role": "user", "content": "やあ"}]}
+    )
+    events = parse_sse(content)
+    assert events[-1] == ("error", {"error": "RuntimeError: 接続できません"})
+
+# 不正なリクエストへのエラー応答のテスト
+def test_error_responses():
+    app = make_app([])
+    assert request(app, "GET", "/healthz")[0] == 200
+    assert request(app, "GET", "/unknown")[0] == 404
+    assert request(app, "POST", "/run", {"messages": "文字列"})[0] == 400
+    assert request(app, "POST", "/run", {"messages": [], "agent": "不明"})[0] == 404
+    assert request(app, "POST", "/run", {"session_id": "../etc"})[0] == 400
+    status, _, content = request(app, "POST", "/run", {"messages": []})
+    assert status == 500
+    assert "error" in json.loads(content)
+
+# 読み込み済みのセッションが max_sessions を超えると古いものから削除されることのテスト
+def test_sessions_are_bounded():
+    app = make_app([], max_sessions=2)
+    for session_id in ("a", "b", "c"):
+        app.session(session_id).append_messages([{"role": "user", "content": "1"}])
+
+    assert "a" not in app.session_store
+    assert len(app.session_store) == 2
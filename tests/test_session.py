@@ -0,0 +1,158 @@
+import asyncio
+
+import pytest
+
+from swarm import Agent, AsyncSwarm, JSONLinesSessionStore, SQLiteSessionStore, Swarm
+from swarm.session import SessionStore
+from swarm.types import Result
+from tests.mock_client import (
+    AsyncMockOpenAIClient,
+    ScriptedOpenAIClient,
+    create_mock_stream,
+)
+
+
+def make_store(kind, tmp_path):
+    if kind == "jsonl":
+        return JSONLinesSessionStore(str(tmp_path / "sessions"))
+    return SQLiteSessionStore(str(tmp_path / "sessions.db"))
+
+
+def make_agents():
+    support = Agent(name="サポート")
+
+    def transfer_to_support():
+        return Result(
+            value="引き継ぎました", agent=support, context_variables={"step": 2}
+        )
+
+    triage = Agent(name="トリアージ", functions=[transfer_to_support])
+    return triage, support
+
+# 会話をセッションに保存し、別のストアのインスタンスから再開できることのテスト
+@pytest.mark.parametrize("kind", ["jsonl", "sqlite"])
+def test_session_persists_and_resumes(kind, tmp_path):
+    triage, support = make_agents()
+    client = Swarm(
+        client=ScriptedOpenAIClient(
+            [
+                {"function_calls": [{"name": "transfer_to_support"}]},
+                {"content": "ご用件を伺います"},
+            ]
+        )
+    )
+    session = make_store(kind, tmp_path).load("abc")
+    response = client.run(
+        agent=triage,
+        messages=[{"role": "user", "content": "こんにちは"}],
+        context_variables={"user_id": 1},
+        session=session,
+    )
+    assert response.agent is support
+    roles = [m["role"] for m in response.messages]
+    assert roles == ["assistant", "tool", "assistant"]
+
+    # 別のプロセスを想定し、新しいストアから読み込む
+    resumed = make_store(kind, tmp_path).load("abc")
+    assert [m["role"] for m in resumed.messages] == [
+        "user",
+        "assistant",
+        "tool",
+        "assistant",
+    ]
+    assert resumed.context_variables == {"user_id": 1, "step": 2}
+    assert resumed.agent_name == "サポート"
+
+    agents = {agent.name: agent for agent in (triage, support)}
+    client = Swarm(client=ScriptedOpenAIClient([{"content": "承知しました"}]))
+    response = client.run(
+        agent=agents[resumed.agent_name],
+        messages=[{"role": "user", "content": "ありがとう"}],
+        session=resumed,
+    )
+    assert response.messages[-1]["content"] == "承知しました"
+    assert response.context_variables == {"user_id": 1, "step": 2}
+    assert len(resumed.messages) == 6
+    assert len(make_store(kind, tmp_path).load("abc").messages) == 6
+
+# 追記だけが書き込まれ、同じ値のコンテキスト変数は記録されないことのテスト
+def test_session_log_is_append_only(tmp_path):
+    store = make_store("jsonl", tmp_path)
+    client = Swarm(client=ScriptedOpenAIClient([{"content": "はい"}]))
+    agent = Agent()
+    session = store.load("abc")
+    for text in ("1", "2"):
+        client.run(
+            agent=agent,
+            messages=[{"role": "user", "content": text}],
+            context_variables={"user_id": 1},
+            session=session,
+        )
+
+    records = list(store.read("abc"))
+    assert [r["type"] for r in records] == [
+        "context",
+        "agent",
+        "message",
+        "message",
+        "message",
+        "message",
+    ]
+    assert client.client.calls == 2
+
+    # 読み込んでいないセッションでも、保存済みの値と同じものは記録しない
+    resumed = store.load("abc")
+    resumed.update_context({"user_id": 1, "plan": "pro"})
+    resumed.set_agent(agent.name)
+    fresh = store.load("abc")
+    fresh.set_agent(agent.name)
+    records = list(store.read("abc"))
+    assert [r["type"] for r in records].count("agent") == 1
+    assert records[-1] == {"type": "context", "values": {"plan": "pro"}}
+    assert fresh.context_variables == {"user_id": 1, "plan": "pro"}
+
+    # ストアの基底クラスはメソッドを実装しないとインスタンスを作れない
+    with pytest.raises(TypeError):
+        SessionStore()
+
+# 書き込み途中の行が無視され、不正なセッションIDが拒否されることのテスト
+def test_jsonl_store_ignores_partial_line(tmp_path):
+    store = make_store("jsonl", tmp_path)
+    store.append("abc", [{"type": "message", "message": {"role": "user"}}])
+    with open(store.path("abc"), "a", encoding="utf-8") as f:
+        f.write('{"type": "mess')
+
+    assert store.load("abc").messages == [{"role": "user"}]
+
+    # 不完全な行の後に追記しても、セッションを読み込める
+    store.load("abc").append_messages([{"role": "assistant", "content": "はい"}])
+    assert store.load("abc").messages == [
+        {"role": "user"},
+        {"role": "assistant", "content": "はい"},
+    ]
+    with pytest.raises(ValueError):
+        store.load("../abc")
+
+# AsyncSwarm のストリーミングでもセッションに保存されることのテスト
+def test_async_stream_session(tmp_path):
+    store = make_store("sqlite", tmp_path)
+    session = store.create()
+    mock = AsyncMockOpenAIClient()
+    mock.set_response(create_mock_stream({"role": "assistant", "content": "こんにちは"}))
+    client = AsyncSwarm(client=mock)
+
+    async def run():
+        async for event in client.arun_and_stream(
+            agent=Agent(),
+            messages=[{"role": "user", "content": "やあ"}],
+            session=session,
+        ):
+            if "response" in event:
+                return event["response"]
+
+    response = asyncio.run(run())
+    assert response.messages[-1]["content"] == "こんにちは"
+    assert [m["role"] for m in store.load(session.id).messages] == [
+        "user",
+        "assistant",
+    ]
@@ -0,0 +1,118 @@
+import json
+
+import pytest
+
+from swarm import Agent, Swarm
+from swarm.tracing import InMemoryExporter, JSONLinesExporter, Tracer
+from tests.mock_client import (
+    MockOpenAIClient,
+    create_mock_response,
+    create_mock_stream,
+)
+
+DEFAULT_RESPONSE_CONTENT = "サンプルレスポンス内容"
+
+# ツール呼び出しと引き継ぎを含む会話のスパンのテスト
+def test_run_emits_spans_for_completions_tools_and_handoffs():
+    def lookup(key):
+        return "値"
+
+    def transfer_to_agent2():
+        return agent2
+
+    agent1 = Agent(name="テストエージェント1", functions=[lookup, transfer_to_agent2])
+    agent2 = Agent(name="テストエージェント2", model="gpt-4o-mini")
+
+    mock_openai_client = MockOpenAIClient()
+    mock_openai_client.set_sequential_responses(
+        [
+            create_mock_response(
+                message={"role": "assistant", "content": ""},
+                function_calls=[
+                    {"name": "lookup", "args": {"key": "a"}},
+                    {"name": "transfer_to_agent2"},
+                ],
+            ),
+            create_mock_response(
+                {"role": "assistant", "content": DEFAULT_RESPONSE_CONTENT}
+            ),
+        ]
+    )
+    exporter = InMemoryExporter()
+    client = Swarm(client=mock_openai_client, tracer=Tracer([exporter]))
+    client.run(agent=agent1, messages=[{"role": "user", "content": "こんにちは"}])
+
+    [run_span] = exporter.by_name("swarm.run")
+    completions = exporter.by_name("swarm.chat_completion")
+    tools = exporter.by_name("swarm.tool")
+    [handoff] = exporter.by_name("swarm.handoff")
+
+    assert all(
+        span.parent_id == run_span.span_id for span in completions + tools + [handoff]
+    )
+    assert len({span.trace_id for span in exporter.spans}) == 1
+    assert [span.attributes["gen_ai.request.model"] for span in completions] == [
+        "gpt-4o",
+        "gpt-4o-mini",
+    ]
+    assert completions[0].attributes["swarm.message_count"] == 2
+    assert completions[0].attributes["swarm.request_bytes"] > 0
+    assert [span.attributes["swarm.tool.name"] for span in tools] == [
+        "lookup",
+        "transfer_to_agent2",
+    ]
+    assert handoff.attributes == {
+        "swarm.agent": "テストエージェント1",
+        "swarm.handoff.to": "テストエージェント2",
+    }
+    assert run_span.attributes["swarm.turns"] == 2
+    assert run_span.attributes["swarm.final_agent"] == "テストエージェント2"
+
+# ストリーミングの TTFT と、ツールの例外がスパンに記録されることのテスト
+def test_stream_ttft_and_tool_error(tmp_path):
+    def broken():
+        raise RuntimeError("壊れています")
+
+    mock_openai_client = MockOpenAIClient()
+    mock_openai_client.set_response(
+        create_mock_stream(
+            {"role": "assistant", "content": "考え中"}, [{"name": "broken"}]
+        )
+    )
+    path = tmp_path / "spans.jsonl"
+    exporter = InMemoryExporter()
+    file_exporter = JSONLinesExporter(str(path))
+    client = Swarm(
+        client=mock_openai_client, tracer=Tracer([exporter, file_exporter])
+    )
+
+    with pytest.raises(RuntimeError):
+        list(
+            client.run(
+                agent=Agent(functions=[broken]),
+                messages=[{"role": "user", "content": "こんにちは"}],
+                stream=True,
+            )
+        )
+    file_exporter.close()
+
+    [completion] = exporter.by_name("swarm.chat_completion")
+    [tool] = exporter.by_name("swarm.tool")
+    [run_span] = exporter.by_name("swarm.run")
+    assert completion.attributes["swarm.ttft_ms"] >= 0
+    assert completion.attributes["swarm.chunks"] > 1
+    assert tool.status_message == "RuntimeError: 壊れています"
+    assert run_span.status_code == 2
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    spans = [
+        line["resourceSpans"][0]["scopeSpans"][0]["spans"][0] for line in lines
+    ]
+    assert [span["name"] for span in spans] == [
+        "swarm.chat_completion",
+        "swarm.tool",
+        "swarm.run",
+    ]
+    assert spans[1]["parentSpanId"] == spans[2]["spanId"]
+    assert spans[1]["status"]["code"] == 2
+    assert int(spans[0]["endTimeUnixNano"]) >= int(spans[0]["startTimeUnixNano"])
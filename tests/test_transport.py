@@ -0,0 +1,164 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from swarm import (
+    Agent,
+    AsyncSwarm,
+    ConnectionPool,
+    LatencyPolicy,
+    Swarm,
+    default_pool,
+    set_default_pool,
+)
+from tests.mock_client import MockOpenAIClient, create_mock_response
+
+# モデル名に対応するベース URL だけが返されることのテスト
+def test_pool_base_url_lookup():
+    pool = ConnectionPool(
+        http2=False, base_urls={"local-llama": "http://localhost:8000/v1"}
+    )
+
+    assert pool.base_url("local-llama") == "http://localhost:8000/v1"
+    assert pool.base_url("gpt-4o") is None
+    assert pool.base_url(None) is None
+
+# クライアントを指定した場合、ベース URL のないモデルではそのクライアントを使うことのテスト
+def test_explicit_client_is_used_without_base_url():
+    mock = MockOpenAIClient()
+    mock.set_response(create_mock_response({"role": "assistant", "content": "はい"}))
+    client = Swarm(client=mock, pool=ConnectionPool(http2=False))
+
+    assert client.completion_client("gpt-4o") is mock
+
+# クライアントを指定しない場合、OpenAI クライアントは最初に参照したときに作成されることのテスト
+def test_client_is_created_on_first_use():
+    pool = ConnectionPool(http2=False)
+    client = AsyncSwarm(pool=pool)
+
+    assert client._client is None and not pool._clients
+    mock = MockOpenAIClient()
+    client.client = mock
+    assert client.client is mock
+
+# 複数の Swarm が同じ HTTP クライアントを共有することのテスト
+def test_swarm_instances_share_http_client():
+    pool = ConnectionPool(max_connections=4, http2=False, api_key="test")
+    first = Swarm(pool=pool)
+    second = Swarm(pool=pool)
+
+    assert first.client is second.client
+    assert first.client._client is pool.http_client()
+    pool.close()
+
+# モデルごとのベース URL のクライアントが選ばれ、同期と非同期で別々に共有されることのテスト
+def test_pool_routes_models_to_base_urls():
+    pool = ConnectionPool(
+        http2=False,
+        base_urls={"local-llama": "http://localhost:8000/v1"},
+        api_key="test",
+    )
+    client = Swarm(pool=pool)
+    local = client.completion_client("local-llama")
+
+    assert local is not client.client
+    assert str(local.base_url).startswith("http://localhost:8000/v1")
+    assert local._client is client.client._client
+    assert client.completion_client("gpt-4o") is client.client
+
+    async_client = AsyncSwarm(pool=pool)
+    assert async_client.completion_client("local-llama") is pool.async_client(
+        "local-llama"
+    )
+    assert async_client.client._client is pool.async_http_client()
+    pool.close()
+    asyncio.run(pool.aclose())
+
+# レイテンシポリシーを使う Swarm には SDK の再試行を無効にしたクライアントが渡されるテスト
+def test_latency_policy_disables_sdk_retries():
+    pool = ConnectionPool(
+        http2=False,
+        base_urls={"local-llama": "http://localhost:8000/v1"},
+        api_key="test",
+    )
+    plain = Swarm(pool=pool)
+    hedged = Swarm(pool=pool, latency_policy=LatencyPolicy())
+
+    assert plain.client.max_retries == 2
+    assert hedged.client.max_retries == 0
+    assert hedged.completion_client("local-llama").max_retries == 0
+    assert hedged.client._client is plain.client._client
+    assert hedged.client is Swarm(pool=pool, latency_policy=LatencyPolicy()).client
+
+    async_client = AsyncSwarm(pool=pool, latency_policy=LatencyPolicy())
+    assert async_client.client.max_retries == 0
+    pool.close()
+
+# クライアントなしの Swarm がデフォルトの接続プールを使うことのテスト
+def test_default_pool_is_process_wide():
+    previous = default_pool()
+    set_default_pool(ConnectionPool(http2=False, api_key="test"))
+    try:
+        assert Swarm().client is Swarm().client
+        assert Swarm().pool is default_pool()
+    finally:
+        default_pool().close()
+        set_default_pool(previous)
+
+# asyncio.run を繰り返しても、イベントループごとの接続で会話できることのテスト
+def test_async_pool_survives_repeated_asyncio_run():
+    completion = json.dumps(
+        {
+            "id": "cc",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4o",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "はい"},
+                }
+            ],
+        }
+    ).encode("utf-8")
+
+    # キープアライブで応答するローカルのサーバー
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(completion)))
+            self.end_headers()
+            self.wfile.write(completion)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    pool = ConnectionPool(
+        http2=False,
+        api_key="test",
+        base_url=f"http://127.0.0.1:{server.server_port}/v1",
+        max_retries=0,
+    )
+    messages = [{"role": "user", "content": "こんにちは"}]
+    http_clients = []
+
+    async def run():
+        client = AsyncSwarm(pool=pool)
+        http_clients.append(client.client._client)
+        return await client.arun(agent=Agent(), messages=messages)
+
+    try:
+        for _ in range(2):
+            assert asyncio.run(run()).messages[-1]["content"] == "はい"
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert http_clients[0] is not http_clients[1]
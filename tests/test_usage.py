@@ -0,0 +1,108 @@
+import pytest
+
+from swarm import Agent, PriceTable, Swarm, usage_report
+from swarm.usage import ModelPrice, TokenUsage, TurnUsage
+from tests.mock_client import (
+    MockOpenAIClient,
+    create_mock_response,
+    create_mock_stream,
+)
+
+billing = Agent(name="請求", model="gpt-4o-mini")
+
+
+def transfer_to_billing():
+    return billing
+
+
+triage = Agent(name="受付", functions=[transfer_to_billing])
+
+
+# ターンごと、エージェントごとの使用量が Response に集計されることのテスト
+def test_usage_is_aggregated_per_turn_and_agent():
+    mock = MockOpenAIClient()
+    mock.set_sequential_responses(
+        [
+            create_mock_response(
+                {"role": "assistant", "content": ""},
+                [{"name": "transfer_to_billing"}],
+                usage={"prompt": 1000, "completion": 20, "cached": 512},
+            ),
+            create_mock_response(
+                {"role": "assistant", "content": "請求の担当です。"},
+                model="gpt-4o-mini",
+                usage={"prompt": 1200, "completion": 30},
+            ),
+        ]
+    )
+    client = Swarm(client=mock)
+    response = client.run(agent=triage, messages=[{"role": "user", "content": "請求"}])
+
+    usage = response.usage
+    assert [(t.agent, t.model, t.prompt_tokens) for t in usage.turns] == [
+        ("受付", "gpt-4o", 1000),
+        ("請求", "gpt-4o-mini", 1200),
+    ]
+    assert usage.total_tokens == 2250 and usage.cached_tokens == 512
+    assert all(turn.seconds >= 0 for turn in usage.turns)
+    by_agent = usage.by_agent()
+    assert by_agent["受付"].completion_tokens == 20
+    assert by_agent["請求"].requests == 1
+
+    prices = PriceTable({"gpt-4o": (2.5, 10.0, 1.25)}).set("gpt-4o-mini", 0.15, 0.6)
+    expected = (488 * 2.5 + 512 * 1.25 + 20 * 10.0 + 1200 * 0.15 + 30 * 0.6) / 1e6
+    assert usage.cost(prices) == pytest.approx(expected)
+    assert PriceTable({"gpt-4o": (2.5, 10.0)}).cost(usage) is None
+
+# ストリーミングで usage を要求し、最後のチャンクから集計することのテスト
+def test_streaming_requests_usage_in_final_chunk():
+    mock = MockOpenAIClient()
+    mock.set_response(
+        create_mock_stream(
+            {"role": "assistant", "content": "こんにちは"},
+            usage={"prompt": 50, "completion": 5},
+        )
+    )
+    events = list(
+        Swarm(client=mock).run_and_stream(
+            agent=triage, messages=[{"role": "user", "content": "やあ"}]
+        )
+    )
+    sent = mock.chat.completions.create.call_args.kwargs
+    assert sent["stream_options"] == {"include_usage": True}
+    usage = events[-1]["response"].usage
+    assert [(t.agent, t.completion_tokens) for t in usage.turns] == [("受付", 5)]
+
+    mock.set_response(create_mock_stream({"role": "assistant", "content": "はい"}))
+    list(
+        Swarm(client=mock, stream_usage=False).run_and_stream(
+            agent=triage, messages=[{"role": "user", "content": "やあ"}]
+        )
+    )
+    assert "stream_options" not in mock.chat.completions.create.call_args.kwargs
+
+# run_many の結果ごとにトークン数、速度、費用を報告するテスト
+def test_usage_report_for_run_many():
+    usage = TokenUsage()
+    usage.add_turn(
+        TurnUsage(model="gpt-4o-2024-08-06", completion_tokens=40, seconds=2)
+    )
+    response = type("R", (), {"usage": usage})()
+    prices = PriceTable({"gpt-4o": ModelPrice(2.5, 10.0)})
+
+    rows = usage_report([response, ValueError("失敗")], prices)
+    assert rows[0]["tokens_per_second"] == 20.0
+    assert rows[0]["cost"] == pytest.approx(40 * 10.0 / 1e6)
+    assert rows[1] == {"index": 1, "error": "ValueError: 失敗"}
+
+    mock = MockOpenAIClient()
+    mock.set_response(
+        create_mock_response(
+            {"role": "assistant", "content": "はい"},
+            usage={"prompt": 10, "completion": 2},
+        )
+    )
+    results = Swarm(client=mock).run_many(
+        [(triage, [{"role": "user", "content": str(i)}]) for i in range(3)]
+    )
+    assert [row["completion_tokens"] for row in usage_report(results)] == [2, 2, 2]
@@ -1,4 +1,19 @@
-from swarm.util import function_to_json
+import json
+
+import pytest
+
+from openai.types.chat.chat_completion_chunk import (
+    ChoiceDelta,
+    ChoiceDeltaToolCall,
+    ChoiceDeltaToolCallFunction,
+)
+from swarm.util import (
+    JSONEvent,
+    PartialJSONParser,
+    StreamAccumulator,
+    ToolCache,
+    function_to_json,
+)
 
 # 基本的な関数のテスト
 def test_basic_function():
@@ -50,3 +65,155 @@ def test_complex_function():
             },
         },
     }
+
+# ツールキャッシュのテスト
+def test_tool_cache_compiles_once_and_hides_context_variables():
+    def lookup(key: str, context_variables):
+        """値を調べます。"""
+        pass
+
+    def other():
+        pass
+
+    cache = ToolCache()
+    functions = [lookup]
+    compiled = cache.compile(functions)
+
+    assert compiled.tools == [
+        {
+            "type": "function",
+            "function": {
+                "name": "lookup",
+                "description": "値を調べます。",
+                "parameters": {
+                    "type": "object",
+                    "properties": {"key": {"type": "string"}},
+                    "required": ["key"],
+                },
+            },
+        }
+    ]
+    assert compiled.function_map == {"lookup": lookup}
+    assert compiled.context_functions == {"lookup"}
+    assert json.loads(compiled.payload()) == compiled.tools
+
+    # 同じ関数一覧なら同じコンパイル結果を返す
+    assert cache.compile(list(functions)) is compiled
+
+    # 関数一覧が変わると再コンパイルされ、関数ごとのスキーマは再利用される
+    functions.append(other)
+    recompiled = cache.compile(functions)
+    assert recompiled is not compiled
+    assert recompiled.tools[0] is compiled.tools[0]
+    assert set(recompiled.function_map) == {"lookup", "other"}
+
+# ストリーミングの差分を組み立てるテスト（1つのチャンクに複数のツール呼び出し）
+def test_stream_accumulator_handles_every_tool_call_index():
+    accumulator = StreamAccumulator("テストエージェント")
+    accumulator.add(ChoiceDelta(role="assistant", content="こん"))
+    accumulator.add(ChoiceDelta(content="にちは"))
+    accumulator.add(
+        ChoiceDelta(
+            tool_calls=[
+                ChoiceDeltaToolCall(
+                    index=0,
+                    id="call_0",
+                    type="function",
+                    function=ChoiceDeltaToolCallFunction(name="a", arguments='{"x"'),
+                ),
+                ChoiceDeltaToolCall(
+                    index=1,
+                    id="call_1",
+                    type="function",
+                    function=ChoiceDeltaToolCallFunction(name="b", arguments="{}"),
+                ),
+            ]
+        )
+    )
+    accumulator.add(
+        ChoiceDelta(
+            tool_calls=[
+                ChoiceDeltaToolCall(
+                    index=0, function=ChoiceDeltaToolCallFunction(arguments=": 1}")
+                )
+            ]
+        )
+    )
+
+    assert accumulator.message() == {
+        "content": "こんにちは",
+        "sender": "テストエージェント",
+        "role": "assistant",
+        "function_call": None,
+        "tool_calls": [
+            {
+                "function": {"arguments": '{"x": 1}', "name": "a"},
+                "id": "call_0",
+                "type": "function",
+            },
+            {
+                "function": {"arguments": "{}", "name": "b"},
+                "id": "call_1",
+                "type": "function",
+            },
+        ],
+    }
+
+# 引数が JSON として閉じ、次の呼び出しが始まったツール呼び出しを1回ずつ返すテスト
+def test_stream_accumulator_reports_closed_tool_calls():
+    accumulator = StreamAccumulator("テストエージェント", parse_arguments=True)
+
+    def add(index, arguments, name=None):
+        accumulator.add(
+            ChoiceDelta(
+                tool_calls=[
+                    ChoiceDeltaToolCall(
+                        index=index,
+                        id=f"call_{index}" if name else None,
+                        type="function" if name else None,
+                        function=ChoiceDeltaToolCallFunction(
+                            name=name, arguments=arguments
+                        ),
+                    )
+                ]
+            )
+        )
+        return [t["id"] for t in accumulator.closed_tool_calls()]
+
+    assert add(0, '{"q": {"a": 1}', name="a") == []
+    assert add(0, ', "b": "}"') == []
+    # 閉じても、次の呼び出しが始まるまでは引数が変わる可能性がある
+    assert add(0, "}") == []
+    assert add(0, " ") == []
+    assert add(1, "{}", name="b") == ["call_0"]
+    assert add(2, "[1]", name="c") == ["call_1"]
+    assert accumulator.closed_tool_calls(final=True) == []
+    assert [index for index, _ in accumulator.argument_events()] == [0, 0, 0, 1, 2]
+    assert accumulator.argument_events() == []
+
+# 断片に分かれた JSON を1回の走査で解析し、キーと文字列の続きをイベントで返すテスト
+def test_partial_json_parser_emits_events_across_fragments():
+    document = {"query": '東京の"天気"😀', "items": [1, -2.5e1, True, None, {}]}
+    for text in (json.dumps(document), json.dumps(document, ensure_ascii=False)):
+        for size in (1, 3, 64):
+            parser = PartialJSONParser()
+            events = []
+            for i in range(0, len(text), size):
+                events.extend(parser.feed(text[i : i + size]))
+            assert parser.done and parser.value == document
+
+            prefix = "".join(
+                e.value for e in events if e.kind == "value_prefix"
+            )
+            assert prefix == document["query"]
+            assert [e.value for e in events if e.kind == "key"] == ["query", "items"]
+            values = [(e.path, e.value) for e in events if e.kind == "value"]
+            assert values[0] == (("query",), document["query"])
+            assert values[1:3] == [(("items", 0), 1), (("items", 1), -25.0)]
+            assert events[-1] == JSONEvent("done", (), document)
+
+    parser = PartialJSONParser()
+    assert [e.kind for e in parser.feed('{"a": 1')] == ["key"]
+    assert [e.kind for e in parser.feed("}")] == ["value", "done"]
+    with pytest.raises(ValueError):
+        PartialJSONParser().feed('{"a" 1}')